@@ -0,0 +1,68 @@
+"""
+    GeoJSON 輸出的基準: geojson.dump(indent=2) 與 串流輸出 ( 縮排 / compact ) 的時間、峰值記憶體與檔案大小
+    預設為 1 小時的合併行程 ( 1 Hz, 3600 點 )
+    執行: python benchmarks/bench_geojson_writer.py [筆數 ...]
+"""
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "module" / "Dashcam2GeoVis"))
+
+import geojson
+from fixtures import gps_dict, synthetic_track
+from utlis.makeExif import _buildExifDf
+from utlis.geojsonWriter import write_feature_collection
+from video2geojson import Video2GeoJson
+
+
+def legacy(video: Video2GeoJson, f):
+    geojson.dump(video.create_feature_collection("all"), f, indent=2)
+
+
+def streaming(video: Video2GeoJson, f):
+    write_feature_collection(f, video.iter_features("all"))
+
+
+def streaming_compact(video: Video2GeoJson, f):
+    write_feature_collection(f, video.iter_features("all", True), True)
+
+
+class NullSink:
+    # 只計算寫入的字元數, 讓峰值記憶體只反映輸出過程本身
+    def __init__(self):
+        self.size = 0
+
+    def write(self, s: str) -> int:
+        self.size += len(s)
+        return len(s)
+
+
+def measure(fn, video: Video2GeoJson) -> tuple:
+    sink = NullSink()
+    begin = time.perf_counter()
+    fn(video, sink)
+    elapsed = time.perf_counter() - begin
+
+    # tracemalloc 會拖慢執行, 記憶體另外量測
+    tracemalloc.start()
+    fn(video, NullSink())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, sink.size
+
+
+def main(sizes: list):
+    print(f"{'points':>8} {'writer':>18} {'seconds':>9} {'peak MiB':>9} {'size MiB':>9}")
+    for n in sizes:
+        data = gps_dict(synthetic_track(n))
+        df = _buildExifDf(data, "bench", 30.0, data["GPSDateTime"][0])
+        video = Video2GeoJson.from_dataframe(Path("bench.MP4"), df)
+        for fn in (legacy, streaming, streaming_compact):
+            elapsed, peak, size = measure(fn, video)
+            print(f"{n:>8} {fn.__name__:>18} {elapsed:>9.3f} {peak / 2**20:>9.2f} {size / 2**20:>9.2f}")
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [3600])
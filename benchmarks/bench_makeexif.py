@@ -0,0 +1,59 @@
+"""
+    makeExifDf 建表的微基準: 逐列 ( apply / map + strptime ) 與 欄位化 ( _buildExifDf ) 的每列成本比較
+    執行: python benchmarks/bench_makeexif.py [筆數 ...]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "module" / "Dashcam2GeoVis"))
+
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+from fixtures import gps_dict, synthetic_track
+from utlis.makeExif import _buildExifDf, _getDfSecondsDifference
+
+
+def legacy_build(data: dict, filename: str, fps: float, startDate: str) -> pd.DataFrame:
+    # 改寫前的逐列版本, 僅供比較
+    def transGps(lon, lat):
+        transformer = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
+        return transformer.transform(lon, lat)
+
+    df = pd.DataFrame(data).rename(columns={
+        "GPSDateTime": "datetime", "GPSLatitude": "lat", "GPSLongitude": "lon",
+        "GPSSpeed": "speed", "GPSTrack": "azimuth"})
+    df.drop_duplicates(inplace=True)
+    df["filename"] = filename
+    df["starttime"] = startDate
+    df["fps"] = fps
+    df["sec"] = df["datetime"].map(lambda x: int(_getDfSecondsDifference(startDate, x)))
+    df["frame"] = df["sec"].map(lambda x: int(x * fps))
+    df[["lon3857", "lat3857"]] = df.apply(
+        lambda x: transGps(x["lon"], x["lat"]), axis=1, result_type="expand")
+    return df
+
+
+def bench(fn, data: dict) -> float:
+    begin = time.perf_counter()
+    fn(data, "bench", 30.0, data["GPSDateTime"][0])
+    return time.perf_counter() - begin
+
+
+def main(sizes: list):
+    print(f"{'rows':>8} {'legacy us/row':>14} {'columnar us/row':>16} {'speedup':>8}")
+    for n in sizes:
+        data = gps_dict(synthetic_track(n))
+        new = _buildExifDf(data, "bench", 30.0, data["GPSDateTime"][0])
+        old = legacy_build(data, "bench", 30.0, data["GPSDateTime"][0])
+        assert (new[["sec", "frame"]].to_numpy() == old[["sec", "frame"]].to_numpy()).all()
+        assert np.allclose(new[["lon3857", "lat3857"]], old[["lon3857", "lat3857"]])
+
+        legacy = bench(legacy_build, data)
+        columnar = bench(_buildExifDf, data)
+        print(f"{n:>8} {legacy / n * 1e6:>14.2f} {columnar / n * 1e6:>16.2f} {legacy / columnar:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [60, 600, 3600])
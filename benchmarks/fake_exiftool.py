@@ -0,0 +1,86 @@
+"""
+    exiftool 的替代腳本, 只支援本專案用到的兩種查詢, 輸出格式與 exiftool 相同:
+        exiftool -ee -T -GPS* <file>
+        exiftool -s <file> -VideoFrameRate -CreateDate -Duration
+    輸出由 fixtures.write_mp4 一併寫入的原始軌跡 ( fixtures.track_path ) 產生, 不解析 MP4,
+    因此可用來檢查 utlis.mp4Gps 的結果; 支援一次性執行與 -stay_open True -@ - 常駐模式
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from fixtures import FRAME_DELTA, MP4_EPOCH, TIMESCALE, track_path
+
+
+def _track(path: str) -> dict:
+    with np.load(track_path(path)) as data:
+        return {name: data[name] for name in data.files}
+
+
+def _dms(value: float, refs: str) -> str:
+    # ex: 25 deg 1' 58.80" N
+    ref = refs[0] if value >= 0 else refs[1]
+    value = abs(value)
+    degree = int(value)
+    minute = int((value - degree) * 60)
+    second = ((value - degree) * 60 - minute) * 60
+    return f"{degree} deg {minute}' {second:.2f}\" {ref}"
+
+
+def _gps(path: str) -> str:
+    track = _track(path)
+    if not len(track["time"]):
+        return ""
+    cells = []
+    for row in zip(np.datetime_as_string(track["time"], unit="s").tolist(), track["lat"].tolist(),
+                   track["lon"].tolist(), track["speed"].tolist(), track["track"].tolist()):
+        time, lat, lon, speed, azimuth = row
+        cells += [f"{time.replace('-', ':').replace('T', ' ')}Z", _dms(lat, "NS"), _dms(lon, "EW"),
+                  f"{speed:.4f}", f"{azimuth:.4f}"]
+    return "\t".join(cells) + "\t\n"
+
+
+def _startTime(path: str) -> str:
+    # write_mp4 的 creation_time 為最後一筆 GPS 的下一秒, 長度為 GPS 筆數 ( 秒 )
+    times = _track(path)["time"]
+    duration = len(times)
+    createDate = (times[-1] + np.timedelta64(1, "s")).astype(object) if duration else MP4_EPOCH
+    return (f"VideoFrameRate                  : {TIMESCALE / FRAME_DELTA:g}\n"
+            f"CreateDate                      : {createDate:%Y:%m:%d %H:%M:%S}\n"
+            f"Duration                        : {duration:.2f} s\n")
+
+
+def run(args: list) -> str:
+    files = [x for x in args if not x.startswith("-") and x != "filename=utf8"]
+    if not files:
+        return ""
+    if "-ee" in args:
+        return _gps(files[0])
+    return _startTime(files[0])
+
+
+def main(argv: list) -> None:
+    if argv[:4] != ["-stay_open", "True", "-@", "-"]:
+        sys.stdout.write(run(argv))
+        return
+
+    args = []
+    for line in sys.stdin:
+        arg = line.rstrip("\r\n")
+        if arg == "-execute":
+            try:
+                sys.stdout.write(run(args))
+            except Exception as e:
+                sys.stderr.write(f"Error: {e}\n")
+            sys.stdout.write("{ready}\n")
+            sys.stdout.flush()
+            args = []
+        elif args[-1:] == ["-stay_open"] and arg == "False":
+            break
+        else:
+            args.append(arg)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,149 @@
+"""
+    基準測試用的合成資料: 1 Hz 軌跡, 內嵌 Novatek freeGPS 區塊的最小 MP4, 以及替代 exiftool 的腳本
+    不需要真實的行車記錄器影像, 也不需要安裝 exiftool
+"""
+import os
+import stat
+import struct
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+START = datetime(2025, 5, 23, 7, 54, 19)
+MP4_EPOCH = datetime(1904, 1, 1)
+TIMESCALE, FRAME_DELTA = 30000, 1001  # 29.97 fps
+
+
+def synthetic_track(n: int, seed: int = 0) -> dict:
+    """
+        由台北出發, 速度與方向緩慢變化的 1 Hz 軌跡 ( 時間為 UTC )
+        傳回 {"time": datetime64[s], "lat", "lon", "speed" (km/h), "track" (度)}
+    """
+    rng = np.random.default_rng(seed)
+    speed = np.clip(50 + np.cumsum(rng.normal(0, 1.5, n)), 0, 110)
+    track = np.mod(45 + np.cumsum(rng.normal(0, 3, n)), 360)
+    step = speed / 3.6  # 每秒移動的公尺數
+    lat = 25.0330 + np.cumsum(step * np.cos(np.radians(track))) / 111320
+    lon = 121.5654 + np.cumsum(step * np.sin(np.radians(track))) / (111320 * np.cos(np.radians(25.0330)))
+    return {
+        "time": np.datetime64(START, "s") + np.arange(n).astype("timedelta64[s]"),
+        "lat": lat, "lon": lon, "speed": speed, "track": track,
+    }
+
+
+def gps_dict(track: dict) -> dict:
+    """
+        與 readMp4Gps / exiftool 相同格式的 GPS 資訊 ( 供 _buildExifDf 使用 )
+    """
+    return {
+        "GPSDateTime": [x.replace("-", ":").replace("T", " ")
+                        for x in np.datetime_as_string(track["time"], unit="s").tolist()],
+        "GPSLatitude": track["lat"],
+        "GPSLongitude": track["lon"],
+        "GPSSpeed": track["speed"],
+        "GPSTrack": track["track"],
+    }
+
+
+def _box(kind: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", 8 + len(body)) + kind + body
+
+
+def track_path(path: Path) -> Path:
+    # write_mp4 一併寫入的原始軌跡 ( <影像>.npz ), fake_exiftool 由此產生輸出
+    return Path(f"{path}.npz")
+
+
+def write_mp4(path: Path, track: dict) -> Path:
+    """
+        只含 moov ( mvhd, 影像軌的 mdhd / hdlr / stts, udta/gps 索引表 ) 與 freeGPS 區塊的 MP4
+        mvhd 的 creation_time 為最後一筆 GPS 的下一秒, 與行車記錄器相同為錄影結束時間
+        原始軌跡另存於 track_path(path)
+    """
+    n = len(track["lat"])
+    times = track["time"].astype(datetime)
+
+    def _nmea(value: float) -> float:
+        return int(value) * 100 + (value - int(value)) * 60
+
+    ftyp = _box(b"ftyp", b"isom\0\0\0\0")
+    mdat = _box(b"mdat", b"\0" * 1024)
+    offset = len(ftyp) + len(mdat)
+    blocks, table = [], []
+    for t, lat, lon, speed, track_ in zip(times, track["lat"].tolist(), track["lon"].tolist(),
+                                          (track["speed"] / 1.852).tolist(), track["track"].tolist()):
+        # 區塊開頭為 "free" + "GPS ", 資料位於區塊偏移 48 ( 新版韌體 )
+        body = b"GPS " + b"\0" * 36 + struct.pack(
+            "<6I4c4f", t.hour, t.minute, t.second, t.year - 2000, t.month, t.day,
+            b"A", b"N", b"E", b"\0", _nmea(lat), _nmea(lon), speed, track_)
+        block = _box(b"free", body)
+        table.append(struct.pack(">II", offset, len(block)))
+        blocks.append(block)
+        offset += len(block)
+
+    createTime = int((times[-1] + timedelta(seconds=1) - MP4_EPOCH).total_seconds()) if n else 0
+    mvhd = _box(b"mvhd", struct.pack(">IIIII", 0, createTime, createTime, 1000, n * 1000) + b"\0" * 80)
+    samples = int(n * TIMESCALE / FRAME_DELTA)
+    mdhd = _box(b"mdhd", struct.pack(">IIIII", 0, 0, 0, TIMESCALE, min(samples * FRAME_DELTA, 0xFFFFFFFF)) + b"\0" * 4)
+    hdlr = _box(b"hdlr", b"\0" * 8 + b"vide" + b"\0" * 13)
+    stts = _box(b"stts", struct.pack(">IIII", 0, 1, samples, FRAME_DELTA))
+    trak = _box(b"trak", _box(b"mdia", mdhd + hdlr + _box(b"minf", _box(b"stbl", stts))))
+    gps = _box(b"gps ", struct.pack(">II", 0x101, 0) + b"".join(table))
+    moov = _box(b"moov", mvhd + trak + _box(b"udta", gps))
+
+    with open(path, "wb") as f:
+        f.write(ftyp)
+        f.write(mdat)
+        f.writelines(blocks)
+        f.write(moov)
+    np.savez(track_path(path), **{name: track[name] for name in ("time", "lat", "lon", "speed", "track")})
+    return Path(path)
+
+
+def write_osm(path: Path, track: dict, spacing: float = 100.0, branch: float = 100.0) -> Path:
+    """
+        沿著軌跡的 OSM XML 道路網 ( 地圖比對用 ): 每行駛 spacing 公尺一個節點的雙向道路,
+        每個節點另有往左右各 branch 公尺的支線
+    """
+    distance = np.concatenate(([0.0], np.cumsum(track["speed"][1:] / 3.6)))
+    index = np.flatnonzero(np.diff(np.floor(distance / spacing), prepend=-1) != 0)
+    lat, lon = track["lat"][index], track["lon"][index]
+    track_angle = np.radians(track["track"][index] + 90)
+    mlat = 111320.0
+    mlon = mlat * np.cos(np.radians(lat))
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6">']
+    for i, (a, o) in enumerate(zip(lat.tolist(), lon.tolist())):
+        lines.append(f'  <node id="{i + 1}" lat="{a:.7f}" lon="{o:.7f}"/>')
+    lines.append('  <way id="1">' + "".join(f'<nd ref="{i + 1}"/>' for i in range(len(lat))) +
+                 '<tag k="highway" v="primary"/></way>')
+    node, way = len(lat) + 1, 2
+    for i in range(len(lat)):
+        for side in (1, -1):
+            a = lat[i] + side * branch * np.cos(track_angle[i]) / mlat
+            o = lon[i] + side * branch * np.sin(track_angle[i]) / mlon[i]
+            lines.append(f'  <node id="{node}" lat="{a:.7f}" lon="{o:.7f}"/>')
+            lines.append(f'  <way id="{way}"><nd ref="{i + 1}"/><nd ref="{node}"/>'
+                         '<tag k="highway" v="residential"/></way>')
+            node, way = node + 1, way + 1
+    lines.append("</osm>")
+    Path(path).write_text("\n".join(lines) + "\n")
+    return Path(path)
+
+
+def install_fake_exiftool(directory: Path) -> Path:
+    """
+        在 directory 建立名為 exiftool 的執行檔 ( 呼叫 fake_exiftool.py ), 將 directory 加到 PATH 最前面即可取代 exiftool
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    script = Path(__file__).resolve().parent / "fake_exiftool.py"
+    path = directory / "exiftool"
+    path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+    path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def prepend_path(directory: Path) -> None:
+    os.environ["PATH"] = f"{directory}{os.pathsep}{os.environ.get('PATH', '')}"
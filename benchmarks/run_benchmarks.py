@@ -0,0 +1,235 @@
+"""
+    整體基準測試: 以合成軌跡 / MP4 量測各階段在不同 GPS 點數下的時間、吞吐量與峰值記憶體
+    執行: python benchmarks/run_benchmarks.py [--sizes 60 3600 100000 1000000] [--only NAME ...]
+                                             [--json result.json] [--baseline old.json] [--full]
+    部分項目在大筆數時非常慢 ( ex: 將整個 GeoJSON 內嵌於 HTML ), 預設超過 limit 即略過, --full 時全部執行
+    --baseline 與先前的 --json 結果比較, 任一項目變慢超過 --threshold 倍時以非 0 結束 ( 供 CI 使用 )
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "module" / "Dashcam2GeoVis"))
+
+from fixtures import gps_dict, install_fake_exiftool, prepend_path, synthetic_track, track_path, write_mp4, write_osm
+
+CLIP = 3600  # 合併 / CSV 轉換時每個 GeoJSON 檔的點數 ( 1 小時 )
+
+
+def _video(n: int, workdir: Path):
+    from utlis.makeExif import _buildExifDf
+    from video2geojson import Video2GeoJson
+
+    data = gps_dict(synthetic_track(n))
+    df = _buildExifDf(data, "bench", 29.97, data["GPSDateTime"][0])
+    return Video2GeoJson.from_dataframe(Path("bench.MP4"), df)
+
+
+def _clips(n: int, workdir: Path) -> Path:
+    """
+        將 n 點的軌跡切成每檔 CLIP 點的 GeoJSON, 放在 workdir/clips-<n>
+    """
+    from utlis.makeExif import _buildExifDf
+    from video2geojson import Video2GeoJson
+
+    folder = workdir / f"clips-{n}"
+    if folder.exists():
+        return folder
+    folder.mkdir()
+    track = synthetic_track(n)
+    for i, start in enumerate(range(0, n, CLIP)):
+        part = {key: values[start:start + CLIP] for key, values in track.items()}
+        data = gps_dict(part)
+        df = _buildExifDf(data, f"2025052300{i:04d}", 29.97, data["GPSDateTime"][0])
+        Video2GeoJson.from_dataframe(Path(f"2025052300{i:04d}.MP4"), df).save_geojson(folder)
+    return folder
+
+
+def _mp4(n: int, workdir: Path) -> Path:
+    path = workdir / f"track-{n}.MP4"
+    if not path.exists() or not track_path(path).exists():
+        write_mp4(path, synthetic_track(n))
+    return path
+
+
+def setup_makeexif_native(n: int, workdir: Path):
+    from utlis.makeExif import makeExifDf
+
+    path = _mp4(n, workdir)
+    return lambda: makeExifDf(path, backend="native")
+
+
+def setup_makeexif_exiftool(n: int, workdir: Path):
+    from utlis.exifTool import ExifTool
+    from utlis.makeExif import makeExifDf
+
+    path = _mp4(n, workdir)
+    et = ExifTool()
+    et.execute("-ver")  # 先啟動常駐程序, 不計入時間
+    return lambda: makeExifDf(path, et=et, backend="exiftool")
+
+
+def setup_feature_collection(n: int, workdir: Path):
+    video = _video(n, workdir)
+    return lambda: video.create_feature_collection("all")
+
+
+def setup_save_geojson(n: int, workdir: Path):
+    video = _video(n, workdir)
+    output = workdir / "save"
+    output.mkdir(exist_ok=True)
+    return lambda: video.save_geojson(output)
+
+
+def setup_calculate_distance(n: int, workdir: Path):
+    video = _video(n, workdir)
+    coordinates = list(zip(video.df["lon"], video.df["lat"]))
+    return lambda: video.calculate_distance(coordinates)
+
+
+def setup_merge_all_geojson(n: int, workdir: Path):
+    from main import merge_all_geojson
+
+    folder = _clips(n, workdir)
+    output = workdir / f"merged-{n}.geojson"
+    return lambda: merge_all_geojson(folder, output)
+
+
+def setup_json_to_csv(n: int, workdir: Path):
+    from utlis.json2csv import json_to_csv_with_fields
+
+    folder = _clips(n, workdir)
+    output = workdir / f"csv-{n}"
+    return lambda: json_to_csv_with_fields(folder, output)
+
+
+def setup_create_map(n: int, workdir: Path):
+    from GeoVis import create_map
+
+    video = _video(n, workdir)
+    path = Path(video.save_geojson(workdir))
+    output = workdir / f"map-{n}.html"
+    return lambda: create_map(path, output)
+
+
+def setup_map_match(n: int, workdir: Path):
+    import numpy as np
+    from utlis.mapMatch import RoadGraph
+
+    track = synthetic_track(n)
+    graph = RoadGraph.from_osm(write_osm(workdir / f"roads-{n}.osm", track))
+    # 加上 5 公尺的 GPS 誤差
+    rng = np.random.default_rng(0)
+    lat = track["lat"] + rng.normal(0, 5, n) / 111320
+    lon = track["lon"] + rng.normal(0, 5, n) / (111320 * np.cos(np.radians(track["lat"])))
+    epoch = track["time"].astype(np.int64)
+
+    def run():
+        graph._cache.clear()  # 每次都由空的最短路徑快取開始
+        return graph.match(lon, lat, epoch, track["speed"], track["track"])
+    return run
+
+
+# (名稱, setup, 預設執行的最大點數)
+BENCHMARKS = [
+    ("makeExifDf[native]", setup_makeexif_native, None),
+    ("makeExifDf[exiftool]", setup_makeexif_exiftool, 100_000),
+    ("create_feature_collection", setup_feature_collection, 100_000),
+    ("save_geojson", setup_save_geojson, None),
+    ("calculate_distance", setup_calculate_distance, None),
+    ("merge_all_geojson", setup_merge_all_geojson, None),
+    ("json_to_csv_with_fields", setup_json_to_csv, 100_000),
+    ("create_map", setup_create_map, 100_000),
+    ("map_match", setup_map_match, 100_000),
+]
+
+
+def measure(fn, memory: bool = True, min_time: float = 0.2) -> dict:
+    """
+        重複執行至累計 min_time 秒 ( 至少一次 ), 取最快的一次; 峰值記憶體另外以 tracemalloc 量測一次
+    """
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        while not timings or (sum(timings) < min_time and len(timings) < 50):
+            begin = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - begin)
+        peak = None
+        if memory:
+            tracemalloc.start()
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return {"seconds": min(timings), "runs": len(timings), "peak_bytes": peak}
+
+
+def compare(results: list, baseline_path: Path, threshold: float) -> list:
+    with open(baseline_path, "r") as f:
+        baseline = {(x["name"], x["size"]): x for x in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        old = baseline.get((result["name"], result["size"]))
+        if old is not None and result["seconds"] > old["seconds"] * threshold:
+            regressions.append((result, old))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashcam2GeoVis benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[60, 3600, 100_000, 1_000_000])
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="run only these benchmarks")
+    parser.add_argument("--full", action="store_true", help="ignore the per-benchmark size limits")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--json", type=Path, help="write results to this file")
+    parser.add_argument("--baseline", type=Path, help="compare against a previous --json result")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown factor counted as a regression")
+    parser.add_argument("--workdir", type=Path, help="keep generated fixtures here (default: temporary)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="dashcam-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    prepend_path(install_fake_exiftool(workdir / "bin").parent)
+
+    selected = [x for x in BENCHMARKS if not args.only or x[0] in args.only]
+    results = []
+    print(f"{'benchmark':<26} {'fixes':>9} {'seconds':>10} {'fixes/s':>12} {'peak MiB':>9}")
+    try:
+        for name, setup, limit in selected:
+            for n in args.sizes:
+                if limit is not None and n > limit and not args.full:
+                    print(f"{name:<26} {n:>9} {'skipped (use --full)':>33}")
+                    continue
+                with contextlib.redirect_stdout(io.StringIO()):
+                    fn = setup(n, workdir)
+                result = {"name": name, "size": n, **measure(fn, not args.no_memory)}
+                results.append(result)
+                peak = "" if result["peak_bytes"] is None else f"{result['peak_bytes'] / 2**20:.1f}"
+                print(f"{name:<26} {n:>9} {result['seconds']:>10.4f} {n / result['seconds']:>12,.0f} {peak:>9}")
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": platform.python_version(), "platform": platform.platform(),
+                       "results": results}, f, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold)
+        for result, old in regressions:
+            print(f"REGRESSION {result['name']} @ {result['size']}: "
+                  f"{old['seconds']:.4f}s -> {result['seconds']:.4f}s")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,25 @@
-from setuptools import setup, find_packages
+from setuptools import setup
 
 setup(
     name='your_project_name',
     version='0.1.0',
-    packages=find_packages(where='src'),
-    package_dir={'': 'src'},
+    # 原始碼以 Dashcam2GeoVis 為根目錄 ( 模組間以 import main / from utlis.x import ... 互相引用 )
+    package_dir={'': 'src/module/Dashcam2GeoVis'},
+    py_modules=['cli', 'main', 'video2geojson', 'GeoVis'],
+    packages=['utlis'],
+    install_requires=[
+        'numpy',
+        'pandas',
+        'pyproj',
+        'geojson',
+        'tqdm',
+        'folium',
+        'pyarrow',
+        'scipy',
+    ],
+    entry_points={
+        'console_scripts': [
+            'dashcam=cli:main',
+        ],
+    },
 )
@@ -1,24 +1,90 @@
+import argparse
+import json
+import os
 import folium
+from folium.plugins import VectorGridProtobuf
 from pathlib import Path
 
 
-def create_map(geojson_path: Path, output_path: Path):
+def create_map(geojson_path: Path, output_path: Path, tiles_url: str = None, max_zoom: int = 16,
+               location: list = None):
+    """
+        tiles_url 為 None 時將整個 GeoJSON 內嵌於 HTML,
+        否則改由向量圖磚 ( ex: "http://127.0.0.1:8000/tiles/{z}/{x}/{y}.pbf" ) 依畫面範圍載入
+    """
 
-    MAP = folium.Map(location=[25.0330, 121.5654],
+    MAP = folium.Map(location=location if location is not None else [25.0330, 121.5654],
                      zoom_start=12)  # Taipei, Taiwan
 
-    folium.GeoJson(geojson_path).add_to(MAP)
+    if tiles_url is None:
+        # folium 只將 str 視為檔案路徑
+        folium.GeoJson(os.fspath(geojson_path)).add_to(MAP)
+    else:
+        options = {
+            "vectorTileLayerStyles": {"tracks": {"color": "#3388ff", "weight": 3}},
+            "maxNativeZoom": max_zoom,
+        }
+        VectorGridProtobuf(tiles_url, "tracks", options).add_to(MAP)
 
     folium.LayerControl().add_to(MAP)
 
     MAP.save(output_path)
 
 
+def create_tiled_map(tiles_dir: Path, output_path: Path, tiles_url: str = "tiles/{z}/{x}/{y}.pbf"):
+    """
+        依 build_tiles 產生的 metadata.json 建立載入向量圖磚的地圖
+    """
+    with open(Path(tiles_dir) / "metadata.json", "r") as f:
+        metadata = json.load(f)
+    create_map(None, output_path, tiles_url, metadata["maxzoom"], metadata["center"])
+
+
+def build_tiled_map(source: Path, output_dir: Path, min_zoom: int = 5, max_zoom: int = 16) -> str:
+    """
+        由合併的 GeoJSON 或 TrackStore 資料夾建立 output_dir/tiles 與載入圖磚的 output_dir/index.html
+        傳回 index.html 的路徑
+    """
+    from utlis.vectorTiles import build_tiles, lines_from_geojson, lines_from_store
+
+    source, output_dir = Path(source), Path(output_dir)
+    if source.is_dir():
+        from utlis.trackStore import TrackStore
+        lines = lines_from_store(TrackStore(source))
+    else:
+        lines = lines_from_geojson(source)
+    build_tiles(lines, output_dir / "tiles", min_zoom, max_zoom)
+    create_tiled_map(output_dir / "tiles", output_dir / "index.html")
+    return os.path.join(output_dir, "index.html")
+
+
 def main():
-    geojson_path = r"output\20250319\20250407140747.geojson"
-    output_path = r"output\20250319\20250407140747.html"
+    from utlis.vectorTiles import serve_tiles
+
+    parser = argparse.ArgumentParser(description="Visualize dashcam tracks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("map", help="inline a geojson file into one html page")
+    p.add_argument("geojson_path", type=Path)
+    p.add_argument("output_path", type=Path)
+
+    p = subparsers.add_parser("tiles", help="build vector tiles and a map that loads them on demand")
+    p.add_argument("source", type=Path, help="merged geojson file or track store directory")
+    p.add_argument("output_dir", type=Path)
+    p.add_argument("--min-zoom", type=int, default=5)
+    p.add_argument("--max-zoom", type=int, default=16)
+
+    p = subparsers.add_parser("serve", help="preview a tiled map on a local tile server")
+    p.add_argument("directory", type=Path)
+    p.add_argument("--port", type=int, default=8000)
 
-    create_map(geojson_path, output_path)
+    args = parser.parse_args()
+    if args.command == "map":
+        create_map(args.geojson_path, args.output_path)
+    elif args.command == "tiles":
+        print(f"Tiled map saved to {build_tiled_map(args.source, args.output_dir, args.min_zoom, args.max_zoom)}")
+    elif args.command == "serve":
+        serve_tiles(args.directory, args.port)
 
 
 if __name__ == "__main__":
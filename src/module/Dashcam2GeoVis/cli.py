@@ -0,0 +1,300 @@
+"""
+    dashcam 指令: ingest / merge / map / export / index / query / match
+    建立 parser 時只使用標準函式庫, pandas, pyproj, folium 等套件在執行各子指令時才載入,
+    --help 與查詢等短指令不必等待整個轉換流程的相依套件
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+
+def add_ingest_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("video_dir", type=Path)
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--type", default="all",
+                        choices=["all", "point", "line"])
+    parser.add_argument("--backend", default="auto",
+                        choices=["auto", "native", "exiftool"])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--pipeline", default="batch", choices=["batch", "async"],
+                        help="async overlaps scanning, GPS extraction, conversion and writing")
+    parser.add_argument("--extract-workers", type=int, default=4,
+                        help="concurrent exiftool processes in the async pipeline")
+    parser.add_argument("--write-workers", type=int, default=2,
+                        help="concurrent writers in the async pipeline")
+    parser.add_argument("--force", action="store_true",
+                        help="reprocess every video even if it is unchanged since the last run")
+    parser.add_argument("--hash", action="store_true", dest="hash_content",
+                        help="also compare a content hash of each video (slower)")
+    parser.add_argument("--compact", action="store_true",
+                        help="write geojson without indentation (about half the size)")
+    parser.add_argument("--store", type=Path, dest="store_dir",
+                        help="also write each track to this columnar (parquet) track store")
+    parser.add_argument("--simplify", action="append", default=[], metavar="TYPE=SPEC",
+                        help="simplify one output type, e.g. line=dp:5 (Douglas-Peucker, 5 m), "
+                             "point=time:10 (every 10 s) or point=dist:50 (every 50 m)")
+    parser.add_argument("--clean", nargs="?", const="filter", metavar="SPEC",
+                        help="drop GPS outliers before writing; optionally smooth with "
+                             "median:5 (5-point moving median) or kalman:3 (3 m/s^2 acceleration noise)")
+    parser.add_argument("--metrics", type=Path, metavar="PATH",
+                        help="append per-stage timings, fix counts and bytes written to this JSON lines file")
+    parser.add_argument("--prometheus", type=Path, metavar="PATH",
+                        help="write per-stage totals to this Prometheus textfile (node_exporter textfile collector)")
+    parser.add_argument("--profile", type=Path, dest="profile_dir", metavar="DIR",
+                        help="write a cProfile dump (<video>.prof) for each video to this directory")
+    add_cache_arguments(parser)
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--cache", type=Path, dest="cache_dir", metavar="DIR",
+                        help="cache extracted tracks in this directory and reuse them for unchanged inputs "
+                             "(off unless given; the same directory can be shared by ingest and export)")
+    parser.add_argument("--cache-size", type=int, default=1024, metavar="MB",
+                        help="evict least recently used cache entries above this size")
+
+
+def run_ingest(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    from main import convert_video_to_geojson
+    from utlis.simplify import parse_spec
+    from utlis.gpsClean import parse_spec as parse_clean_spec
+
+    for x in args.simplify:
+        if "=" not in x:
+            parser.error(f"--simplify expects TYPE=SPEC, e.g. line=dp:5, got '{x}'")
+    simplify = dict(x.split("=", 1) for x in args.simplify)
+    for key, spec in simplify.items():
+        if key not in ("point", "line"):
+            parser.error(f"--simplify type must be 'point' or 'line', got '{key}'")
+    try:
+        for spec in simplify.values():
+            parse_spec(spec)
+        if args.clean:
+            parse_clean_spec(args.clean)
+    except ValueError as e:
+        parser.error(str(e))
+
+    convert_video_to_geojson(args.video_dir, args.output_dir, type=args.type, backend=args.backend,
+                             workers=args.workers, force=args.force, hash_content=args.hash_content,
+                             compact=args.compact, store_dir=args.store_dir, simplify=simplify,
+                             clean=args.clean, pipeline=args.pipeline, extract_workers=args.extract_workers,
+                             write_workers=args.write_workers, metrics=args.metrics, prometheus=args.prometheus,
+                             profile_dir=args.profile_dir, cache_dir=args.cache_dir, cache_size=args.cache_size << 20)
+
+
+def run_merge(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    from main import merge_all_geojson
+
+    merge_all_geojson(args.dir, args.output_path, args.seq, args.compact,
+                      args.start_date, args.end_date, args.pattern)
+
+
+def run_map(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    from GeoVis import build_tiled_map, create_map
+
+    if args.tiles:
+        print(f"Tiled map saved to {build_tiled_map(args.source, args.output, args.min_zoom, args.max_zoom)}")
+    elif args.source.is_dir():
+        parser.error("a track store directory can only be drawn with --tiles")
+    else:
+        create_map(args.source, args.output)
+        print(f"Map saved to {args.output}")
+
+
+def run_export(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if args.format == "csv":
+        from utlis.json2csv import json_to_csv_with_fields
+
+        if args.cache_dir is None:
+            json_to_csv_with_fields(args.input_dir, args.output_dir, args.jobs)
+            return
+        from utlis.trackCache import TrackCache, set_default_cache
+
+        cache = TrackCache(args.cache_dir, args.cache_size << 20)
+        set_default_cache(cache)
+        try:
+            json_to_csv_with_fields(args.input_dir, args.output_dir, args.jobs)
+        finally:
+            set_default_cache(None)
+        # 子程序各自累加快取大小, 結束後再依實際大小清除一次
+        cache.evict()
+    else:
+        from utlis.gjsonfilter import batch_process_geojson
+        batch_process_geojson(args.input_dir, args.output_dir, args.jobs, args.compact)
+
+
+def run_index(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if args.video_dir is None and args.store_dir is None:
+        parser.error("one of --videos or --store is required")
+    if args.index_type == "space":
+        from utlis.spatialIndex import SpatialIndex, build_index
+
+        with SpatialIndex(args.index, args.cell_size) as index:
+            print(f"Indexed {build_index(index, args.video_dir, args.store_dir)} clips into {args.index}")
+        return
+
+    from utlis.timeIndex import TimeIndex, build_index
+
+    index = TimeIndex(args.index)
+    count = build_index(index, args.video_dir, args.store_dir)
+    index.save()
+    print(f"Indexed {count} clips into {index.path}")
+
+
+def run_query(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if args.index_type == "space":
+        from utlis.spatialIndex import SpatialIndex
+
+        with SpatialIndex(args.index) as index:
+            begin = time.perf_counter()
+            if args.bbox:
+                results = index.query_bbox(*args.bbox)
+            elif args.radius:
+                results = index.query_radius(*args.radius)
+            else:
+                results = index.query_polygon([tuple(map(float, x.split(","))) for x in args.polygon])
+            elapsed = (time.perf_counter() - begin) * 1000
+        for r in results:
+            print(f"{r['filename']}\tsec {r['sec_start']}-{r['sec_end']}\tframe {r['frame_start']}-{r['frame_end']}")
+        print(f"{len(results)} results in {elapsed:.1f} ms")
+        return
+
+    from utlis.timeIndex import TimeIndex
+
+    index = TimeIndex(args.index)
+    if args.end is None:
+        for r in index.at(args.start):
+            print(f"{r['filename']}\tsec {r['sec']}\tframe {r['frame']}")
+    else:
+        for r in index.range(args.start, args.end):
+            print(f"{r['filename']}\t{r['start']} - {r['end']}\t"
+                  f"sec {r['sec_start']}-{r['sec_end']}\tframe {r['frame_start']}-{r['frame_end']}")
+
+
+def run_match(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    from utlis.mapMatch import CoverageDB, load_graph, pending_runs, update_coverage
+    from utlis.timeIndex import parse_time
+    from utlis.trips import read_clips, stitch_trips, store_paths, video_paths
+
+    with CoverageDB(args.db) as db:
+        if args.video_dir is not None or args.store_dir is not None:
+            if args.store_dir is not None:
+                from utlis.trackStore import TrackStore
+                paths = store_paths(TrackStore(args.store_dir))
+            else:
+                paths = video_paths(args.video_dir)
+            # 只讀取新影像與受影響的行程, 每段各自串接
+            runs = pending_runs(db, [x.stem for x in paths])
+            trips = (trip for start, end in runs
+                     for trip in stitch_trips(read_clips(paths[start:end]), args.max_gap, args.max_jump))
+            graph = load_graph(args.roads) if runs else None
+            result = update_coverage(db, graph, trips, args.jobs, radius=args.radius)
+            print(f"Read {sum(end - start for start, end in runs)} of {len(paths)} clips; "
+                  f"matched {result['matched']} trips ({result['skipped']} unchanged): "
+                  f"{result['fixes']} fixes -> {result['passes']} segment passes")
+        stats = db.stats()
+        print(f"{stats['segments']} segments covered by {stats['trips']} trips in {args.db}")
+        if args.export is not None:
+            since = parse_time(args.since) if args.since else None
+            print(f"Saved {db.export_geojson(args.export, args.compact, since)} segments to {args.export}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="dashcam", description="Dashcam GPS tracks to GeoJSON, maps and indexes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("ingest", help="convert dashcam videos to geojson")
+    add_ingest_arguments(p)
+    p.set_defaults(run=run_ingest)
+
+    p = subparsers.add_parser("merge", help="merge the geojson files under a directory into one file")
+    p.add_argument("dir", type=Path)
+    p.add_argument("-o", "--output", type=Path, dest="output_path",
+                   help="defaults to <dir>/<today>.geojson")
+    p.add_argument("--seq", action="store_true", help="write GeoJSONSeq (one feature per line)")
+    p.add_argument("--compact", action="store_true", help="write geojson without indentation")
+    p.add_argument("--start-date", metavar="YYYYMMDD", help="only files named from this date on")
+    p.add_argument("--end-date", metavar="YYYYMMDD", help="only files named up to this date")
+    p.add_argument("--pattern", help="only files whose name matches this glob, e.g. '20250523*'")
+    p.set_defaults(run=run_merge)
+
+    p = subparsers.add_parser("map", help="draw tracks on an html map")
+    p.add_argument("source", type=Path, help="geojson file, or a track store directory with --tiles")
+    p.add_argument("output", type=Path, help="html file, or an output directory with --tiles")
+    p.add_argument("--tiles", action="store_true",
+                   help="build vector tiles and a map that loads them on demand instead of inlining the geojson")
+    p.add_argument("--min-zoom", type=int, default=5)
+    p.add_argument("--max-zoom", type=int, default=16)
+    p.set_defaults(run=run_map)
+
+    p = subparsers.add_parser("export", help="export the points of each geojson file")
+    p.add_argument("format", choices=["csv", "points"],
+                   help="csv: one csv per file; points: geojson with only points and a unix timestamp")
+    p.add_argument("input_dir", type=Path)
+    p.add_argument("output_dir", type=Path)
+    p.add_argument("--jobs", type=int, default=1, help="number of worker processes")
+    p.add_argument("--compact", action="store_true", help="write geojson without indentation (points only)")
+    add_cache_arguments(p)
+    p.set_defaults(run=run_export)
+
+    p = subparsers.add_parser("index", help="build a spatial or time index of clips")
+    indexes = p.add_subparsers(dest="index_type", required=True)
+    for name, help in (("space", "grid index of where each clip was recorded"),
+                       ("time", "interval index of when each clip was recorded")):
+        q = indexes.add_parser(name, help=help)
+        q.add_argument("index", type=Path, help="index file" if name == "space" else "index file or directory")
+        q.add_argument("--videos", type=Path, dest="video_dir")
+        q.add_argument("--store", type=Path, dest="store_dir")
+        if name == "space":
+            q.add_argument("--cell-size", type=float, default=200.0)
+    p.set_defaults(run=run_index)
+
+    p = subparsers.add_parser("query", help="look up clips in a spatial or time index")
+    queries = p.add_subparsers(dest="index_type", required=True)
+    q = queries.add_parser("space", help="clips that pass through an area")
+    q.add_argument("index", type=Path)
+    group = q.add_mutually_exclusive_group(required=True)
+    group.add_argument("--bbox", type=float, nargs=4, metavar=("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"))
+    group.add_argument("--radius", type=float, nargs=3, metavar=("LON", "LAT", "METERS"))
+    group.add_argument("--polygon", nargs="+", metavar="LON,LAT")
+    q = queries.add_parser("time", help="clips recorded at a time or within a time range")
+    q.add_argument("index", type=Path, help="index file or directory")
+    q.add_argument("start", help="'YYYY:MM:DD HH:MM:SS' or ISO 8601 (UTC unless an offset is given)")
+    q.add_argument("end", nargs="?", help="end of the range, inclusive")
+    p.set_defaults(run=run_query)
+
+    p = subparsers.add_parser("match", help="match trips to an OSM road network and count passes per road segment")
+    p.add_argument("roads", type=Path, help="OSM XML extract (.osm, .osm.gz, .osm.bz2) or a saved graph (.npz)")
+    p.add_argument("db", type=Path, help="SQLite coverage database, created if missing")
+    source = p.add_mutually_exclusive_group()
+    source.add_argument("--videos", type=Path, dest="video_dir")
+    source.add_argument("--store", type=Path, dest="store_dir")
+    p.add_argument("--jobs", type=int, default=1, help="number of worker processes")
+    p.add_argument("--radius", type=float, default=30.0, help="candidate search radius (m)")
+    p.add_argument("--max-gap", type=int, default=60, help="max time gap between clips of a trip (s)")
+    p.add_argument("--max-jump", type=float, default=200.0, help="max distance between clips of a trip (m)")
+    p.add_argument("--export", type=Path, metavar="PATH", help="write the covered segments to this geojson")
+    p.add_argument("--since", help="only export segments seen at or after this time")
+    p.add_argument("--compact", action="store_true", help="write geojson without indentation")
+    p.set_defaults(run=run_match)
+
+    return parser
+
+
+def main(argv: list = None) -> None:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    args.run(parser, args)
+
+
+def index_main(index_type: str, argv: list) -> None:
+    """
+        python -m utlis.spatialIndex / utlis.timeIndex 的進入點
+        "build ..." 即 dashcam index <index_type> ..., "query ..." 即 dashcam query <index_type> ...
+    """
+    command, *rest = argv or ["--help"]
+    main([{"build": "index"}.get(command, command), index_type, *rest])
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,59 +1,230 @@
 import os
+import argparse
+import asyncio
 from pathlib import Path
 import glob
-from video2geojson import Video2GeoJson
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.util import Finalize
+from utlis.exifTool import ExifTool
+from utlis.ingestManifest import IngestManifest
+from utlis.geojsonWriter import dumps_feature, write_feature_collection
+from utlis.metrics import METRICS, file_size, timed
 from tqdm import tqdm
-import geojson
 import datetime
+import fnmatch
+import json
+import re
 
 
-def merge_all_geojson(dir: Path):
-    geojson_files = glob.glob(f"{dir}/**/*.geojson", recursive=True)
+@timed("merge_all_geojson", bytes=lambda result, *args, **kwargs: file_size(result))
+def merge_all_geojson(dir: Path, output_path: Path = None, seq: bool = False, compact: bool = False,
+                      start_date: str = None, end_date: str = None, pattern: str = None):
+    """
+        逐檔讀取 dir 底下的 geojson 並直接串流寫入合併檔, 不在記憶體中累積所有 Feature
+        seq: 輸出每行一個 Feature 的 GeoJSONSeq ( .geojsonl )
+        start_date, end_date: 依檔名開頭的日期 ( YYYYMMDD ) 篩選, 含頭尾
+        pattern: 依檔名篩選 ( fnmatch, ex: "20250523*" )
+        先前的合併檔 ( dir 底下以日期命名的 YYYYMMDD.geojson ) 不會被重複合併
+    """
+    if output_path is None:
+        suffix = "geojsonl" if seq else "geojson"
+        output_path = os.path.join(dir, f"{datetime.datetime.now().strftime('%Y%m%d')}.{suffix}")
 
-    all_faetures = []
+    geojson_files = [x for x in sorted(glob.glob(f"{dir}/**/*.geojson", recursive=True))
+                     if _is_merge_input(Path(x), Path(dir), Path(output_path), start_date, end_date, pattern)]
 
-    for geojson_file in geojson_files:
-        with open(geojson_file, "r") as f:
-            data = geojson.load(f)
-            all_faetures.extend(data["features"])
+    # 先寫入暫存檔再取代, 中途失敗不會留下不完整的合併檔
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w") as f:
+        features = _iter_geojson_features(geojson_files)
+        if seq:
+            for feature in features:
+                f.write(dumps_feature(feature, compact=True) + "\n")
+        else:
+            write_feature_collection(
+                f, (dumps_feature(feature, compact) for feature in features), compact)
+    os.replace(tmp_path, output_path)
 
-    combined_feature_collection = geojson.FeatureCollection(all_faetures)
+    print(f"Combined geojson saved to {output_path}")
+    return output_path
 
-    merged_geojson_path = os.path.join(dir, f"{datetime.datetime.now().strftime('%Y%m%d')}.geojson")
-    with open(merged_geojson_path, "w") as f:
-        geojson.dump(combined_feature_collection, f, indent=2)
 
-    print(f"Combined geojson saved to {merged_geojson_path}")
+def _is_merge_input(path: Path, dir: Path, output_path: Path, start_date: str, end_date: str, pattern: str) -> bool:
+    if path.resolve() == output_path.resolve():
+        return False
+    if path.parent.resolve() == dir.resolve() and re.fullmatch(r"\d{8}", path.stem):
+        return False
+    if pattern is not None and not fnmatch.fnmatch(path.name, pattern):
+        return False
+    if start_date is not None or end_date is not None:
+        date = re.match(r"\d{8}", path.stem)
+        if date is None:
+            return False
+        if start_date is not None and date.group() < start_date:
+            return False
+        if end_date is not None and date.group() > end_date:
+            return False
+    return True
 
 
-def convert_video_to_geojson(video_dir: Path, output_dir: Path, type: str = "all"):
+def _iter_geojson_features(geojson_files: list):
+    # 一次只載入一個檔案
+    for geojson_file in geojson_files:
+        with open(geojson_file, "r") as f:
+            data = json.load(f)
+        yield from data["features"]
+
+
+def convert_video_to_geojson(video_dir: Path, output_dir: Path, type: str = "all", backend: str = "auto", workers: int = 1,
+                             force: bool = False, hash_content: bool = False, compact: bool = False,
+                             store_dir: Path = None, simplify: dict = None, clean: str = None,
+                             pipeline: str = "batch", extract_workers: int = 4, write_workers: int = 2,
+                             metrics: Path = None, prometheus: Path = None, profile_dir: Path = None,
+                             cache_dir: Path = None, cache_size: int = None):
+    """
+        metrics: 各階段的耗時 / GPS 點數 / 寫入位元組數以 JSON lines 附加到此檔
+        prometheus: 各階段的累計值寫成 Prometheus textfile
+        profile_dir: 每支影像的 cProfile 結果 ( <檔名>.prof ) 輸出到此資料夾
+        cache_dir: GPS 讀取結果的快取資料夾 ( utlis.trackCache ), 上限 cache_size 位元組
+    """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
+    METRICS.configure(metrics, prometheus, profile_dir)
+    if cache_dir is not None:
+        from utlis.trackCache import TrackCache, set_default_cache
+        set_default_cache(TrackCache(cache_dir, **({"max_bytes": cache_size} if cache_size else {})))
+
+    # 只處理新增或變更的影像 ( force 時全部重新處理 ), 輸出設定不同時也重新處理
+    output_spec = _output_spec(type, compact, simplify, clean)
+    manifest = IngestManifest(output_dir, hash_content, force)
+
+    if pipeline == "async":
+        from utlis.asyncIngest import ingest_async
+
+        # 掃描, 讀取 GPS, 轉換與寫檔同時進行, workers 為轉換階段的 process 數
+        results, fingerprints, mp4_files = asyncio.run(ingest_async(
+            video_dir, output_dir, manifest, output_spec, type, backend, compact, store_dir, simplify, clean,
+            extract_workers, workers, write_workers))
+    else:
+        # 排序後處理, 讓錯誤回報與合併結果的順序固定
+        mp4_files = sorted(Path(x) for x in glob.glob(
+            f"{video_dir}/**/*.mp4", recursive=True))
+
+        fingerprints = {mp4_file: manifest.fingerprint(mp4_file) for mp4_file in mp4_files}
+        stale = [mp4_file for mp4_file in mp4_files
+                 if not manifest.is_fresh(mp4_file, fingerprints[mp4_file], output_spec)]
+
+        if workers > 1:
+            results = _convert_files_parallel(
+                stale, output_dir, type, backend, workers, compact, store_dir, simplify, clean)
+        else:
+            # 整批影像共用一個常駐的 exiftool 程序
+            with ExifTool() as et:
+                results = [_convert_file(mp4_file, output_dir, type, backend, compact, store_dir, simplify, clean, et)
+                           for mp4_file in tqdm(stale, desc="Converting video information to geojson")]
+
+    for mp4_file, output_path, error in results:
+        if error is not None:
+            print(f"Error processing in {mp4_file}: {error}")
+            manifest.discard(mp4_file)
+        else:
+            manifest.record(mp4_file, fingerprints[mp4_file], output_path, output_spec)
+    # 記錄本次輸出後才清除已刪除影像的紀錄與輸出, 避免刪掉剛寫入的同名輸出檔
+    manifest.prune(video_dir, mp4_files)
+    manifest.save()
+    print(manifest.summary())
+    if cache_dir is not None:
+        # 子程序各自累加快取大小, 整批結束後再依實際大小清除一次
+        from utlis.trackCache import get_default_cache
+        get_default_cache().evict()
+
+    merge_all_geojson(output_dir)
+
+    if METRICS.enabled:
+        METRICS.flush()
+        print(METRICS.summary())
 
-    mp4_files = [Path(x) for x in glob.glob(
-        f"{video_dir}/**/*.mp4", recursive=True)]
-
-    for mp4_file in tqdm(mp4_files, desc="Converting video information to geojson"):
-    # for mp4_file in mp4_files:
-        # print(f"Processing {mp4_file}...")
-        # if os.path.exists(os.path.join(video_dir, mp4_file.stem + ".gpx")):
-        #     try:
-        #         pano2geojson = PanoramaVideo2GeoJson(
-        #             mp4_file, os.path.join(video_dir, mp4_file.stem + ".gpx"))
-        #         pano2geojson.save_geojson(output_dir=output_dir)
-        #     except Exception as e:
-        #         print(f"Error processing in {mp4_file}: {e}")
-        # else:
+
+def _output_spec(type: str, compact: bool, simplify: dict, clean: str = None) -> str:
+    # 記錄於 manifest 的輸出設定, ex: "all", "line|compact|line=dp:5|clean=median:5"
+    spec = [type] + (["compact"] if compact else []) + \
+        [f"{key}={value}" for key, value in sorted((simplify or {}).items())] + \
+        ([f"clean={clean}"] if clean else [])
+    return "|".join(spec)
+
+
+_worker_exiftool = None
+
+
+def _init_worker(metrics_config: dict = None, cache=None):
+    """
+        每個子程序各自維持一個常駐的 exiftool 程序, 子程序結束時關閉
+        metrics_config 為主程序的 METRICS.config(), 子程序的紀錄隨轉換結果送回主程序
+        cache 為主程序的預設快取 ( 磁碟快取共用, 記憶體快取各自獨立 )
+    """
+    global _worker_exiftool
+    from utlis.trackCache import set_default_cache
+    set_default_cache(cache)
+    METRICS.configure(**(metrics_config or {}))
+    METRICS.drain()
+    _worker_exiftool = ExifTool()
+    Finalize(_worker_exiftool, _worker_exiftool.close, exitpriority=10)
+
+
+def _convert_file(mp4_file: Path, output_dir: Path, type: str, backend: str, compact: bool = False,
+                  store_dir: Path = None, simplify: dict = None, clean: str = None, et: ExifTool = None):
+    from video2geojson import PanoramaVideo2GeoJson, Video2GeoJson
+
+    # 同名的 .gpx ( ex: 360 相機另外輸出的軌跡 ) 存在時以 GPX 為 GPS 來源
+    gpx_file = mp4_file.with_suffix(".gpx")
+    with METRICS.file(mp4_file):
         try:
-            video2geojson = Video2GeoJson(mp4_file)
-            video2geojson.save_geojson(output_dir=output_dir, type = type)
+            with METRICS.stage("convert_file") as counts:
+                if gpx_file.exists():
+                    video2geojson = PanoramaVideo2GeoJson(mp4_file, gpx_file, clean=clean)
+                else:
+                    video2geojson = Video2GeoJson(
+                        mp4_file, et if et is not None else _worker_exiftool, backend, clean=clean)
+                output_path = video2geojson.save_geojson(output_dir=output_dir, type = type, compact=compact, simplify=simplify)
+                if store_dir is not None:
+                    from utlis.trackStore import TrackStore
+                    TrackStore(store_dir).write(video2geojson.track)
+                counts["fixes"], counts["bytes"] = len(video2geojson.track), file_size(output_path)
         except Exception as e:
-            print(f"Error processing in {mp4_file}: {e}")
+            return mp4_file, None, str(e)
+    return mp4_file, output_path, None
+
+
+def _convert_file_in_worker(*args) -> tuple:
+    # 子程序用: 轉換結果與這支影像的 METRICS 紀錄
+    return _convert_file(*args), METRICS.drain()
+
 
-    merge_all_geojson(outptut_dir)
+def _convert_files_parallel(mp4_files: list, output_dir: Path, type: str, backend: str, workers: int, compact: bool,
+                            store_dir: Path, simplify: dict, clean: str = None) -> list:
+    """
+        以 process pool 平行轉換, 依完成順序更新進度條, 結果依 mp4_files 的順序傳回
+    """
+    from utlis.trackCache import get_default_cache
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(METRICS.config(), get_default_cache())) as executor:
+        futures = [executor.submit(_convert_file_in_worker, mp4_file, output_dir, type, backend, compact, store_dir, simplify, clean)
+                   for mp4_file in mp4_files]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Converting video information to geojson"):
+            result, events = future.result()
+            METRICS.merge(events)
+            results[result[0]] = result
+
+    return [results[mp4_file] for mp4_file in mp4_files]
 
 
 if __name__ == "__main__":
-    dir = Path(r'H:\DCIM\Movie')
-    outptut_dir = Path(r'D:\MyProject\DashcamRouteMapper\output\20250508')
-    convert_video_to_geojson(dir, outptut_dir, type="all")
+    # 參數定義與 dashcam ingest 共用
+    from cli import add_ingest_arguments, run_ingest
+
+    parser = argparse.ArgumentParser(
+        description="Convert dashcam videos to geojson")
+    add_ingest_arguments(parser)
+    run_ingest(parser, parser.parse_args())
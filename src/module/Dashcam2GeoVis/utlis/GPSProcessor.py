@@ -1,70 +1,116 @@
-import gpxpy
-import gpxpy.gpx
-import folium
 import os
-from scipy.interpolate import interp1d
-from datetime import datetime, timedelta
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from functools import cached_property
 import numpy as np
+import pandas as pd
+
+
+def read_gpx_arrays(file_path) -> dict:
+    """
+        以 iterparse 串流讀取 GPX 的 trkpt, 直接存入 NumPy 陣列 ( 不建立逐點的 dict )
+        傳回 {"time": unix timestamp (float), "lat", "lon", "ele"}, 無高度時為 NaN
+        沒有時間 ( 或時間無法解析 ) 的點無法內插, 直接捨棄
+    """
+    times, lats, lons, eles = [], [], [], []
+    time, ele = None, None
+    parents = []
+    for event, elem in ET.iterparse(file_path, events=("start", "end")):
+        if event == "start":
+            parents.append(elem)
+            continue
+        parents.pop()
+        tag = elem.tag.rsplit("}", 1)[-1]
+        if tag == "time":
+            time = elem.text
+        elif tag == "ele":
+            ele = elem.text
+        elif tag in ("trkpt", "metadata", "wpt", "rtept"):
+            if tag == "trkpt":
+                times.append(time)
+                lats.append(elem.get("lat"))
+                lons.append(elem.get("lon"))
+                eles.append(ele if ele is not None else "nan")
+            time, ele = None, None
+            # 處理完即自父節點移除, 記憶體不隨點數增加
+            if parents:
+                parents[-1].remove(elem)
+
+    times = pd.to_datetime(pd.Series(times, dtype=object), utc=True, format="ISO8601", errors="coerce")
+    timed = times.notna().to_numpy()
+    track = {
+        "time": times.to_numpy("datetime64[ns]").astype(np.int64)[timed] / 1e9,
+        "lat": np.asarray(lats, dtype=np.float64)[timed],
+        "lon": np.asarray(lons, dtype=np.float64)[timed],
+        "ele": np.asarray(eles, dtype=np.float64)[timed],
+    }
+    # 時間需遞增才能內插
+    if len(track["time"]) > 1 and (np.diff(track["time"]) < 0).any():
+        order = np.argsort(track["time"], kind="stable")
+        track = {key: values[order] for key, values in track.items()}
+    return track
+
+
+def interpolate_track(track: dict, times) -> dict:
+    """
+        以 np.interp 將軌跡內插至任意時間 ( unix timestamp 陣列, ex: 每個影格的時間 )
+        超出軌跡時間範圍的時間點為 NaN
+    """
+    times = np.asarray(times, dtype=np.float64)
+    result = {"time": times}
+    for key in ("lat", "lon", "ele"):
+        result[key] = np.interp(times, track["time"], track[key], left=np.nan, right=np.nan)
+    return result
 
 
 class GPXProcessor:
     def __init__(self, file_path):
         self.file_path = file_path
-        self.track_pts = self.read_gpx()
-
-    def read_gpx(self):
         try:
-            with open(self.file_path, 'r') as f:
-                gpx = gpxpy.parse(f)
-
-                track_pts = []
-
-                for track in gpx.tracks:
-                    for segment in track.segments:
-                        for point in segment.points:
-                            track_pts.append({
-                                'time': point.time,
-                                'lat': point.latitude,
-                                'lon': point.longitude,
-                                'ele': point.elevation
-                            })
-
-                return track_pts
-
+            self.track = read_gpx_arrays(file_path)
         except Exception as e:
             print(f"Error reading GPX file: {e}")
+            self.track = None
 
-    def interpolate_gpx(self, frequency=2):
+    @cached_property
+    def track_pts(self):
+        # 第一次存取時建立並保留
+        return self.read_gpx()
 
+    def read_gpx(self):
+        # 相容舊介面: 逐點的 dict 清單, 讀取失敗時為 None; 大檔案請直接使用 self.track 陣列
+        track = self.track
+        if track is None:
+            return None
+        return [{'time': datetime.fromtimestamp(t, timezone.utc), 'lat': lat, 'lon': lon,
+                 'ele': None if np.isnan(ele) else ele}
+                for t, lat, lon, ele in zip(track["time"].tolist(), track["lat"].tolist(),
+                                            track["lon"].tolist(), track["ele"].tolist())]
+
+    def interpolate_arrays(self, frequency=2):
+        """
+            每 1/frequency 秒內插一點, 傳回陣列 ( 與 interpolate_gpx 相同的時間點 )
+        """
         if frequency < 1:
             raise ValueError("Frequency must be at least 1")
 
-        if len(self.track_pts) < 2:
+        if self.track is None or len(self.track["time"]) < 2:
             raise ValueError("Track points must be at least 2")
 
-        time = [pt['time'].timestamp() for pt in self.track_pts]
-        lat = [pt['lat'] for pt in self.track_pts]
-        lon = [pt['lon'] for pt in self.track_pts]
-        ele = [pt['ele'] for pt in self.track_pts]
-
-        time_interval = 1 / frequency
-        new_times = np.arange(time[0], time[-1], time_interval)
-
-        lat_interp = interp1d(time, lat, kind='linear')
-        lon_interp = interp1d(time, lon, kind='linear')
-        ele_interp = interp1d(time, ele, kind='linear')
-
-        new_datetimes = [datetime.fromtimestamp(t) for t in new_times]
-        new_lats = lat_interp(new_times)
-        new_lons = lon_interp(new_times)
-        new_eles = ele_interp(new_times)
+        time = self.track["time"]
+        new_times = np.arange(time[0], time[-1], 1 / frequency)
+        return interpolate_track(self.track, new_times)
 
-        interpolated_points = [{'time': t, 'lat': l, 'lon': lon, 'ele': ele}
-                               for t, l, lon, ele in zip(new_datetimes, new_lats, new_lons, new_eles)]
-
-        return interpolated_points
+    def interpolate_gpx(self, frequency=2):
+        # 相容舊介面: 傳回逐點的 dict 清單 ( 本地時間 )
+        points = self.interpolate_arrays(frequency)
+        return [{'time': datetime.fromtimestamp(t), 'lat': lat, 'lon': lon, 'ele': ele}
+                for t, lat, lon, ele in zip(points["time"].tolist(), points["lat"].tolist(),
+                                            points["lon"].tolist(), points["ele"].tolist())]
 
     def draw_tracking(self, track_pts, output_file=None):
+        import folium  # folium 載入很慢, 只在繪圖時載入
+
         map = folium.Map(
             location=[track_pts[0]['lat'], track_pts[0]['lon']], zoom_start=12)
 
@@ -79,7 +125,7 @@ if __name__ == "__main__":
     gpx_file_path = r"data\raw\insta360\Guilin_Rd.gpx"
     gpx_processor = GPXProcessor(gpx_file_path)
 
-    original_track_pts = gpx_processor.track_pts
+    original_track_pts = gpx_processor.read_gpx()
     print(f"Original track points length: {len(original_track_pts)}")
     output_file = os.path.join(r'output', 'original_gpx_tracking.html')
     gpx_processor.draw_tracking(original_track_pts, output_file)
@@ -0,0 +1,197 @@
+import asyncio
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from tqdm import tqdm
+from utlis.exifTool import AsyncExifTool
+from utlis.ingestManifest import IngestManifest
+from utlis.geojsonWriter import write_feature_collection
+from utlis.metrics import METRICS, file_size
+
+_DONE = object()
+
+
+def _scanDir(path: str) -> tuple[list, list]:
+    # 單一資料夾的子資料夾與 mp4 ( 與 glob("**/*.mp4") 相同只比對小寫副檔名 )
+    dirs, files = [], []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.path)
+            elif entry.name.endswith(".mp4") and entry.is_file():
+                files.append(Path(entry.path))
+    return sorted(dirs), sorted(files)
+
+
+def _initRender(metrics_config: dict, cache) -> None:
+    from utlis.trackCache import set_default_cache
+
+    METRICS.configure(**metrics_config)
+    METRICS.drain()
+    set_default_cache(cache)
+
+
+def _render(mp4_file: Path, extracted: tuple, type: str, compact: bool, simplify: dict, clean: str,
+            keep_track: bool, backend: str = "auto") -> tuple:
+    """
+        CPU 階段 ( 於 process pool 執行 ): 建立DataFrame 與 GeoJSON 字串
+        extracted 為 None 時表示同名 .gpx 存在, 改以 PanoramaVideo2GeoJson 處理,
+        為DataFrame 時表示快取中已有 makeExifDf 的結果
+        傳回 (GeoJSON 字串, 要寫入 TrackStore 的 Track 或 None, 這支影像的 METRICS 紀錄)
+    """
+    from utlis.makeExif import _buildExifDf
+    from utlis.trackCache import get_default_cache
+    from video2geojson import PanoramaVideo2GeoJson, Video2GeoJson
+
+    with METRICS.file(mp4_file):
+        try:
+            with METRICS.stage("render") as counts:
+                if extracted is None:
+                    video = PanoramaVideo2GeoJson(mp4_file, mp4_file.with_suffix(".gpx"), clean=clean)
+                elif isinstance(extracted, tuple):
+                    data, fps, startDate = extracted
+                    df = _buildExifDf(data, mp4_file.stem, fps, startDate)
+                    if (cache := get_default_cache()) is not None:
+                        cache.put(mp4_file, df, backend)
+                    if not data:
+                        raise ValueError("No GPS data found in video")
+                    video = Video2GeoJson.from_dataframe(mp4_file, df, clean=clean)
+                else:
+                    video = Video2GeoJson.from_dataframe(mp4_file, extracted, clean=clean)
+                buffer = io.StringIO()
+                write_feature_collection(buffer, video.iter_features(type, compact, simplify), compact)
+                counts["fixes"] = len(video.track)
+        except Exception as e:
+            # 錯誤訊息之外也要把紀錄送回主程序
+            e.metrics = METRICS.drain()
+            raise
+    return buffer.getvalue(), video.track if keep_track else None, METRICS.drain()
+
+
+def _write(output_path: Path, text: str, track, store_dir: Path) -> None:
+    with METRICS.stage("write") as counts:
+        with open(output_path, "w") as f:
+            f.write(text)
+        counts["bytes"] = file_size(output_path)
+        if track is not None:
+            from utlis.trackStore import TrackStore
+            TrackStore(store_dir).write(track)
+
+
+async def ingest_async(video_dir: Path, output_dir: Path, manifest: IngestManifest, output_spec: str,
+                       type: str = "all", backend: str = "auto", compact: bool = False, store_dir: Path = None,
+                       simplify: dict = None, clean: str = None, extract_workers: int = 4, cpu_workers: int = None,
+                       write_workers: int = 2, queue_size: int = 16) -> tuple[list, dict, list]:
+    """
+        以 asyncio 重疊各階段: 掃描資料夾 -> 讀取 GPS ( 常駐 exiftool 子程序 / 內建解析器 )
+        -> 轉換 ( process pool ) -> 寫檔, 階段之間以有上限的 queue 相連, 下游較慢時上游會等待
+        manifest 中未變更的影像在掃描階段即略過
+        傳回 ([(mp4_file, output_path, error), ...] 依檔名排序, {mp4_file: 指紋}, 掃描到的所有影像)
+    """
+    # pandas 等套件在開始轉換時才載入
+    from utlis.makeExif import _extractNativeGps, _parseExifExtractEmbeddedData, _parseExifStartTime
+    from utlis.trackCache import get_default_cache
+
+    loop = asyncio.get_running_loop()
+    cpu_workers = cpu_workers or os.cpu_count() or 1
+    found, fingerprints, results = [], {}, []
+    progress = tqdm(desc="Converting video information to geojson", unit="file")
+
+    to_extract = asyncio.Queue(queue_size)
+    to_render = asyncio.Queue(queue_size)
+    to_write = asyncio.Queue(queue_size)
+
+    async def scan():
+        pending = [str(video_dir)]
+        while pending:
+            dirs, files = await asyncio.to_thread(_scanDir, pending.pop())
+            pending.extend(reversed(dirs))
+            for mp4_file in files:
+                found.append(mp4_file)
+                fingerprint = await asyncio.to_thread(manifest.fingerprint, mp4_file)
+                if manifest.is_fresh(mp4_file, fingerprint, output_spec):
+                    continue
+                fingerprints[mp4_file] = fingerprint
+                progress.total = len(fingerprints)
+                progress.refresh()
+                await to_extract.put(mp4_file)
+
+    async def read_gps(et: AsyncExifTool, mp4_file: Path):
+        if mp4_file.with_suffix(".gpx").exists():
+            return None
+        if (cache := get_default_cache()) is not None:
+            df = await asyncio.to_thread(cache.get, mp4_file, backend)
+            if df is not None:
+                return df
+        extracted = await asyncio.to_thread(_extractNativeGps, mp4_file, backend)
+        if extracted is not None:
+            return extracted
+        with METRICS.stage("_getExifExtractEmbeddedData") as counts:
+            data = _parseExifExtractEmbeddedData((await et.execute("-ee", "-T", "-GPS*", str(mp4_file)))[:-1])
+            counts["fixes"] = len(data.get("GPSDateTime", []))
+        with METRICS.stage("_getExifStartTime"):
+            fps, startDate = _parseExifStartTime((await et.execute(
+                "-s", str(mp4_file), "-VideoFrameRate", "-CreateDate", "-Duration"))[:-1])
+        return data, fps, startDate
+
+    async def extract():
+        et = AsyncExifTool()
+        try:
+            while (mp4_file := await to_extract.get()) is not _DONE:
+                try:
+                    with METRICS.file(mp4_file, profile=False):
+                        extracted = await read_gps(et, mp4_file)
+                except Exception as e:
+                    results.append((mp4_file, None, str(e)))
+                    progress.update()
+                    continue
+                await to_render.put((mp4_file, extracted))
+        finally:
+            await et.close()
+
+    async def render(executor):
+        while (item := await to_render.get()) is not _DONE:
+            mp4_file, extracted = item
+            try:
+                text, track, events = await loop.run_in_executor(
+                    executor, _render, mp4_file, extracted, type, compact, simplify, clean, store_dir is not None, backend)
+                METRICS.merge(events)
+            except Exception as e:
+                METRICS.merge(getattr(e, "metrics", []))
+                results.append((mp4_file, None, str(e)))
+                progress.update()
+                continue
+            await to_write.put((mp4_file, text, track))
+
+    async def write():
+        while (item := await to_write.get()) is not _DONE:
+            mp4_file, text, track = item
+            output_path = os.path.join(output_dir, f"{mp4_file.stem}.geojson")
+            try:
+                with METRICS.file(mp4_file, profile=False):
+                    await asyncio.to_thread(_write, output_path, text, track, store_dir)
+                results.append((mp4_file, output_path, None))
+            except Exception as e:
+                results.append((mp4_file, None, str(e)))
+            progress.update()
+
+    async def stage(workers: list, downstream: asyncio.Queue, count: int):
+        # 一個階段的所有 worker 結束後, 通知下一個階段的每個 worker 結束
+        await asyncio.gather(*workers)
+        for _ in range(count):
+            await downstream.put(_DONE)
+
+    with ProcessPoolExecutor(max_workers=cpu_workers, initializer=_initRender,
+                             initargs=(METRICS.config(), get_default_cache())) as executor:
+        try:
+            await asyncio.gather(
+                stage([scan()], to_extract, extract_workers),
+                stage([extract() for _ in range(extract_workers)], to_render, cpu_workers),
+                stage([render(executor) for _ in range(cpu_workers)], to_write, write_workers),
+                *[write() for _ in range(write_workers)],
+            )
+        finally:
+            progress.close()
+
+    return sorted(results, key=lambda x: x[0]), fingerprints, found
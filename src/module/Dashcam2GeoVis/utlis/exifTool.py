@@ -0,0 +1,127 @@
+import asyncio
+import subprocess
+
+
+class ExifTool:
+    """
+        常駐的 exiftool 程序 ( exiftool -stay_open True -@ - )
+        整張記憶卡只需啟動一次 Perl 直譯器, 每次查詢經由 stdin 傳入參數,
+        並以 {ready} 作為每次輸出的結尾
+        程序在第一次查詢時才啟動, 未用到 exiftool 時不會產生額外成本
+    """
+
+    def __init__(self, executable: str = "exiftool") -> None:
+        self.executable = executable
+        self.process = None
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.process = subprocess.Popen(
+            [self.executable, "-stay_open", "True", "-@", "-",
+             "-common_args", "-charset", "filename=utf8"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            encoding="utf-8",
+            errors="replace",
+        )
+
+    def execute(self, *args) -> str:
+        """
+            送出一次查詢並傳回輸出內容 ( 與 os.popen 讀到的內容相同, 不含 {ready} )
+        """
+        if not self.running:
+            self.start()
+        self.process.stdin.write("\n".join(str(x) for x in args) + "\n-execute\n")
+        self.process.stdin.flush()
+
+        lines = []
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise RuntimeError("exiftool process terminated unexpectedly")
+            if line.rstrip("\r\n") == "{ready}":
+                break
+            lines.append(line)
+        return "".join(lines)
+
+    def close(self) -> None:
+        if self.process is None:
+            return
+        if self.running:
+            try:
+                self.process.stdin.write("-stay_open\nFalse\n")
+                self.process.stdin.flush()
+                self.process.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    def __enter__(self) -> "ExifTool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class AsyncExifTool:
+    """
+        asyncio 版本的常駐 exiftool 程序 ( asyncio.create_subprocess_exec )
+        等待 exiftool 輸出時不佔用事件迴圈, 可同時開多個讓讀卡機 I/O 與其他工作重疊
+    """
+
+    def __init__(self, executable: str = "exiftool") -> None:
+        self.executable = executable
+        self.process = None
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self.process = await asyncio.create_subprocess_exec(
+            self.executable, "-stay_open", "True", "-@", "-",
+            "-common_args", "-charset", "filename=utf8",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+
+    async def execute(self, *args) -> str:
+        """
+            送出一次查詢並傳回輸出內容 ( 與 ExifTool.execute 相同, 不含 {ready} )
+        """
+        if not self.running:
+            await self.start()
+        self.process.stdin.write(("\n".join(str(x) for x in args) + "\n-execute\n").encode("utf-8"))
+        await self.process.stdin.drain()
+
+        lines = []
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                raise RuntimeError("exiftool process terminated unexpectedly")
+            line = line.decode("utf-8", errors="replace")
+            if line.rstrip("\r\n") == "{ready}":
+                break
+            lines.append(line.replace("\r\n", "\n"))
+        return "".join(lines)
+
+    async def close(self) -> None:
+        if self.process is None:
+            return
+        if self.running:
+            try:
+                self.process.stdin.write(b"-stay_open\nFalse\n")
+                await self.process.stdin.drain()
+                await asyncio.wait_for(self.process.wait(), timeout=10)
+            except (OSError, asyncio.TimeoutError):
+                self.process.kill()
+                await self.process.wait()
+        self.process = None
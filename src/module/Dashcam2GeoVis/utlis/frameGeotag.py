@@ -0,0 +1,102 @@
+import argparse
+import csv
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from utlis.makeExif import exif_epochs, makeExifDf
+from utlis.track import Track
+
+FIELDS = ("frame", "time", "lat", "lon", "azimuth", "speed")
+CHUNK = 1 << 16
+
+
+def _fixes(clip) -> dict:
+    """
+        由 Track, makeExifDf 的DataFrame ( 或影像路徑 ) 取出依 frame 排序的 GPS 點陣列
+        方位角先 unwrap ( 359 -> 1 度視為 +2 度 ), 內插後再取 360 的餘數
+    """
+    if isinstance(clip, Track):
+        columns = {"time": clip.epoch, "lat": clip.lat, "lon": clip.lon, "azimuth": clip.azimuth,
+                   "speed": clip.speed, "frame": clip.frame, "fps": clip.fps}
+    else:
+        df = clip if isinstance(clip, pd.DataFrame) else makeExifDf(Path(clip))
+        if df.empty:
+            raise ValueError("No GPS data found in video")
+        columns = {"time": exif_epochs(df["datetime"]), "lat": df["lat"], "lon": df["lon"], "azimuth": df["azimuth"],
+                   "speed": df["speed"], "frame": df["frame"], "fps": df["fps"].iloc[0]}
+    frame = np.asarray(columns["frame"], dtype=np.int64)
+    order = np.argsort(frame, kind="stable")
+    frame = frame[order]
+    # np.interp 需要遞增的 x, 同一個 frame 只保留第一筆
+    first = np.concatenate(([True], np.diff(frame) != 0))
+    order, frame = order[first], frame[first]
+    return {
+        "frame": frame.astype(np.float64),
+        "time": np.asarray(columns["time"], dtype=np.float64)[order],
+        "lat": np.asarray(columns["lat"], dtype=np.float64)[order],
+        "lon": np.asarray(columns["lon"], dtype=np.float64)[order],
+        "azimuth": np.degrees(np.unwrap(np.radians(np.asarray(columns["azimuth"], dtype=np.float64)[order]))),
+        "speed": np.asarray(columns["speed"], dtype=np.float64)[order],
+        "fps": float(columns["fps"]),
+    }
+
+
+def _frameRange(fixes: dict, start: int, stop: int) -> tuple:
+    # 預設涵蓋第 0 個影格到最後一筆 GPS 所在的那一秒結束
+    if stop is None:
+        stop = int(fixes["frame"][-1]) + int(np.ceil(fixes["fps"]))
+    return max(int(start), 0), int(stop)
+
+
+def _interpolate(fixes: dict, frames: np.ndarray) -> dict:
+    x = frames.astype(np.float64)
+    result = {"frame": frames}
+    for key in FIELDS[1:]:
+        result[key] = np.interp(x, fixes["frame"], fixes[key])
+    result["azimuth"] = np.mod(result["azimuth"], 360)
+    return result
+
+
+def frame_geotags(clip, stride: int = 1, start: int = 0, stop: int = None, frames=None) -> dict:
+    """
+        一次計算所有取樣影格的位置, 傳回 {"frame", "time", "lat", "lon", "azimuth", "speed"} 陣列
+        clip: Track, makeExifDf 的DataFrame 或影像路徑
+        frames: 指定影格編號, 未指定時為 range(start, stop, stride)
+        時間為 unix timestamp ( GPS 時間, UTC ), 最前 / 最後一筆 GPS 之外的影格沿用端點的值
+    """
+    fixes = _fixes(clip)
+    if frames is None:
+        frames = np.arange(*_frameRange(fixes, start, stop), stride, dtype=np.int64)
+    return _interpolate(fixes, np.asarray(frames, dtype=np.int64))
+
+
+def iter_frame_geotags(clip, stride: int = 1, start: int = 0, stop: int = None, chunk: int = CHUNK):
+    """
+        逐一產生 (frame, time, lat, lon, azimuth, speed), 每次只內插 chunk 個影格
+        一小時 60 fps 的影像也不需要一次建立所有影格的陣列
+    """
+    fixes = _fixes(clip)
+    start, stop = _frameRange(fixes, start, stop)
+    step = chunk * stride
+    for begin in range(start, stop, step):
+        values = _interpolate(fixes, np.arange(begin, min(begin + step, stop), stride, dtype=np.int64))
+        yield from zip(*(values[key].tolist() for key in FIELDS))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interpolate a position for every n-th video frame")
+    parser.add_argument("video", type=Path)
+    parser.add_argument("--stride", type=int, default=1, help="emit every n-th frame")
+    parser.add_argument("-o", "--output", type=Path, help="csv file (default: <video>.frames.csv)")
+    parser.add_argument("--cache", type=Path, metavar="DIR", help="extraction cache directory (utlis.trackCache)")
+    args = parser.parse_args()
+    if args.cache:
+        from utlis.trackCache import TrackCache, set_default_cache
+        set_default_cache(TrackCache(args.cache))
+
+    output = args.output or args.video.with_suffix(".frames.csv")
+    with open(output, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerows(iter_frame_geotags(args.video, args.stride))
+    print(f"Frame geotags saved to {output}")
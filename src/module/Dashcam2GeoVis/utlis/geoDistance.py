@@ -0,0 +1,37 @@
+import numpy as np
+from pyproj import Geod
+
+_WGS84 = Geod(ellps="WGS84")
+_EARTH_RADIUS = 6371008.8  # 平均地球半徑 (公尺)
+
+
+def segment_distances(lon, lat, mode: str = "geodesic") -> np.ndarray:
+    """
+        一次計算所有相鄰 GPS 點之間的距離 (公尺), 傳回長度為 n-1 的陣列
+        mode:
+            "geodesic" : pyproj.Geod.inv 批次計算 WGS84 橢球距離 ( 與 geopy.distance.geodesic 相同演算法 )
+            "haversine": 球面近似, 速度較快, 誤差約 0.5% 以內
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    if len(lon) < 2:
+        return np.zeros(0)
+
+    if mode == "geodesic":
+        _, _, distances = _WGS84.inv(lon[:-1], lat[:-1], lon[1:], lat[1:])
+        return np.asarray(distances)
+    elif mode == "haversine":
+        lon, lat = np.radians(lon), np.radians(lat)
+        a = np.sin(np.diff(lat) / 2) ** 2 + \
+            np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+        return 2 * _EARTH_RADIUS * np.arcsin(np.sqrt(a))
+    else:
+        raise ValueError("Invalid mode. Choose 'geodesic' or 'haversine'.")
+
+
+def cumulative_distances(lon, lat, mode: str = "geodesic") -> np.ndarray:
+    """
+        每個 GPS 點距離起點的累計距離 (公尺), 長度與輸入相同, 第一點為 0
+    """
+    distances = segment_distances(lon, lat, mode)
+    return np.concatenate(([0.0], np.cumsum(distances)))
@@ -0,0 +1,131 @@
+import json
+from datetime import datetime, timedelta
+import numpy as np
+
+# 與 geojson 套件相同, 座標四捨五入至小數第 6 位
+COORDINATE_PRECISION = 6
+
+
+def local_timestamps(datetimes) -> np.ndarray:
+    """
+        將 "YYYY:MM:DD HH:MM:SS" 字串整批轉為 unix timestamp
+        與 datetime.strptime(...).timestamp() 相同, 視為本地時間
+    """
+    # 只寫出 JSON 時 ( ex: 合併 ) 不需要 pandas, 在此才載入
+    from utlis.makeExif import exif_epochs
+
+    return localize(exif_epochs(datetimes))
+
+
+def localize(naive) -> np.ndarray:
+    """
+        將視為 UTC 的 epoch ( ex: Track.epoch ) 改以本地時間解讀, 與 local_timestamps 相同
+    """
+    naive = np.asarray(naive, dtype=np.int64)
+    if len(naive) == 0:
+        return naive
+
+    def _offset(seconds: int) -> int:
+        local = datetime(1970, 1, 1) + timedelta(seconds=int(seconds))
+        return int(seconds) - int(local.timestamp())
+
+    # 一段影像內時區偏移通常相同, 只有跨越日光節約時間時才逐筆計算
+    first, last = _offset(naive[0]), _offset(naive[-1])
+    if first == last:
+        return naive - first
+    return np.array([s - _offset(s) for s in naive], dtype=np.int64)
+
+
+def _round(values) -> list:
+    return [round(x, COORDINATE_PRECISION) for x in np.asarray(values, dtype=np.float64).tolist()]
+
+
+def dumps_feature(obj, compact: bool = False) -> str:
+    if compact:
+        return json.dumps(obj, separators=(",", ":"))
+    # 與 geojson.dump(indent=2) 相同, Feature 位於第二層 ( 縮排 4 格 )
+    return "\n".join("    " + line for line in json.dumps(obj, indent=2).split("\n"))
+
+
+def _template(geometry_type: str, properties: list, compact: bool) -> str:
+    """
+        以佔位字串產生單一 Point Feature 的格式字串, 之後每個點只需 str.format
+    """
+    skeleton = {
+        "type": "Feature",
+        "geometry": {"type": geometry_type, "coordinates": ["@@0@@", "@@1@@"]},
+        "properties": {name: f"@@{i + 2}@@" for i, name in enumerate(properties)},
+    }
+    text = dumps_feature(skeleton, compact).replace("{", "{{").replace("}", "}}")
+    for i in range(len(properties) + 2):
+        text = text.replace(f'"@@{i}@@"', f"{{{i}}}")
+    return text
+
+
+def _column(values) -> list:
+    """
+        依型態轉為 JSON 字面值: 整數/浮點數直接以 repr 輸出 ( NaN 為 null ), 其餘以 json.dumps 輸出
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.integer):
+        return [str(x) for x in values.tolist()]
+    if np.issubdtype(values.dtype, np.floating):
+        return ["null" if x != x else repr(x) for x in values.tolist()]
+    return [json.dumps(x) for x in values.tolist()]
+
+
+def iter_point_features(lon, lat, properties: dict = {}, compact: bool = False):
+    """
+        由欄位陣列逐一產生 Point Feature 的 JSON 字串, 不建立任何 dict / Feature 物件
+        properties: {屬性名稱: 陣列}
+    """
+    template = _template("Point", list(properties), compact)
+    columns = [_column(values) for values in properties.values()]
+    for row in zip(_round(lon), _round(lat), *columns):
+        yield template.format(repr(row[0]), repr(row[1]), *row[2:])
+
+
+def line_feature(lon, lat, properties: dict, compact: bool = False) -> str:
+    """
+        產生單一 LineString Feature 的 JSON 字串, 座標直接組成字串 ( 不經由 json 編碼器逐一處理 )
+    """
+    feature = {
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": "@@C@@"},
+        "properties": properties,
+    }
+    text = dumps_feature(feature, compact)
+    pairs = list(zip(map(repr, _round(lon)), map(repr, _round(lat))))
+    if not pairs:
+        coordinates = "[]"
+    elif compact:
+        coordinates = "[" + ",".join(f"[{x},{y}]" for x, y in pairs) + "]"
+    else:
+        line = next(x for x in text.split("\n") if '"@@C@@"' in x)
+        indent = " " * (len(line) - len(line.lstrip()))
+        pair = indent + "  [\n" + indent + "    {},\n" + indent + "    {}\n" + indent + "  ]"
+        coordinates = "[\n" + ",\n".join(pair.format(x, y) for x, y in pairs) + "\n" + indent + "]"
+    return text.replace('"@@C@@"', coordinates, 1)
+
+
+def write_feature_collection(f, features, compact: bool = False) -> int:
+    """
+        將 Feature 字串逐一寫入 FeatureCollection, 傳回寫入的字元數
+        compact=False 時輸出與 geojson.dump(indent=2) 相同
+    """
+    if compact:
+        head, sep, tail, empty = '{"type":"FeatureCollection","features":[', ",", "]}", ""
+    else:
+        head, sep, tail, empty = '{\n  "type": "FeatureCollection",\n  "features": [', ",\n", "\n  ]\n}", "]\n}"
+
+    written = f.write(head)
+    first = True
+    for feature in features:
+        if first:
+            written += f.write("" if compact else "\n")
+            first = False
+        else:
+            written += f.write(sep)
+        written += f.write(feature)
+    written += f.write(empty if first and not compact else tail)
+    return written
@@ -1,51 +1,73 @@
-import geopandas as gpd
+import argparse
+import numpy as np
 import pandas as pd
-from datetime import datetime
 import os
+from concurrent.futures import ProcessPoolExecutor
+from utlis.json2csv import read_points
+from utlis.geojsonWriter import iter_point_features, write_feature_collection
 
-def to_unix_timestamp(dt):
-    if pd.isna(dt):
-        return None
-    try:
-        return int(pd.to_datetime(dt).timestamp())
-    except Exception as e:
-        print(f"無法轉換 datetime 值：{dt}，錯誤：{e}")
-        return None
+def to_unix_timestamps(values) -> np.ndarray:
+    """
+        datetime 字串整批轉為 unix timestamp, 無法轉換的值為 None ( 傳回 object 陣列 )
+        未帶時區的時間與 Timestamp.timestamp() 相同視為 UTC
+    """
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), errors="coerce", format="mixed", utc=True)
+    seconds = parsed.to_numpy("datetime64[ns]").astype(np.int64) // 10**9
+    result = seconds.astype(object)
+    result[parsed.isna().to_numpy()] = None
+    return result
 
-def process_geojson_file(input_path, output_path):
+def process_geojson_file(input_path, output_path, compact: bool = False) -> bool:
+    """
+        只保留 Point, 並以 unix timestamp 取代 datetime 屬性 ( 其餘屬性皆移除 )
+        缺少 datetime 屬性或處理失敗時傳回 False
+    """
     try:
-        gdf = gpd.read_file(input_path)
-
-        # 過濾出 Point 資料
-        gdf = gdf[gdf.geometry.type == 'Point'].copy()
-        # print(gdf.head())
-        if 'datetime' not in gdf.columns:
+        points = read_points(input_path)
+        props = points["properties"]
+        if not any("datetime" in p for p in props):
             print(f"檔案 {os.path.basename(input_path)} 缺少 'datetime' 欄位，跳過。")
-            return
+            return False
 
         # 加入 timestamp 欄位
-        gdf['timestamp'] = gdf['datetime'].apply(to_unix_timestamp)
-
-        # 移除原本的 datetime 欄位
-        gdf = gdf[['geometry', 'timestamp']]
+        timestamps = to_unix_timestamps([p.get("datetime") for p in props])
 
-        # 儲存新的 GeoJSON
-        gdf.to_file(output_path, driver='GeoJSON')
+        # 先寫入暫存檔再取代, 中途失敗不會留下不完整的檔案
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, "w") as f:
+            write_feature_collection(
+                f, iter_point_features(points["lon"], points["lat"], {"timestamp": timestamps}, compact), compact)
+        os.replace(tmp_path, output_path)
         print(f"✅ 已處理並儲存：{output_path}")
+        return True
     except Exception as e:
         print(f"❌ 處理失敗 {input_path}，錯誤：{e}")
+        return False
 
-def batch_process_geojson(input_folder, output_folder):
+def batch_process_geojson(input_folder, output_folder, jobs: int = 1, compact: bool = False) -> int:
+    """
+        處理 input_folder 底下的每個 .geojson, 輸出到 output_folder 的同名檔案
+        jobs > 1 時以 process pool 平行處理, 傳回成功處理的檔案數
+    """
     os.makedirs(output_folder, exist_ok=True)
 
-    for filename in os.listdir(input_folder):
-        if filename.lower().endswith('.geojson'):
-            input_path = os.path.join(input_folder, filename)
-            output_path = os.path.join(output_folder, filename)
-            process_geojson_file(input_path, output_path)
+    filenames = sorted(x for x in os.listdir(input_folder) if x.lower().endswith('.geojson'))
+    input_paths = [os.path.join(input_folder, x) for x in filenames]
+    output_paths = [os.path.join(output_folder, x) for x in filenames]
+    if jobs > 1 and len(filenames) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            done = list(executor.map(process_geojson_file, input_paths, output_paths,
+                                     [compact] * len(filenames), chunksize=4))
+    else:
+        done = [process_geojson_file(x, y, compact) for x, y in zip(input_paths, output_paths)]
+    return sum(done)
 
-# 🟡 修改這裡為你的資料夾路徑
-input_dir = r"D:\MyProject\DashcamRouteMapper\output\20250521"
-output_dir = r"D:\MyProject\DashcamRouteMapper\output\20250521_filtered"
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep only the points of each geojson file, with a unix timestamp")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--compact", action="store_true", help="write geojson without indentation")
+    args = parser.parse_args()
 
-batch_process_geojson(input_dir, output_dir)
+    batch_process_geojson(args.input_dir, args.output_dir, args.jobs, args.compact)
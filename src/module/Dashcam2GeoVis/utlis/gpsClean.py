@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from utlis.geoDistance import segment_distances
+from utlis.makeExif import _getDfTransGps, exif_epochs
+
+MAX_SPEED = 250.0       # km/h, 超過即視為跳點
+SPEED_RATIO = 2.0       # 推算速度超過回報速度的倍數 ( 加上 SPEED_SLACK ) 即視為跳點
+SPEED_SLACK = 40.0      # km/h
+MIN_RUN = 5             # 被跳點切開後, 少於此點數的片段 ( ex: 冷啟動的初始定位 ) 會被捨去
+MEASUREMENT_NOISE = 5.0  # 公尺, Kalman 濾波的定位誤差
+
+
+def _badEdges(lon, lat, epoch, speed, max_speed: float) -> np.ndarray:
+    """
+        相鄰兩點間推算的速度 ( 距離 / 時間差 ) 是否不合理, 長度 n-1
+    """
+    dt = np.diff(epoch)
+    implied = segment_distances(lon, lat, "haversine") / np.where(dt > 0, dt, 1) * 3.6
+    bad = implied > max_speed
+    if np.nan_to_num(speed).max(initial=0) > 0:  # 有回報速度時才比對
+        reported = np.fmax(speed[:-1], speed[1:])
+        bad |= implied > np.nan_to_num(reported) * SPEED_RATIO + SPEED_SLACK
+    return bad
+
+
+def clean_mask(df: pd.DataFrame, max_speed: float = MAX_SPEED, min_run: int = MIN_RUN,
+               passes: int = 3, epoch=None) -> np.ndarray:
+    """
+        找出 makeExifDf 結果中可信的 GPS 點, 傳回 bool 遮罩
+        1. 經緯度超出範圍, NaN 或 (0, 0)
+        2. 時間與前一個保留點相同 ( 重複的時間戳 )
+        3. 推算速度與前後點都不合理的單一跳點 ( 重複數輪, 每輪以陣列運算同時處理所有點 )
+        4. 被剩下的不合理線段切開後, 少於 min_run 點的片段 ( 保留最長的片段 )
+        epoch: 各點的時間 ( 秒, 可含小數, ex: 內插的軌跡 ), 未指定時由 datetime 欄位取得
+    """
+    lon = df["lon"].to_numpy(np.float64)
+    lat = df["lat"].to_numpy(np.float64)
+    speed = df["speed"].to_numpy(np.float64)
+    epoch = exif_epochs(df["datetime"]) if epoch is None else np.asarray(epoch, dtype=np.float64)
+
+    keep = np.isfinite(lon) & np.isfinite(lat) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180) \
+        & ~((lon == 0) & (lat == 0))
+    idx = np.flatnonzero(keep)
+    keep[idx[1:][np.diff(epoch[idx]) == 0]] = False
+
+    for _ in range(passes):
+        idx = np.flatnonzero(keep)
+        if len(idx) < 3:
+            break
+        bad = _badEdges(lon[idx], lat[idx], epoch[idx], speed[idx], max_speed)
+        if not bad.any():
+            break
+        # 頭尾點只有一側線段, 下一段正常時視為頭尾點本身的問題
+        spike = np.concatenate(([bad[0] and not bad[1]], bad[:-1] & bad[1:], [bad[-1] and not bad[-2]]))
+        if not spike.any():
+            break
+        keep[idx[spike]] = False
+
+    idx = np.flatnonzero(keep)
+    if len(idx) >= 2:
+        bad = _badEdges(lon[idx], lat[idx], epoch[idx], speed[idx], max_speed)
+        if bad.any():
+            run = np.concatenate(([0], np.cumsum(bad)))
+            sizes = np.bincount(run)
+            good = (sizes >= min_run) | (sizes == sizes.max())
+            keep[idx[~good[run]]] = False
+    return keep
+
+
+def median_filter(values, window: int) -> np.ndarray:
+    """
+        移動中位數 ( 兩端以端點值補齊, 長度不變 )
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if window < 2 or len(values) < 2:
+        return values.copy()
+    half = window // 2
+    padded = np.pad(values, (half, window - 1 - half), mode="edge")
+    return np.median(sliding_window_view(padded, window), axis=1)
+
+
+def kalman_filter(values, process_noise: float, measurement_noise: float = MEASUREMENT_NOISE,
+                  dt: float = 1.0) -> np.ndarray:
+    """
+        等速模型的穩態 Kalman 濾波 ( alpha-beta 濾波 )
+        增益固定時整個濾波為線性非時變系統, 以 lfilter 一次處理整個陣列
+        process_noise: 加速度標準差 (m/s^2), measurement_noise: 定位誤差 (公尺)
+    """
+    from scipy.signal import lfilter, lfilter_zi  # scipy 載入很慢, 只在使用 kalman 時載入
+
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        return values.copy()
+    # Kalata 的追蹤指數換算穩態增益
+    index = process_noise * dt * dt / measurement_noise
+    r = (4 + index - np.sqrt(8 * index + index * index)) / 4
+    alpha = 1 - r * r
+    beta = 2 * (2 - alpha) - 4 * np.sqrt(1 - alpha)
+    b, a = [alpha, beta - alpha], [1, -(2 - alpha - beta), 1 - alpha]
+    filtered, _ = lfilter(b, a, values, zi=lfilter_zi(b, a) * values[0])
+    return filtered
+
+
+def parse_spec(spec: str) -> tuple[str, float]:
+    """
+        "filter" ( 只移除異常點 ), "median:5" ( 另以 5 點移動中位數平滑 ),
+        "kalman:3" ( 另以 Kalman 濾波平滑, 加速度標準差 3 m/s^2 )
+    """
+    method, _, value = spec.partition(":")
+    if method == "filter" and not value:
+        return method, 0.0
+    if method not in ("median", "kalman") or not value:
+        raise ValueError(f"Invalid clean spec '{spec}'. Use 'filter', 'median:<points>' or 'kalman:<m/s^2>'.")
+    value = float(value)
+    if value <= 0:
+        raise ValueError(f"Invalid clean spec '{spec}'. The value must be positive.")
+    return method, value
+
+
+def clean_gps(df: pd.DataFrame, spec: str = "filter", epoch=None) -> pd.DataFrame:
+    """
+        移除異常點並依 spec 平滑, 傳回新的DataFrame ( index 重新編號, EPSG:3857 座標重新計算 )
+        平滑以 GPS 時間間隔的中位數為 dt, 一支影像內通常固定為 1 秒
+        epoch: 參考 clean_mask, datetime 欄位只到秒而取樣更密時需指定
+    """
+    method, value = parse_spec(spec)
+    if df.empty:
+        return df
+    epoch = exif_epochs(df["datetime"]) if epoch is None else np.asarray(epoch, dtype=np.float64)
+    keep = clean_mask(df, epoch=epoch)
+    df, epoch = df[keep].reset_index(drop=True), epoch[keep]
+    if method == "filter" or len(df) < 2:
+        return df
+
+    lon = df["lon"].to_numpy(np.float64)
+    lat = df["lat"].to_numpy(np.float64)
+    if method == "median":
+        lon, lat = median_filter(lon, int(value)), median_filter(lat, int(value))
+    else:
+        # 增益只取決於兩個噪聲的比值, 直接在經緯度上濾波即可
+        dt = float(np.median(np.diff(epoch)))
+        lon, lat = kalman_filter(lon, value, MEASUREMENT_NOISE, dt), kalman_filter(lat, value, MEASUREMENT_NOISE, dt)
+    df["lon"], df["lat"] = lon, lat
+    df["lon3857"], df["lat3857"] = _getDfTransGps(lon, lat)
+    return df
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+class IngestManifest:
+    """
+        記錄已轉換影像的指紋 ( 路徑, 大小, 修改時間, 選用的內容雜湊 ) 與輸出的 GeoJSON 路徑
+        存放於輸出資料夾的 .ingest_manifest.json, 重新執行時只處理新增或變更的影像
+    """
+
+    FILENAME = ".ingest_manifest.json"
+
+    def __init__(self, output_dir: Path, hash_content: bool = False, force: bool = False) -> None:
+        self.path = Path(output_dir) / self.FILENAME
+        self.hash_content = hash_content
+        self.force = force
+        self.entries = {}
+        self.hits, self.misses, self.removed = 0, 0, 0
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f).get("files", {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable manifest {self.path}: {e}")
+
+    @staticmethod
+    def _key(p: Path) -> str:
+        return str(Path(p).resolve())
+
+    def fingerprint(self, p: Path) -> dict:
+        """
+            取得影像的指紋, hash_content 時另外計算整個檔案的 sha1 ( 較慢 )
+            全景影像的 GPS 來自同名的 .gpx, 存在時一併記錄其指紋
+        """
+        fingerprint = self._fileFingerprint(p)
+        gpx = Path(p).with_suffix(".gpx")
+        if gpx.exists():
+            fingerprint["gpx"] = self._fileFingerprint(gpx)
+        return fingerprint
+
+    def _fileFingerprint(self, p: Path) -> dict:
+        stat = os.stat(p)
+        fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+        if self.hash_content:
+            h = hashlib.sha1()
+            with open(p, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            fingerprint["sha1"] = h.hexdigest()
+        return fingerprint
+
+    def is_fresh(self, p: Path, fingerprint: dict, type: str) -> bool:
+        """
+            指紋與輸出類型皆相同且輸出檔仍存在時視為不需重新處理, 並累計命中/未命中次數
+            force 時一律重新處理
+        """
+        entry = self.entries.get(self._key(p))
+        fresh = (
+            not self.force
+            and entry is not None
+            and entry.get("type") == type
+            and entry.get("size") == fingerprint["size"]
+            and entry.get("mtime") == fingerprint["mtime"]
+            and entry.get("sha1") == fingerprint.get("sha1", entry.get("sha1"))
+            and self._sameGpx(entry.get("gpx"), fingerprint.get("gpx"))
+            and os.path.exists(entry.get("output", ""))
+        )
+        if fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return fresh
+
+    @staticmethod
+    def _sameGpx(old: dict, new: dict) -> bool:
+        # .gpx 新增, 刪除或變更時都需要重新處理; 未計算 sha1 時只比較大小與修改時間
+        if old is None or new is None:
+            return old is new
+        return (old["size"] == new["size"] and old["mtime"] == new["mtime"]
+                and old.get("sha1") == new.get("sha1", old.get("sha1")))
+
+    def record(self, p: Path, fingerprint: dict, output: Path, type: str) -> None:
+        self.entries[self._key(p)] = {
+            **fingerprint, "type": type, "output": str(output)}
+
+    def discard(self, p: Path) -> None:
+        self.entries.pop(self._key(p), None)
+
+    def prune(self, video_dir: Path, paths: list) -> list:
+        """
+            移除 video_dir 底下已不存在 ( 不在本次掃描結果中 ) 的影像紀錄, 並刪除其輸出的 GeoJSON
+            ( 否則之後合併時仍會被納入 ); 其他影像仍使用同一個輸出檔時保留
+        """
+        root = Path(self._key(video_dir))
+        existing = {self._key(p) for p in paths}
+        # 不同磁碟機的路徑 ( Windows ) 不在 root 底下
+        removed = [key for key in self.entries if key not in existing and Path(key).is_relative_to(root)]
+        outputs = {self.entries.pop(key).get("output") for key in removed}
+        outputs -= {entry.get("output") for entry in self.entries.values()}
+        for output in outputs:
+            if output:
+                try:
+                    os.remove(output)
+                except FileNotFoundError:
+                    pass
+        self.removed += len(removed)
+        return removed
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "files": self.entries}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def summary(self) -> str:
+        return (f"Ingest cache: {self.hits} unchanged (skipped), "
+                f"{self.misses} new or modified, {self.removed} removed")
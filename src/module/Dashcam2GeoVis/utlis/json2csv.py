@@ -1,79 +1,117 @@
+import argparse
 import json
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from pyproj import Transformer
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from utlis.makeExif import _getDfTransGps
+
+FPS = 60
+CACHE_TAG = "geojson-csv"  # 快取鍵中代替 backend, 與影像的 makeExifDf 結果區分
+CSV_COLUMNS = ["filename", "starttime", "datetime", "lat", "lon", "speed", "azimuth",
+               "fps", "sec", "frame", "lon3857", "lat3857"]
+
+
+def read_points(json_file: Path) -> dict:
+    """
+        一次取出 GeoJSON 中所有 Point 的座標與屬性
+        傳回 {"lon", "lat": 陣列, "properties": [dict], "starttime": [該點之前最後一條 LineString 的 starttime]}
+    """
+    with open(json_file, "r", encoding="utf-8") as f:
+        features = json.load(f).get("features", [])
+
+    coordinates, properties, starttimes = [], [], []
+    starttime = ""
+    for feature in features:
+        geometry_type = feature["geometry"]["type"]
+        if geometry_type == "LineString":
+            starttime = feature["properties"].get("starttime", "")
+        elif geometry_type == "Point":
+            coordinates.append(feature["geometry"]["coordinates"][:2])
+            properties.append(feature["properties"] or {})
+            starttimes.append(starttime)
+
+    coordinates = np.array(coordinates, dtype=np.float64).reshape(-1, 2)
+    return {"lon": coordinates[:, 0], "lat": coordinates[:, 1], "properties": properties, "starttime": starttimes}
+
+
+def geojson_to_csv(json_file: Path, output_folder: Path) -> Path:
+    """
+        將單一 GeoJSON 的 Point 轉為 CSV ( 欄位同 CSV_COLUMNS ), 座標整批投影為 EPSG:3857
+        每個點視為 1 秒, frame 以 60 fps 計算
+        有預設快取 ( utlis.trackCache.set_default_cache ) 時, 未變更的 GeoJSON 直接使用快取的欄位
+    """
+    from utlis.trackCache import get_default_cache
+
+    json_file = Path(json_file)
+    output_path = Path(output_folder) / f"{json_file.stem}.csv"
+    cache = get_default_cache()
+    df = cache.get(json_file, CACHE_TAG) if cache is not None else None
+    if df is None:
+        df = _pointsDf(json_file)
+        if cache is not None:
+            cache.put(json_file, df, CACHE_TAG)
+    df.to_csv(output_path, index=False, encoding="utf-8-sig")
+    return output_path
+
+
+def _pointsDf(json_file: Path) -> pd.DataFrame:
+    points = read_points(json_file)
+    n = len(points["lon"])
+    if n == 0:
+        return pd.DataFrame()
+
+    props = points["properties"]
+    sec = np.arange(n)
+    lon3857, lat3857 = _getDfTransGps(points["lon"], points["lat"])
+    return pd.DataFrame({
+        "filename": json_file.stem,
+        "starttime": points["starttime"],
+        # 調整時間格式, 無法轉換的時間為空字串 ( 與 to_csv 輸出 NaN 相同, 快取後仍相同 )
+        "datetime": pd.to_datetime(pd.Series([p.get("datetime", "") for p in props]), errors="coerce")
+                      .dt.strftime("%Y:%m:%d %H:%M:%S").fillna(""),
+        "lat": points["lat"],
+        "lon": points["lon"],
+        "speed": [p.get("speed", "") for p in props],
+        "azimuth": [p.get("azimuth", "") for p in props],
+        "fps": FPS,
+        "sec": sec,
+        "frame": sec * FPS,
+        "lon3857": lon3857,
+        "lat3857": lat3857,
+    }, columns=CSV_COLUMNS)
+
+
+def json_to_csv_with_fields(input_folder: Path, output_folder: Path, jobs: int = 1) -> list:
+    """
+        將 input_folder 底下每個 .geojson 轉為同名的 CSV, jobs > 1 時以 process pool 平行處理
+        傳回輸出的 CSV 路徑 ( 依檔名排序 )
+    """
+    input_folder, output_folder = Path(input_folder), Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    json_files = sorted(input_folder.glob("*.geojson"))
 
-def _getDfTransGps(lon: float, lat: float) -> tuple[float, float]:
-    transformer = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
-    return transformer.transform(lon, lat)
+    if jobs > 1 and len(json_files) > 1:
+        from utlis.trackCache import get_default_cache, set_default_cache
 
-def json_to_csv_with_fields(input_folder: Path, output_folder: Path):
-    output_folder.mkdir(parents=True, exist_ok=True)
+        with ProcessPoolExecutor(max_workers=jobs, initializer=set_default_cache,
+                                 initargs=(get_default_cache(),)) as executor:
+            output_paths = list(executor.map(
+                geojson_to_csv, json_files, [output_folder] * len(json_files), chunksize=4))
+    else:
+        output_paths = [geojson_to_csv(json_file, output_folder) for json_file in json_files]
 
-    for json_file in input_folder.glob("*.geojson"):
-        with open(json_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        features = data.get("features", [])
-
-        rows = []
-        filename = json_file.stem
-        starttime = ""
-        sec = 0  # 秒數初始
-
-        for feature in features:
-            if feature["geometry"]["type"] == "LineString":
-                starttime = feature["properties"].get("starttime", "")
-                continue
-
-            if feature["geometry"]["type"] == "Point":
-                props = feature["properties"]
-                coords = feature["geometry"]["coordinates"]
-                lon, lat = coords
-
-                speed = props.get("speed", "")
-                azimuth = props.get("azimuth", "")
-                dt = props.get("datetime", "")
-
-                # WGS84 to EPSG:3857
-                lon3857, lat3857 = _getDfTransGps(lon, lat)
-
-                row = {
-                    "filename": filename,
-                    "starttime": starttime,
-                    "datetime": dt,
-                    "lat": lat,
-                    "lon": lon,
-                    "speed": speed,
-                    "azimuth": azimuth,
-                    "fps": 60,
-                    "sec": sec,
-                    "frame": sec * 60,
-                    "lon3857": lon3857,
-                    "lat3857": lat3857
-                }
-
-                rows.append(row)
-                sec += 1  # 下一秒
-
-        df = pd.DataFrame(rows)
-
-        # 調整時間格式
-        if not df.empty:
-            df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
-            df["datetime"] = df["datetime"].dt.strftime("%Y:%m:%d %H:%M:%S")
-
-        output_path = output_folder / f"{filename}.csv"
-        df.to_csv(output_path, index=False, encoding="utf-8-sig")
+    for output_path in output_paths:
         print(f"已輸出: {output_path}")
+    return output_paths
 
-# 範例用法：
-# json_to_csv_with_fields(Path("input/json_folder"), Path("output/csv_folder"))
 
-# 範例執行（你可以改成你自己的路徑）
 if __name__ == "__main__":
-    json_to_csv_with_fields(
-        input_folder=Path(r"output\20250408"),    # 替換為你的 JSON 資料夾路徑
-        output_folder=Path(r"output\20250408")    # 替換為輸出 CSV 的資料夾
-    )
+    parser = argparse.ArgumentParser(description="Export the points of each geojson file to csv")
+    parser.add_argument("input_folder", type=Path)
+    parser.add_argument("output_folder", type=Path, nargs="?",
+                        help="defaults to the input folder")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes")
+    args = parser.parse_args()
+
+    json_to_csv_with_fields(args.input_folder, args.output_folder or args.input_folder, args.jobs)
@@ -1,39 +1,94 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 import re
 import os
 from pathlib import Path
+import numpy as np
 import pandas as pd
 from pyproj import Transformer
+from utlis.exifTool import ExifTool
+from utlis.metrics import timed
+from utlis.mp4Gps import readMp4Gps, readMp4StartTime
+from utlis.trackCache import TrackCache, get_default_cache
 
+EXIF_TIME_FORMAT = "%Y:%m:%d %H:%M:%S"
 
-def _getExifStartTime(p: Path) -> tuple[int, str]:
+
+def exif_epochs(values) -> np.ndarray:
+    """
+        EXIF_TIME_FORMAT 的時間字串整批轉為 unix epoch (秒), GPS 時間視為 UTC
+    """
+    return pd.to_datetime(pd.Series(values), format=EXIF_TIME_FORMAT) \
+        .to_numpy("datetime64[s]").astype(np.int64)
+
+
+def _gpsCount(data, *args, **kwargs) -> int:
+    # timed 用: GPS 資訊 ( 或 (data, fps, startDate) ) 的點數
+    if isinstance(data, tuple):
+        data = data[0]
+    return None if data is None else len(data.get("GPSDateTime", []))
+
+
+@timed("_getExifStartTime")
+def _getExifStartTime(p: Path, et: ExifTool = None) -> tuple[int, str]:
     """
         取得檔案的EXIF資訊並計算出影像的第一秒GPS時間
         影像開始時間(startDate) = 檔案創建時間(createDate) - 影像持續時間(duration)
         檔案創建時間為整個錄影完成後
+        若給定常駐的 ExifTool 則不另外啟動 exiftool 程序
+    """
+    if et is None:
+        cmd = f"exiftool -s {str(p)} -VideoFrameRate -CreateDate -Duration"
+        with os.popen(cmd) as t:
+            context = t.read()[:-1]
+    else:
+        context = et.execute(
+            "-s", str(p), "-VideoFrameRate", "-CreateDate", "-Duration")[:-1]
+    return _parseExifStartTime(context)
+
+
+def _parseExifStartTime(context: str) -> tuple[int, str]:
+    """
+        解析 exiftool -s 的輸出 ( VideoFrameRate, CreateDate, Duration )
     """
     fps, startDate = -1, ""
-    cmd = f"exiftool -s {str(p)} -VideoFrameRate -CreateDate -Duration"
-    with os.popen(cmd) as t:
-        context = t.read()[:-1]
-        l = [x.split(": ")[1] for x in context.split("\n")]
-        fps = float(l[0])
-        createDate = datetime.strptime(l[1], "%Y:%m:%d %H:%M:%S")
-        if 's' in l[2]:
-            duration = timedelta(seconds=int(
-                float(l[2].replace(" s", "").strip())))
-            startDate = createDate - duration
-        else:
-            duration = datetime.strptime(l[2], "%H:%M:%S")
-            startDate = createDate - \
-                timedelta(minutes=duration.minute, seconds=duration.second)
+    l = [x.split(": ")[1] for x in context.split("\n")]
+    fps = float(l[0])
+    createDate = datetime.strptime(l[1], "%Y:%m:%d %H:%M:%S")
+    if 's' in l[2]:
+        duration = timedelta(seconds=int(
+            float(l[2].replace(" s", "").strip())))
+        startDate = createDate - duration
+    else:
+        duration = datetime.strptime(l[2], "%H:%M:%S")
+        startDate = createDate - \
+            timedelta(minutes=duration.minute, seconds=duration.second)
 
     return fps, startDate.strftime("%Y:%m:%d %H:%M:%S")
 
 
-def _getExifExtractEmbeddedData(p: Path) -> dict:
+@timed("_getExifExtractEmbeddedData", fixes=_gpsCount)
+def _getExifExtractEmbeddedData(p: Path, et: ExifTool = None) -> dict:
     """
         取得檔案的EXIF中的GPS詳細資訊(ExtractEmbeddedData) 處理後傳回字典
+        若給定常駐的 ExifTool 則不另外啟動 exiftool 程序
+    """
+    if et is None:
+        cmd = f"exiftool -ee -T -GPS* {str(p)}"
+        with os.popen(cmd) as t:
+            context = t.read()[:-1]
+    else:
+        context = et.execute("-ee", "-T", "-GPS*", str(p))[:-1]
+
+    data = _parseExifExtractEmbeddedData(context)
+    if data == {}:
+        print(f"MP4 file: {p} has no GPS data")
+    return data
+
+
+def _parseExifExtractEmbeddedData(context: str) -> dict:
+    """
+        解析 exiftool -ee -T -GPS* 的輸出
     """
     def _calculateGps(s: str) -> float:
         """
@@ -49,20 +104,14 @@ def _getExifExtractEmbeddedData(p: Path) -> dict:
         return d * (a + b/60 + c/3600)
 
     data = {}
-    cmd = f"exiftool -ee -T -GPS* {str(p)}"
-    with os.popen(cmd) as t:
-        context = t.read()[:-1]
-        cells = context.split("\t")[:-1]
-        data["GPSDateTime"] = [cells[i][:-1] for i in range(0, len(cells), 5)]
-        data["GPSLatitude"] = [_calculateGps(
-            cells[i]) for i in range(1, len(cells), 5)]
-        data["GPSLongitude"] = [_calculateGps(
-            cells[i]) for i in range(2, len(cells), 5)]
-        data["GPSSpeed"] = [float(cells[i]) for i in range(3, len(cells), 5)]
-        data["GPSTrack"] = [float(cells[i]) for i in range(4, len(cells), 5)]
-
-    if data == {}:
-        print(f"MP4 file: {p} has no GPS data")
+    cells = context.split("\t")[:-1]
+    data["GPSDateTime"] = [cells[i][:-1] for i in range(0, len(cells), 5)]
+    data["GPSLatitude"] = [_calculateGps(
+        cells[i]) for i in range(1, len(cells), 5)]
+    data["GPSLongitude"] = [_calculateGps(
+        cells[i]) for i in range(2, len(cells), 5)]
+    data["GPSSpeed"] = [float(cells[i]) for i in range(3, len(cells), 5)]
+    data["GPSTrack"] = [float(cells[i]) for i in range(4, len(cells), 5)]
     return data
 
 
@@ -75,23 +124,84 @@ def _getDfSecondsDifference(startTime: str, dateTime: str) -> int:
     return (dateTime - startTime).total_seconds()
 
 
-def _getDfTransGps(lon: float, lat: float) -> tuple[float, float]:
+@lru_cache(maxsize=None)
+def _getTransformer() -> Transformer:
     """
-        進一步處理EXIF的DataFrame ( 計算 lat3857, lon3857 )
+        EPSG:4326 -> EPSG:3857 的 Transformer, 建立成本高, 整個程序共用一個
     """
-    transformer = Transformer.from_crs(
+    return Transformer.from_crs(
         "EPSG:4326", "EPSG:3857", always_xy=True)
-    return transformer.transform(lon, lat)
 
 
-def makeExifDf(p: Path, columns: list = []) -> pd.DataFrame:
+def _getDfTransGps(lon, lat) -> tuple:
+    """
+        進一步處理EXIF的DataFrame ( 計算 lat3857, lon3857 )
+        lon, lat 可為單一數值或整個陣列
+    """
+    return _getTransformer().transform(lon, lat)
+
+
+@timed("_extractNativeGps", fixes=_gpsCount)
+def _extractNativeGps(p: Path, backend: str = "auto") -> tuple[dict, float, str]:
+    """
+        以 mp4Gps 讀取, 傳回 None 表示需要改用 exiftool
+    """
+    if backend not in ("auto", "native", "exiftool"):
+        raise ValueError("Invalid backend. Choose 'auto', 'native', or 'exiftool'.")
+    if backend == "exiftool":
+        return None
+    try:
+        data = readMp4Gps(p)
+        if data or backend == "native":
+            fps, startDate = readMp4StartTime(p)
+            return data, fps, startDate
+    except Exception:
+        if backend == "native":
+            raise
+    return None
+
+
+def _extractGps(p: Path, et: ExifTool = None, backend: str = "auto") -> tuple[dict, float, str]:
+    """
+        依 backend 取得 GPS 資訊與影像開始時間
+            "native"  : 以 mp4Gps 直接讀取 MP4 內嵌的 GPS 區塊
+            "exiftool": 以 exiftool 讀取
+            "auto"    : 先使用 native, 讀不到 GPS 資訊時改用 exiftool
+    """
+    result = _extractNativeGps(p, backend)
+    if result is not None:
+        return result
+
+    data = _getExifExtractEmbeddedData(p, et)
+    fps, startDate = _getExifStartTime(p, et)
+    return data, fps, startDate
+
+
+@timed("makeExifDf", fixes=lambda df, *args, **kwargs: len(df))
+def makeExifDf(p: Path, columns: list = [], et: ExifTool = None, backend: str = "auto",
+               cache: TrackCache = None) -> pd.DataFrame:
     """
         給定影像路徑及columns 傳回影像內GPS紀錄的DataFrame
         若不給定columns則輸出所有column:
             ["filename", "datetime", "lat", "lon", "speed", "azimuth", "starttime", "fps", "sec", "frame", "lat3857", "lon3857"]
+        若給定常駐的 ExifTool (et) 則沿用該程序, 不另外啟動 exiftool
+        backend 預設先以內建的 MP4 解析器讀取, 失敗時才改用 exiftool
+        cache 未指定時使用 set_default_cache 設定的快取 ( 預設不使用 )
     """
+    cache = cache if cache is not None else get_default_cache()
+    df = cache.get(p, backend) if cache is not None else None
+    if df is None:
+        data, fps, startDate = _extractGps(p, et, backend)
+        df = _buildExifDf(data, p.stem, fps, startDate)
+        if cache is not None:
+            cache.put(p, df, backend)
+    return df[columns] if columns and not df.empty else df
+
 
-    data = _getExifExtractEmbeddedData(p)
+def _buildExifDf(data: dict, filename: str, fps: float, startDate: str) -> pd.DataFrame:
+    """
+        由GPS資訊建立完整欄位的DataFrame, 全部以欄為單位計算 ( 不逐列 apply )
+    """
     df = pd.DataFrame(data)
     df = df.rename(
         columns={
@@ -102,23 +212,41 @@ def makeExifDf(p: Path, columns: list = []) -> pd.DataFrame:
             "GPSTrack": "azimuth"
         }
     )
-    fps, startDate = _getExifStartTime(p)
     df.drop_duplicates(inplace=True)  # 去除重複資料
     if df.empty:
         return df
 
-    df["filename"] = p.stem
+    df["filename"] = filename
     df["starttime"] = startDate
     df["fps"] = fps
-    df["sec"] = df["datetime"].map(lambda x: int(
-        _getDfSecondsDifference(startDate, x)))
-    df["frame"] = df["sec"].map(lambda x: int(x * fps))
-    firstFrame = df.loc[df.index[0], "frame"]
+    seconds = pd.to_datetime(df["datetime"], format=EXIF_TIME_FORMAT) - \
+        datetime.strptime(startDate, EXIF_TIME_FORMAT)
+    df["sec"] = (seconds.dt.total_seconds()).astype(np.int64)
+    df["frame"] = (df["sec"] * fps).astype(np.int64)
+    firstFrame = df["frame"].iloc[0]
     if firstFrame < 0:
         df["frame"] = df["frame"] - firstFrame
-    df[["lon3857", "lat3857"]] = df.apply(lambda x: _getDfTransGps(
-        x["lon"], x["lat"]), axis=1, result_type="expand")
-    return df[columns] if columns else df
+    df["lon3857"], df["lat3857"] = _getDfTransGps(
+        df["lon"].to_numpy(np.float64), df["lat"].to_numpy(np.float64))
+    return df
+
+
+def makeExifDfBatch(paths: list, columns: list = [], executable: str = "exiftool", backend: str = "auto",
+                    cache: TrackCache = None) -> dict:
+    """
+        批次處理多支影像, 整批只啟動一個常駐的 exiftool 程序
+        傳回 {影像路徑: DataFrame}, 處理失敗的影像對應空的DataFrame
+    """
+    dfs = {}
+    with ExifTool(executable) as et:
+        for p in paths:
+            p = Path(p)
+            try:
+                dfs[p] = makeExifDf(p, columns, et, backend, cache)
+            except Exception as e:
+                print(f"Error processing in {p}: {e}")
+                dfs[p] = pd.DataFrame()
+    return dfs
 
 
 def saveExifCsv(df: pd.DataFrame, out: Path) -> None:
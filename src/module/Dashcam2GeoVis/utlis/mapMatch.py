@@ -0,0 +1,678 @@
+import bz2
+import gzip
+import heapq
+import json
+import math
+import os
+import sqlite3
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from utlis.geojsonWriter import line_feature, write_feature_collection
+from utlis.makeExif import _getDfTransGps
+from utlis.simplify import decimate
+from utlis.timeIndex import format_time
+
+VERSION = 1
+ROAD_TYPES = {
+    "motorway", "trunk", "primary", "secondary", "tertiary", "unclassified", "residential", "living_street",
+    "service", "road", "motorway_link", "trunk_link", "primary_link", "secondary_link", "tertiary_link",
+}
+CELL_SIZE = 100.0       # 路段網格大小 ( EPSG:3857 單位 )
+RADIUS = 30.0           # 公尺, 候選路段的搜尋半徑
+CANDIDATES = 4          # 每個點最多保留的候選路段數
+SIGMA = 5.0             # 公尺, GPS 誤差的標準差
+BETA = 5.0              # 公尺, 路網距離與預期移動距離之差的尺度
+HEADING_SIGMA = 30.0    # 度, 方位角與路段方向之差的標準差
+STOP_SPEED = 5.0        # km/h, 低於此速度視為停車 ( 位置飄移, 方位角不可靠 )
+SPEED_DT = 5            # 秒, 時間差在此以內才以速度估計移動距離
+MIN_MOVE = 5.0          # 公尺, 移動不到此距離的點 ( 停車 ) 不參與比對
+POSITION_BITS = 11      # 路段編號 = way id << POSITION_BITS | 在 way 中的位置 ( OSM 的 way 最多 2000 個節點 )
+CACHE_NODES = 4096      # 最短路徑快取的起點數上限
+_EARTH_RADIUS = 6378137.0  # EPSG:3857 的球體半徑
+
+
+def _scale(y) -> np.ndarray:
+    # EPSG:3857 一個單位相當的地面公尺數 ( = cos(緯度) )
+    return 1 / np.cosh(np.asarray(y, dtype=np.float64) / _EARTH_RADIUS)
+
+
+def _expand(counts) -> tuple:
+    # 第 i 列展開為 counts[i] 列, 傳回 (所屬列, 列內的序號)
+    counts = np.asarray(counts, dtype=np.int64)
+    row = np.repeat(np.arange(len(counts)), counts)
+    return row, np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def _cellKey(cx, cy) -> np.ndarray:
+    return (np.asarray(cx, dtype=np.int64) << 32) | (np.asarray(cy, dtype=np.int64) & 0xFFFFFFFF)
+
+
+def _oneway(tags: dict) -> int:
+    # 1: 順向單行, -1: 逆向單行 ( 節點順序與行駛方向相反 ), 0: 雙向
+    value = tags.get("oneway", "")
+    if value == "-1":
+        return -1
+    if value in ("yes", "true", "1"):
+        return 1
+    if value == "no":
+        return 0
+    return int(tags.get("highway") == "motorway" or tags.get("junction") in ("roundabout", "circular"))
+
+
+def _open(path: Path):
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rb")
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+class RoadGraph:
+    """
+        由 OSM XML 建立的道路網: way 中相鄰兩個節點為一個路段, 單行道只能由起點往終點行駛
+        座標為 EPSG:3857 ( 與 SpatialIndex 相同 ), 長度與距離依緯度換算為地面公尺
+        路段依外框登記到 cell_size 的網格, 以排序後的 ( 格子, 路段 ) 陣列與 searchsorted 查詢
+    """
+
+    ARRAYS = ("lon", "lat", "a", "b", "way", "position", "way_id", "way_oneway", "way_highway", "way_name")
+
+    def __init__(self, lon, lat, a, b, way, position, way_id, way_oneway, way_highway, way_name,
+                 cell_size: float = CELL_SIZE) -> None:
+        # 節點
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.x, self.y = (np.asarray(v) for v in _getDfTransGps(self.lon, self.lat))
+        # 路段 ( 起點 a → 終點 b, 單行道已依行駛方向排列 ) 與所屬的 way
+        self.a = np.asarray(a, dtype=np.int64)
+        self.b = np.asarray(b, dtype=np.int64)
+        self.way = np.asarray(way, dtype=np.int64)
+        self.position = np.asarray(position, dtype=np.int64)
+        self.way_id = np.asarray(way_id, dtype=np.int64)
+        self.way_oneway = np.asarray(way_oneway, dtype=bool)
+        self.way_highway = np.asarray(way_highway, dtype=str)
+        self.way_name = np.asarray(way_name, dtype=str)
+        self.cell_size = float(cell_size)
+
+        self.key = (self.way_id[self.way] << POSITION_BITS) | self.position
+        self.oneway = self.way_oneway[self.way]
+        self.dx = self.x[self.b] - self.x[self.a]
+        self.dy = self.y[self.b] - self.y[self.a]
+        self.length = np.hypot(self.dx, self.dy) * _scale((self.y[self.a] + self.y[self.b]) / 2)
+        # EPSG:3857 為正形投影, 可直接由座標差計算方位角 ( 北方為 0 度, 順時針 )
+        self.bearing = np.degrees(np.arctan2(self.dx, self.dy)) % 360
+        self._buildGrid()
+        self._segments = self._adjacency = None
+        self._cache = {}
+
+    def __len__(self) -> int:
+        return len(self.a)
+
+    def __getstate__(self) -> dict:
+        # 傳給子程序時只送原始陣列, 網格等衍生資料在子程序重建
+        return {name: getattr(self, name) for name in self.ARRAYS} | {"cell_size": self.cell_size}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def _buildGrid(self) -> None:
+        xa, xb, ya, yb = self.x[self.a], self.x[self.b], self.y[self.a], self.y[self.b]
+        cx0 = np.floor(np.minimum(xa, xb) / self.cell_size).astype(np.int64)
+        cy0 = np.floor(np.minimum(ya, yb) / self.cell_size).astype(np.int64)
+        nx = np.floor(np.maximum(xa, xb) / self.cell_size).astype(np.int64) - cx0 + 1
+        ny = np.floor(np.maximum(ya, yb) / self.cell_size).astype(np.int64) - cy0 + 1
+        segment, local = _expand(nx * ny)
+        keys = _cellKey(cx0[segment] + local // ny[segment], cy0[segment] + local % ny[segment])
+        order = np.argsort(keys, kind="stable")
+        self.cell_keys, self.cell_segments = keys[order], segment[order]
+
+    @classmethod
+    def from_osm(cls, path: Path, cell_size: float = CELL_SIZE) -> "RoadGraph":
+        """
+            讀取 OSM XML ( .osm, .osm.gz, .osm.bz2 ), 只保留 ROAD_TYPES 的 way
+            一次走訪, 節點與 way 讀完即清除 ( 含 root 上的參照 ); 缺少節點 ( 位於範圍外 ) 的路段會被捨去
+        """
+        node_id, node_lon, node_lat = [], [], []
+        ways = []
+        with _open(Path(path)) as f:
+            context = ET.iterparse(f, events=("start", "end"))
+            _, root = next(context)
+            for event, elem in context:
+                if event != "end":
+                    continue
+                if elem.tag == "node":
+                    node_id.append(int(elem.get("id")))
+                    node_lon.append(float(elem.get("lon")))
+                    node_lat.append(float(elem.get("lat")))
+                elif elem.tag == "way":
+                    tags = {x.get("k"): x.get("v") for x in elem.iter("tag")}
+                    if tags.get("highway") in ROAD_TYPES and tags.get("area") != "yes":
+                        refs = [int(x.get("ref")) for x in elem.iter("nd")]
+                        oneway = _oneway(tags)
+                        ways.append((int(elem.get("id")), refs[::-1] if oneway < 0 else refs, oneway != 0,
+                                     tags["highway"], tags.get("name", "")))
+                elif elem.tag != "relation":
+                    continue
+                elem.clear()
+                root.clear()
+
+        if not ways:
+            raise ValueError(f"No roads found in {path}")
+        node_id = np.asarray(node_id, dtype=np.int64)
+        order = np.argsort(node_id)
+        node_id = node_id[order]
+
+        # 所有 way 的節點串成一個陣列, 同一個 way 中相鄰且節點都存在的兩點為一個路段
+        lengths = np.array([len(x[1]) for x in ways])
+        refs = np.fromiter((ref for x in ways for ref in x[1]), dtype=np.int64, count=lengths.sum())
+        way, position = _expand(lengths)
+        index = np.minimum(np.searchsorted(node_id, refs), len(node_id) - 1)
+        found = node_id[index] == refs
+        pair = np.flatnonzero((way[:-1] == way[1:]) & found[:-1] & found[1:])
+
+        # 只保留路段用到的節點
+        used, inverse = np.unique(np.concatenate((index[pair], index[pair + 1])), return_inverse=True)
+        return cls(np.asarray(node_lon)[order][used], np.asarray(node_lat)[order][used],
+                   inverse[:len(pair)], inverse[len(pair):], way[pair], position[pair],
+                   [x[0] for x in ways], [x[2] for x in ways], [x[3] for x in ways], [x[4] for x in ways],
+                   cell_size)
+
+    def save(self, path: Path) -> None:
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, version=VERSION, cell_size=self.cell_size, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "RoadGraph":
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != VERSION:
+                raise ValueError(f"{path} was saved by another version")
+            return cls(cell_size=float(data["cell_size"]), **{name: data[name] for name in cls.ARRAYS})
+
+    def candidates(self, x, y, radius: float = RADIUS, k: int = CANDIDATES) -> tuple:
+        """
+            每個點 ( EPSG:3857 ) 距離 radius 公尺內最近的 k 個路段, 所有點一次以陣列運算查詢
+            傳回 (segment, distance, offset) 三個 (n, k) 陣列, 依距離排序
+            不足 k 個的位置 segment 為 -1, distance 為 inf; offset 為投影點距路段起點的公尺數
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        n = len(x)
+        segment = np.full((n, k), -1, dtype=np.int64)
+        distance = np.full((n, k), np.inf)
+        offset = np.zeros((n, k))
+        if n == 0 or len(self) == 0:
+            return segment, distance, offset
+
+        # 每個點搜尋範圍涵蓋的格子
+        scale = _scale(y)
+        r = radius / scale
+        cx0 = np.floor((x - r) / self.cell_size).astype(np.int64)
+        cy0 = np.floor((y - r) / self.cell_size).astype(np.int64)
+        nx = np.floor((x + r) / self.cell_size).astype(np.int64) - cx0 + 1
+        ny = np.floor((y + r) / self.cell_size).astype(np.int64) - cy0 + 1
+        fix, local = _expand(nx * ny)
+        keys = _cellKey(cx0[fix] + local // ny[fix], cy0[fix] + local % ny[fix])
+
+        # 格子中登記的路段, 同一點在多個格子找到的路段只留一筆
+        start = np.searchsorted(self.cell_keys, keys, "left")
+        row, local = _expand(np.searchsorted(self.cell_keys, keys, "right") - start)
+        pair = np.unique(fix[row] * len(self) + self.cell_segments[start[row] + local])
+        fix, seg = pair // len(self), pair % len(self)
+
+        # 點到路段的距離
+        ax, ay = self.x[self.a[seg]], self.y[self.a[seg]]
+        dx, dy = self.dx[seg], self.dy[seg]
+        norm = dx * dx + dy * dy
+        t = np.where(norm > 0, ((x[fix] - ax) * dx + (y[fix] - ay) * dy) / np.where(norm > 0, norm, 1), 0)
+        t = np.clip(t, 0, 1)
+        d = np.hypot(x[fix] - (ax + t * dx), y[fix] - (ay + t * dy)) * scale[fix]
+        near = d <= radius
+        fix, seg, t, d = fix[near], seg[near], t[near], d[near]
+
+        # 各點依距離排序, 取前 k 個
+        order = np.lexsort((d, fix))
+        fix, seg, t, d = fix[order], seg[order], t[order], d[order]
+        rank = np.arange(len(fix)) - np.searchsorted(fix, fix, "left")
+        top = rank < k
+        fix, rank, seg = fix[top], rank[top], seg[top]
+        segment[fix, rank] = seg
+        distance[fix, rank] = d[top]
+        offset[fix, rank] = t[top] * self.length[seg]
+        return segment, distance, offset
+
+    def _emission(self, segment, distance, azimuth, sigma: float) -> np.ndarray:
+        # 與路段的距離 ( 常態分布 ), 另加 方位角與路段方向之差 ( 雙向道路取兩個方向中較近者 )
+        log = -0.5 * (distance / sigma) ** 2
+        if azimuth is not None:
+            diff = np.abs((azimuth[:, None] - self.bearing[segment] + 180) % 360 - 180)
+            diff = np.where(self.oneway[segment], diff, np.minimum(diff, 180 - diff))
+            log -= 0.5 * (diff / HEADING_SIGMA) ** 2
+        return log
+
+    def _prepare(self) -> None:
+        # 路段與每個節點的出邊 [(終點, 長度, 路段)] 轉為 Python list ( 逐一查詢時比 NumPy 純量快 )
+        if self._adjacency is not None:
+            return
+        self._segments = list(zip(self.a.tolist(), self.b.tolist(), self.length.tolist(), self.oneway.tolist()))
+        self._adjacency = [[] for _ in range(len(self.x))]
+        for i, (a, b, length, oneway) in enumerate(self._segments):
+            self._adjacency[a].append((b, length, i))
+            if not oneway:
+                self._adjacency[b].append((a, length, i))
+
+    def _reach(self, node: int, limit: float) -> tuple:
+        """
+            由 node 出發 limit 公尺內的最短路徑 ( Dijkstra ), 傳回 ({節點: 距離}, {節點: (前一節點, 路段)})
+            依起點快取, 快取的範圍不小於 limit 時直接使用
+        """
+        cached = self._cache.get(node)
+        if cached is not None and cached[0] >= limit:
+            return cached[1], cached[2]
+
+        dist, pred = {node: 0.0}, {}
+        heap = [(0.0, node)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, length, segment in self._adjacency[u]:
+                nd = d + length
+                if nd <= limit and nd < dist.get(v, np.inf):
+                    dist[v], pred[v] = nd, (u, segment)
+                    heapq.heappush(heap, (nd, v))
+        if len(self._cache) >= CACHE_NODES:
+            self._cache.clear()
+        self._cache[node] = (limit, dist, pred)
+        return dist, pred
+
+    def _link(self, p: int, sp: float, q: int, sq: float, limit: float) -> tuple:
+        """
+            由路段 p 上距起點 sp 公尺處到路段 q 上距起點 sq 公尺處的路網距離
+            傳回 (距離, 離開 p 的節點, 進入 q 的節點), 同一路段時節點為 None, 無法在 limit 內到達時距離為 inf
+        """
+        if p == q:
+            return abs(sq - sp), None, None
+        a, b, length, oneway = self._segments[p]
+        exits = [(b, length - sp)] if oneway else [(b, length - sp), (a, sp)]
+        a, b, length, oneway = self._segments[q]
+        entries = [(a, sq)] if oneway else [(a, sq), (b, length - sq)]
+        best = (np.inf, None, None)
+        for u, cost in exits:
+            dist, _ = self._reach(u, limit)
+            for v, rest in entries:
+                d = dist.get(v)
+                if d is not None and cost + d + rest < best[0]:
+                    best = (cost + d + rest, u, v)
+        return best
+
+    def _path(self, u: int, v: int, limit: float) -> list:
+        # u 到 v 最短路徑經過的路段 ( 依行駛順序 )
+        _, pred = self._reach(u, limit)
+        segments = []
+        while v != u:
+            v, segment = pred[v]
+            segments.append(segment)
+        return segments[::-1]
+
+    def match(self, lon, lat, epoch, speed=None, azimuth=None, radius: float = RADIUS, k: int = CANDIDATES,
+              sigma: float = SIGMA, beta: float = BETA) -> list:
+        """
+            HMM 地圖比對 ( Newson & Krumm ), 狀態為每個點的候選路段
+            速度低於 STOP_SPEED 的點與移動不到 MIN_MOVE 的點 ( 停車 ) 不參與比對
+            emission: 與路段的距離, 有方位角時另加方位角與路段方向之差
+            transition: 路網距離與預期移動距離之差 ( 有速度且時間差不超過 SPEED_DT 時為 平均速度 × 時間差, 否則為直線距離 )
+            候選路段一次查詢所有點, Viterbi 每一步以陣列運算處理 k × k 個轉移
+            找不到候選路段或無法連通時切斷, 各段分別比對, 只有一個點的段落捨去
+            傳回依序經過的路段 [(路段索引, 最後經過的 epoch)], 兩點之間最短路徑上的路段也會加入
+            由同一個節點進出的路段 ( ex: 路口另一側, 只被雜訊碰到 ) 不算經過, 連續的同一路段只算一次
+        """
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        epoch = np.asarray(epoch, dtype=np.int64)
+        if len(lon) == 0:
+            return []
+        x, y = (np.asarray(v, dtype=np.float64).reshape(-1) for v in _getDfTransGps(lon, lat))
+        scale = _scale(y)
+        moved = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)) * scale[1:])))
+        keep = decimate(moved, MIN_MOVE)
+        if speed is not None:
+            # 停車時的 GPS 飄移會被當成來回行駛, 有速度時直接略過停止的點
+            speed = np.asarray(speed, dtype=np.float64)
+            keep &= speed >= STOP_SPEED
+        index = np.flatnonzero(keep)
+        x, y, scale, epoch = x[index], y[index], scale[index], epoch[index]
+        speed = None if speed is None else speed[index]
+        azimuth = None if azimuth is None else np.asarray(azimuth, dtype=np.float64)[index]
+
+        segment, distance, offset = self.candidates(x, y, radius, k)
+        emission = self._emission(segment, distance, azimuth, sigma)
+
+        self._prepare()
+        # 逐步處理的部分改用 Python list, 每一步的 ( 有效候選, 路段, offset )
+        candidates = [[(c, s, o) for c, (s, o) in enumerate(zip(segs, offs)) if s >= 0]
+                      for segs, offs in zip(segment.tolist(), offset.tolist())]
+        x, y, scale, epoch = x.tolist(), y.tolist(), scale.tolist(), epoch.tolist()
+        speed = None if speed is None else speed.tolist()
+
+        passes = []
+        steps, backs, limits, score = [], [], [], None
+        for i in range(len(index)):
+            e = emission[i]
+            if score is not None and candidates[i]:
+                j = steps[-1]
+                dt = epoch[i] - epoch[j]
+                expected = math.hypot(x[i] - x[j], y[i] - y[j]) * scale[i]
+                limit = 2 * expected + 2 * radius
+                if speed is not None and 0 < dt <= SPEED_DT:
+                    expected = (speed[i] + speed[j]) / 2 / 3.6 * dt
+                    limit = max(limit, 2 * expected + 2 * radius)
+                cells, routes = [], []
+                for a, p, sp in candidates[j]:
+                    if score[a] > -np.inf:
+                        for b, q, sq in candidates[i]:
+                            cells.append(a * k + b)
+                            routes.append(abs(sq - sp) if p == q else self._link(p, sp, q, sq, limit)[0])
+                route = np.full(k * k, np.inf)
+                route[cells] = routes
+                total = score[:, None] - np.abs(route.reshape(k, k) - expected) / beta
+                back = np.argmax(total, axis=0)
+                new = total[back, np.arange(k)] + e
+                if np.isfinite(new).any():
+                    steps.append(i)
+                    backs.append(back)
+                    limits.append(limit)
+                    score = new
+                    continue
+            # 切斷: 結束目前的段落, 由這一點重新開始
+            self._finish(passes, steps, backs, limits, score, segment, offset, epoch)
+            if candidates[i]:
+                steps, backs, limits, score = [i], [None], [None], e
+            else:
+                steps, backs, limits, score = [], [], [], None
+        self._finish(passes, steps, backs, limits, score, segment, offset, epoch)
+
+        result = []
+        for s, t, through in passes:
+            if not through:
+                continue
+            if result and result[-1][0] == s:
+                result[-1] = (s, t)
+            else:
+                result.append((s, t))
+        return result
+
+    def _finish(self, passes: list, steps: list, backs: list, limits: list, score, segment, offset, epoch) -> None:
+        # 回溯一個段落的最佳狀態, 依序加入 (路段, 最後經過的 epoch, 是否駛過)
+        if len(steps) < 2:
+            return
+        states = [int(np.argmax(score))]
+        for back in backs[:0:-1]:
+            states.append(int(back[states[-1]]))
+        states.reverse()
+
+        # [路段, 最後經過的 epoch, 駛入的節點, 駛離的節點, 比對點 offset 的最小值, 最大值], 最短路徑補上的路段整段駛過
+        chain, prev = [], None
+        for step, state, limit in zip(steps, states, limits):
+            s, t, o = int(segment[step, state]), int(epoch[step]), float(offset[step, state])
+            if prev is not None and prev[0] != s:
+                _, u, v = self._link(prev[0], prev[1], s, o, limit)
+                chain[-1][3] = u
+                for between in self._path(u, v, limit):
+                    chain.append([between, prev[2], None, None, None, None])
+                chain.append([s, t, v, None, o, o])
+            elif chain:
+                chain[-1][1], chain[-1][4], chain[-1][5] = t, min(chain[-1][4], o), max(chain[-1][5], o)
+            else:
+                chain.append([s, t, None, None, o, o])
+            prev = (s, o, t)
+
+        for s, t, entry, exit, low, high in chain:
+            if low is None:
+                through = True
+            elif entry is not None and exit is not None:
+                # 由同一個節點進出 ( ex: 路口另一側的路段只被碰到 ) 不算經過
+                through = entry != exit
+            else:
+                # 段落的頭尾: 在路段上移動的距離需達 MIN_MOVE
+                node = entry if entry is not None else exit
+                if node is None:
+                    covered = high - low
+                else:
+                    end = 0.0 if node == self.a[s] else float(self.length[s])
+                    covered = max(abs(low - end), abs(high - end))
+                through = covered >= MIN_MOVE
+            passes.append((s, t, through))
+
+    def segment_rows(self, segments) -> list:
+        # CoverageDB 的 segments 資料表: (編號, way, 名稱, 道路類型, 長度, 起點 lon/lat, 終點 lon/lat)
+        segments = np.asarray(segments, dtype=np.int64)
+        way = self.way[segments]
+        return list(zip(self.key[segments].tolist(), self.way_id[way].tolist(), self.way_name[way].tolist(),
+                        self.way_highway[way].tolist(), np.round(self.length[segments], 3).tolist(),
+                        self.lon[self.a[segments]].tolist(), self.lat[self.a[segments]].tolist(),
+                        self.lon[self.b[segments]].tolist(), self.lat[self.b[segments]].tolist()))
+
+
+def load_graph(path: Path) -> RoadGraph:
+    """
+        .npz 為 RoadGraph.save 的結果; OSM XML 解析後另存為 <path>.graph.npz, 原檔未更新時下次直接讀取
+    """
+    path = Path(path)
+    if path.suffix == ".npz":
+        return RoadGraph.load(path)
+    cached = path.with_name(f"{path.name}.graph.npz")
+    if cached.exists() and cached.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+        try:
+            return RoadGraph.load(cached)
+        except (OSError, KeyError, ValueError):
+            pass
+    graph = RoadGraph.from_osm(path)
+    try:
+        graph.save(cached)
+    except OSError:
+        pass
+    return graph
+
+
+class CoverageDB:
+    """
+        以 SQLite 儲存的比對結果: 每個行程經過的路段 ( passes ), 路段的統計為 coverage view
+        ( 經過次數, 行程數, 第一次與最後一次經過的時間 )
+        行程以第一支影像的檔名為鍵, 影像組成未改變的行程不重新比對; 新影像併入既有行程時整個行程重新比對
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS segments (
+                segment INTEGER PRIMARY KEY, way INTEGER, name TEXT, highway TEXT, length REAL,
+                lon_a REAL, lat_a REAL, lon_b REAL, lat_b REAL);
+            CREATE TABLE IF NOT EXISTS trips (trip TEXT PRIMARY KEY, clips TEXT, fixes INTEGER);
+            CREATE TABLE IF NOT EXISTS clips (filename TEXT PRIMARY KEY, trip TEXT);
+            CREATE TABLE IF NOT EXISTS passes (trip TEXT, segment INTEGER, epoch INTEGER);
+            CREATE INDEX IF NOT EXISTS passes_segment ON passes (segment);
+            CREATE INDEX IF NOT EXISTS passes_trip ON passes (trip);
+            CREATE VIEW IF NOT EXISTS coverage AS
+                SELECT segment, COUNT(*) AS count, COUNT(DISTINCT trip) AS trips,
+                       MIN(epoch) AS first_seen, MAX(epoch) AS last_seen
+                FROM passes GROUP BY segment;
+        """)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "CoverageDB":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def trip_clips(self) -> dict:
+        # {行程: [影像檔名, ...]}
+        return {trip: json.loads(clips) for trip, clips in self.conn.execute("SELECT trip, clips FROM trips")}
+
+    def is_current(self, clips: list) -> bool:
+        row = self.conn.execute("SELECT clips FROM trips WHERE trip = ?", (clips[0],)).fetchone()
+        return row is not None and json.loads(row[0]) == clips
+
+    def replace(self, clips: list, fixes: int, passes: list, graph: RoadGraph) -> None:
+        """
+            寫入一個行程的比對結果, 與這些影像有關的舊行程 ( 含其 passes ) 先刪除
+        """
+        trip = clips[0]
+        segments = np.array([x[0] for x in passes], dtype=np.int64)
+        with self.conn:
+            old = {row[0] for row in self.conn.execute(
+                f"SELECT DISTINCT trip FROM clips WHERE filename IN ({','.join('?' * len(clips))})", clips)}
+            for x in old | {trip}:
+                self.conn.execute("DELETE FROM passes WHERE trip = ?", (x,))
+                self.conn.execute("DELETE FROM clips WHERE trip = ?", (x,))
+                self.conn.execute("DELETE FROM trips WHERE trip = ?", (x,))
+            self.conn.execute("INSERT INTO trips VALUES (?, ?, ?)", (trip, json.dumps(clips), fixes))
+            self.conn.executemany("INSERT INTO clips VALUES (?, ?)", [(x, trip) for x in clips])
+            self.conn.executemany("INSERT OR REPLACE INTO segments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  graph.segment_rows(np.unique(segments)))
+            self.conn.executemany("INSERT INTO passes VALUES (?, ?, ?)",
+                                  zip([trip] * len(passes), graph.key[segments].tolist(), [x[1] for x in passes]))
+
+    def coverage(self, since: int = None) -> list:
+        """
+            [{"segment", "way", "name", "highway", "length", "count", "trips", "first_seen", "last_seen", ...}]
+            since: 只傳回最後經過時間不早於此 epoch 的路段
+        """
+        cursor = self.conn.execute("""
+            SELECT s.*, c.count, c.trips, c.first_seen, c.last_seen
+            FROM coverage c JOIN segments s ON s.segment = c.segment
+            WHERE c.last_seen >= ? ORDER BY s.segment
+        """, (since if since is not None else -2**62,))
+        names = [x[0] for x in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def stats(self) -> dict:
+        trips, fixes = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(fixes), 0) FROM trips").fetchone()
+        passes, segments = self.conn.execute("SELECT COUNT(*), COUNT(DISTINCT segment) FROM passes").fetchone()
+        return {"trips": trips, "fixes": fixes, "passes": passes, "segments": segments}
+
+    def export_geojson(self, output_path: Path, compact: bool = False, since: int = None) -> int:
+        """
+            每個經過的路段輸出為一個 LineString Feature, 傳回路段數
+        """
+        rows = self.coverage(since)
+
+        def _features():
+            for r in rows:
+                yield line_feature([r["lon_a"], r["lon_b"]], [r["lat_a"], r["lat_b"]], {
+                    "segment": r["segment"], "way": r["way"], "name": r["name"], "highway": r["highway"],
+                    "length(m)": r["length"], "count": r["count"], "trips": r["trips"],
+                    "first_seen": format_time(r["first_seen"]), "last_seen": format_time(r["last_seen"]),
+                }, compact)
+
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, "w") as f:
+            write_feature_collection(f, _features(), compact)
+        os.replace(tmp_path, output_path)
+        return len(rows)
+
+
+_worker_graph = None
+
+
+def _init_worker(graph: RoadGraph) -> None:
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _match_trip(trip: dict, options: dict) -> tuple:
+    passes = _worker_graph.match(trip["lon"], trip["lat"], trip["epoch"], trip["speed"], trip["azimuth"], **options)
+    return trip["properties"]["clips"], len(trip["lon"]), passes
+
+
+def _imap(executor: ProcessPoolExecutor, trips, options: dict, window: int):
+    """
+        依序送出行程並依相同順序傳回結果, 同時最多 window 個行程在子程序中
+        ( executor.map 會先取完所有行程再開始傳回, 記憶體中會有全部行程的陣列 )
+    """
+    pending = deque()
+    for trip in trips:
+        pending.append(executor.submit(_match_trip, trip, options))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def update_coverage(db: CoverageDB, graph: RoadGraph, trips, jobs: int = 1, **options) -> dict:
+    """
+        比對 stitch_trips 的行程並寫入 db, 已比對過且影像組成未改變的行程略過
+        jobs > 1 時以 process pool 平行比對各行程 ( 每個子程序收到一份路網 ), 結果依行程順序由主程序寫入
+        同時送出的行程最多 2 × jobs 個, 行程逐一讀取, 記憶體不隨行程數增加
+        options: match 的 radius, k, sigma, beta
+    """
+    skipped = 0
+
+    def _pending():
+        nonlocal skipped
+        for trip in trips:
+            if db.is_current(trip["properties"]["clips"]):
+                skipped += 1
+            else:
+                yield trip
+
+    if jobs > 1:
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(graph,))
+        results = _imap(executor, _pending(), options, 2 * jobs)
+    else:
+        executor = None
+        _init_worker(graph)
+        results = (_match_trip(trip, options) for trip in _pending())
+
+    matched = fixes = passes = 0
+    try:
+        for clips, n, segments in results:
+            db.replace(clips, n, segments, graph)
+            matched += 1
+            fixes += n
+            passes += len(segments)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return {"matched": matched, "skipped": skipped, "fixes": fixes, "passes": passes}
+
+
+def pending_runs(db: CoverageDB, names: list) -> list:
+    """
+        names: 依開始時間排序的影像檔名 ( utlis.trips.store_paths / video_paths 的 stem )
+        傳回需要重新串接與比對的連續片段 [(start, end), ...] ( names[start:end] )
+        新影像, 與新影像相鄰或有影像被移除的整個行程需要重新處理; 其餘行程的影像不必讀取
+    """
+    trips = db.trip_clips()
+    known = {name: trip for trip, clips in trips.items() for name in clips}
+    present = set(names)
+    redo = {trip for trip, clips in trips.items() if not present.issuperset(clips)}
+    for i, name in enumerate(names):
+        if name not in known:
+            redo.update(known[x] for x in names[max(i - 1, 0):i + 2] if x in known)
+
+    runs = []
+    for i, name in enumerate(names):
+        if name in known and known[name] not in redo:
+            continue
+        if runs and runs[-1][1] == i:
+            runs[-1][1] = i + 1
+        else:
+            runs.append([i, i + 1])
+    return [tuple(x) for x in runs]
+
+
+if __name__ == "__main__":
+    import sys
+    from cli import main
+
+    # 與 dashcam match 相同
+    main(["match", *sys.argv[1:]])
@@ -0,0 +1,176 @@
+import cProfile
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+_currentFile = ContextVar("current_file", default=None)
+
+PROMETHEUS_METRICS = [
+    ("seconds_total", "counter", "Wall time spent in each ingest stage.", "seconds"),
+    ("calls_total", "counter", "Number of times each ingest stage ran.", "calls"),
+    ("errors_total", "counter", "Number of failed calls per ingest stage.", "errors"),
+    ("fixes_total", "counter", "GPS fixes handled per ingest stage.", "fixes"),
+    ("bytes_total", "counter", "Bytes written per ingest stage.", "bytes"),
+    ("seconds_max", "gauge", "Slowest single call per ingest stage.", "max"),
+]
+
+
+class Metrics:
+    """
+        各階段的耗時, GPS 點數與寫入位元組數
+        未啟用時 timed 裝飾的函式直接呼叫原函式, 不記錄任何資料
+        子程序各自記錄, 以 drain() 取出後交由主程序 merge(), 最後由主程序 flush() 輸出
+            jsonl     : 每次呼叫一行 JSON ( stage, file, seconds, fixes, bytes, error, pid, time )
+            prometheus: node_exporter textfile collector 格式的累計值
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.jsonl = None
+        self.prometheus = None
+        self.profile_dir = None
+        self.events = []
+        self.totals = {}
+
+    def configure(self, jsonl: Path = None, prometheus: Path = None, profile_dir: Path = None) -> None:
+        self.jsonl = Path(jsonl) if jsonl else None
+        self.prometheus = Path(prometheus) if prometheus else None
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.enabled = any((self.jsonl, self.prometheus, self.profile_dir))
+        if self.profile_dir is not None:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+
+    def config(self) -> dict:
+        # 傳給子程序的設定
+        return {"jsonl": self.jsonl, "prometheus": self.prometheus, "profile_dir": self.profile_dir}
+
+    def record(self, stage: str, seconds: float, fixes: int = None, bytes: int = None, error: str = None) -> None:
+        event = {"time": round(time.time(), 3), "pid": os.getpid(), "stage": stage, "file": _currentFile.get(),
+                 "seconds": round(seconds, 6), "fixes": fixes, "bytes": bytes, "error": error}
+        self.merge([event])
+
+    def merge(self, events: list) -> None:
+        for event in events:
+            self.events.append(event)
+            total = self.totals.setdefault(
+                event["stage"], {"seconds": 0.0, "calls": 0, "errors": 0, "fixes": 0, "bytes": 0, "max": 0.0})
+            total["seconds"] += event["seconds"]
+            total["calls"] += 1
+            total["errors"] += event["error"] is not None
+            total["fixes"] += event["fixes"] or 0
+            total["bytes"] += event["bytes"] or 0
+            total["max"] = max(total["max"], event["seconds"])
+
+    def drain(self) -> list:
+        """
+            取出尚未輸出的紀錄並清空 ( 子程序將結果送回主程序時使用 )
+        """
+        events, self.events = self.events, []
+        self.totals = {}
+        return events
+
+    def flush(self) -> None:
+        if self.jsonl is not None and self.events:
+            self.jsonl.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.jsonl, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(event, ensure_ascii=False) + "\n" for event in self.events)
+        self.events = []
+        if self.prometheus is not None:
+            self._writePrometheus()
+
+    def _writePrometheus(self) -> None:
+        lines = []
+        for name, kind, help, key in PROMETHEUS_METRICS:
+            lines.append(f"# HELP dashcam_stage_{name} {help}")
+            lines.append(f"# TYPE dashcam_stage_{name} {kind}")
+            for stage, total in sorted(self.totals.items()):
+                lines.append(f'dashcam_stage_{name}{{stage="{stage}"}} {total[key]}')
+        # textfile collector 可能隨時讀取, 先寫入暫存檔再取代
+        self.prometheus.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.prometheus.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.prometheus)
+
+    def summary(self) -> str:
+        rows = [f"{'stage':<28} {'calls':>6} {'seconds':>10} {'max':>8} {'fixes':>9} {'MiB':>8}"]
+        for stage, total in sorted(self.totals.items(), key=lambda x: -x[1]["seconds"]):
+            rows.append(f"{stage:<28} {total['calls']:>6} {total['seconds']:>10.3f} {total['max']:>8.3f} "
+                        f"{total['fixes']:>9} {total['bytes'] / 2**20:>8.2f}")
+        return "\n".join(rows)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+            記錄一段程式碼的耗時, 可於期間設定 counts["fixes"], counts["bytes"]
+        """
+        counts = {"fixes": None, "bytes": None}
+        if not self.enabled:
+            yield counts
+            return
+        begin = time.perf_counter()
+        try:
+            yield counts
+        except Exception as e:
+            self.record(name, time.perf_counter() - begin, error=f"{type(e).__name__}: {e}")
+            raise
+        self.record(name, time.perf_counter() - begin, counts["fixes"], counts["bytes"])
+
+    @contextmanager
+    def file(self, path: Path, profile: bool = True):
+        """
+            期間內的紀錄都標記為 path, 設定 profile_dir 時另外以 cProfile 輸出 <檔名>.prof
+            profile=False: 不輸出 cProfile ( ex: 在 event loop 中, 期間會執行其他影像的工作 )
+        """
+        token = _currentFile.set(str(path))
+        if profile and self.enabled and self.profile_dir is not None:
+            profile = cProfile.Profile()
+            profile.enable()
+        else:
+            profile = None
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(self.profile_dir / f"{Path(path).stem}.prof")
+            _currentFile.reset(token)
+
+
+METRICS = Metrics()
+
+
+def timed(stage: str, fixes=None, bytes=None):
+    """
+        記錄函式耗時的裝飾器
+        fixes, bytes: 由 (傳回值, *args, **kwargs) 計算 GPS 點數 / 寫入位元組數的函式
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return fn(*args, **kwargs)
+            begin = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                METRICS.record(stage, time.perf_counter() - begin, error=f"{type(e).__name__}: {e}")
+                raise
+            elapsed = time.perf_counter() - begin
+            METRICS.record(stage, elapsed,
+                           fixes(result, *args, **kwargs) if fixes else None,
+                           bytes(result, *args, **kwargs) if bytes else None)
+            return result
+        return wrapper
+    return decorator
+
+
+def file_size(path) -> int:
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return None
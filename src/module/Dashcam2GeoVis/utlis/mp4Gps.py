@@ -0,0 +1,177 @@
+import mmap
+import struct
+from datetime import datetime, timedelta
+from pathlib import Path
+import numpy as np
+
+_MP4_EPOCH = datetime(1904, 1, 1)
+_KNOTS_TO_KPH = 1.852
+
+
+def _iterBoxes(buf, start: int, end: int):
+    """
+        依序走訪 [start, end) 範圍內的 MP4 box, 只讀取 box 標頭
+        傳回 (box 類型, 內容起點, box 終點)
+    """
+    pos = start
+    while pos + 8 <= end:
+        size, boxType = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield boxType, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _findBox(buf, start: int, end: int, path: list):
+    """
+        依 path ( ex: [b"moov", b"udta"] ) 找出第一個符合的 box, 傳回 (內容起點, 終點)
+    """
+    for boxType, bodyStart, bodyEnd in _iterBoxes(buf, start, end):
+        if boxType == path[0]:
+            if len(path) == 1:
+                return bodyStart, bodyEnd
+            found = _findBox(buf, bodyStart, bodyEnd, path[1:])
+            if found:
+                return found
+    return None
+
+
+def _nmeaToDegree(value: float, hemisphere: bytes) -> float:
+    """
+        將 NMEA 格式 ( DDDMM.MMMM ) 轉換為 浮點數度
+    """
+    degree = int(value / 100)
+    result = degree + (value - degree * 100) / 60
+    return -result if hemisphere in (b"S", b"W") else result
+
+
+def _parseFreeGpsBlock(block: bytes):
+    """
+        解析 Novatek 格式的 freeGPS 區塊, 無有效定位時傳回 None
+        新版韌體資料位於偏移 48, 舊版位於偏移 16
+    """
+    if len(block) < 12 or block[4:12] != b"freeGPS ":
+        return None
+    for offset in (48, 16):
+        if len(block) < offset + 44:
+            continue
+        (hour, minute, second, year, month, day,
+         active, latRef, lonRef, _,
+         lat, lon, speed, track) = struct.unpack_from("<6I4c4f", block, offset)
+        if active not in (b"A", b"V") or latRef not in (b"N", b"S") or lonRef not in (b"E", b"W"):
+            continue
+        if active != b"A":
+            return None
+        try:
+            dateTime = datetime(year + 2000, month, day, hour, minute, second)
+        except ValueError:
+            return None
+        return (dateTime.strftime("%Y:%m:%d %H:%M:%S"),
+                _nmeaToDegree(lat, latRef),
+                _nmeaToDegree(lon, lonRef),
+                speed * _KNOTS_TO_KPH,
+                track)
+    return None
+
+
+def _gpsTable(buf, moov: tuple) -> list:
+    """
+        讀取 moov ( 或 moov/udta ) 內的 gps 索引表, 傳回 [(偏移, 長度), ...]
+    """
+    gps = _findBox(buf, moov[0], moov[1], [b"gps "]) or \
+        _findBox(buf, moov[0], moov[1], [b"udta", b"gps "])
+    if gps is None:
+        return []
+    start, end = gps
+    count = (end - start - 8) // 8
+    if count <= 0:
+        return []
+    return list(zip(*[iter(struct.unpack_from(f">{count * 2}I", buf, start + 8))] * 2))
+
+
+def _videoFrameRate(buf, moov: tuple) -> float:
+    """
+        由影像軌的 mdhd timescale 與 stts 計算平均影格率
+    """
+    for boxType, start, end in _iterBoxes(buf, moov[0], moov[1]):
+        if boxType != b"trak":
+            continue
+        mdia = _findBox(buf, start, end, [b"mdia"])
+        if mdia is None:
+            continue
+        hdlr = _findBox(buf, mdia[0], mdia[1], [b"hdlr"])
+        if hdlr is None or buf[hdlr[0] + 8:hdlr[0] + 12] != b"vide":
+            continue
+        mdhd = _findBox(buf, mdia[0], mdia[1], [b"mdhd"])
+        stts = _findBox(buf, mdia[0], mdia[1], [b"minf", b"stbl", b"stts"])
+        if mdhd is None or stts is None:
+            continue
+        version = buf[mdhd[0]]
+        timescale = struct.unpack_from(">I", buf, mdhd[0] + (20 if version == 1 else 12))[0]
+        entries = struct.unpack_from(">I", buf, stts[0] + 4)[0]
+        table = np.frombuffer(buf[stts[0] + 8:stts[0] + 8 + entries * 8], dtype=">u4")
+        counts, deltas = table[0::2].astype(np.int64), table[1::2].astype(np.int64)
+        total = int((counts * deltas).sum())
+        if total:
+            return round(int(counts.sum()) * timescale / total, 3)
+    return -1
+
+
+def readMp4Gps(p: Path) -> dict:
+    """
+        不經由 exiftool, 直接以 mmap 讀取 MP4 內嵌的 GPS 區塊
+        只讀取 moov 與 gps 索引表指向的 freeGPS 區塊, 不讀取影像內容
+        傳回與 _getExifExtractEmbeddedData 相同鍵值的字典, 數值欄位為 numpy 陣列
+    """
+    rows = []
+    with open(p, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        moov = _findBox(mm, 0, len(mm), [b"moov"])
+        if moov is None:
+            return {}
+        for offset, size in _gpsTable(mm, moov):
+            if offset == 0 or size == 0 or offset + size > len(mm):
+                continue
+            row = _parseFreeGpsBlock(mm[offset:offset + size])
+            if row is not None:
+                rows.append(row)
+
+    if not rows:
+        return {}
+    dateTimes, lats, lons, speeds, tracks = zip(*rows)
+    return {
+        "GPSDateTime": list(dateTimes),
+        "GPSLatitude": np.array(lats, dtype=np.float64),
+        "GPSLongitude": np.array(lons, dtype=np.float64),
+        "GPSSpeed": np.array(speeds, dtype=np.float64),
+        "GPSTrack": np.array(tracks, dtype=np.float64),
+    }
+
+
+def readMp4StartTime(p: Path) -> tuple[float, str]:
+    """
+        由 mvhd 的 creation_time 與 duration 計算影像開始時間, 與 _getExifStartTime 相同
+        持續時間的進位方式比照 exiftool ( 未滿30秒捨去小數, 其餘四捨五入 )
+    """
+    with open(p, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        moov = _findBox(mm, 0, len(mm), [b"moov"])
+        if moov is None:
+            raise ValueError(f"MP4 file: {p} has no moov box")
+        mvhd = _findBox(mm, moov[0], moov[1], [b"mvhd"])
+        if mvhd is None:
+            raise ValueError(f"MP4 file: {p} has no mvhd box")
+        if mm[mvhd[0]] == 1:
+            createTime, _, timescale, duration = struct.unpack_from(">QQIQ", mm, mvhd[0] + 4)
+        else:
+            createTime, _, timescale, duration = struct.unpack_from(">IIII", mm, mvhd[0] + 4)
+        fps = _videoFrameRate(mm, moov)
+
+    seconds = duration / timescale
+    seconds = int(round(seconds, 2)) if seconds < 30 else int(seconds + 0.5)
+    startDate = _MP4_EPOCH + timedelta(seconds=createTime - seconds)
+    return fps, startDate.strftime("%Y:%m:%d %H:%M:%S")
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+
+def douglas_peucker(x, y, tolerance: float) -> np.ndarray:
+    """
+        Douglas-Peucker 簡化, 傳回要保留的點 ( bool 遮罩 ), 頭尾一定保留
+        每一輪同時處理所有尚未完成的區段, 以陣列運算取得各區段的最遠點
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[[0, -1]] = True
+    starts, ends = np.array([0]), np.array([n - 1])
+
+    while len(starts):
+        lengths = ends - starts - 1
+        valid = lengths > 0
+        starts, ends, lengths = starts[valid], ends[valid], lengths[valid]
+        if not len(starts):
+            break
+
+        # 所有區段內部點的索引與其所屬區段
+        group = np.repeat(np.arange(len(starts)), lengths)
+        offsets = np.cumsum(lengths) - lengths
+        idx = np.arange(lengths.sum()) - offsets[group] + starts[group] + 1
+
+        # 內部點到區段 (起點-終點 線段) 的距離
+        ax, ay = x[starts][group], y[starts][group]
+        dx, dy = x[ends][group] - ax, y[ends][group] - ay
+        norm = dx * dx + dy * dy
+        t = np.where(norm > 0, ((x[idx] - ax) * dx + (y[idx] - ay) * dy) / np.where(norm > 0, norm, 1), 0)
+        t = np.clip(t, 0, 1)
+        distance = np.hypot(x[idx] - (ax + t * dx), y[idx] - (ay + t * dy))
+
+        # 各區段的最遠點
+        maxDistance = np.maximum.reduceat(distance, offsets)
+        hits = np.flatnonzero(distance == maxDistance[group])
+        _, first = np.unique(group[hits], return_index=True)
+        farthest = idx[hits[first]]
+
+        split = maxDistance > tolerance
+        keep[farthest[split]] = True
+        starts = np.concatenate((starts[split], farthest[split]))
+        ends = np.concatenate((farthest[split], ends[split]))
+
+    return keep
+
+
+def decimate(values, step: float) -> np.ndarray:
+    """
+        依遞增的數值 ( 秒數或累計距離 ) 每隔 step 保留一點, 頭尾一定保留
+    """
+    values = np.asarray(values, dtype=np.float64)
+    keep = np.zeros(len(values), dtype=bool)
+    if len(values) == 0:
+        return keep
+    bucket = np.floor((values - values[0]) / step)
+    keep[np.flatnonzero(np.diff(bucket, prepend=-1) != 0)] = True
+    keep[-1] = True
+    return keep
+
+
+def parse_spec(spec: str) -> tuple[str, float]:
+    """
+        "dp:5" ( Douglas-Peucker, 容許誤差 5 公尺 ), "time:10" ( 每 10 秒 ), "dist:50" ( 每 50 公尺 )
+    """
+    method, _, value = spec.partition(":")
+    if method not in ("dp", "time", "dist") or not value:
+        raise ValueError(f"Invalid simplify spec '{spec}'. Use 'dp:<m>', 'time:<s>' or 'dist:<m>'.")
+    value = float(value)
+    if value <= 0:
+        raise ValueError(f"Invalid simplify spec '{spec}'. The value must be positive.")
+    return method, value
+
+
+def simplify_mask(df: pd.DataFrame, spec: str) -> np.ndarray:
+    """
+        依 spec 計算 makeExifDf 結果 ( 或 Track ) 中要保留的列
+        dp 使用 EPSG:3857 座標, 容許誤差依平均緯度換算為實際公尺
+        dist 需要 Video2GeoJson 加上的 cumdistance 欄位
+    """
+    method, value = parse_spec(spec)
+    if method == "dp":
+        scale = 1 / np.cos(np.radians(df["lat"].mean()))
+        return douglas_peucker(df["lon3857"], df["lat3857"], value * scale)
+    elif method == "time":
+        return decimate(df["sec"], value)
+    else:
+        return decimate(df["cumdistance"], value)
@@ -0,0 +1,173 @@
+import math
+import sqlite3
+from pathlib import Path
+
+EARTH_RADIUS = 6378137.0  # EPSG:3857 球體半徑
+
+
+def _toWebMercator(lon: float, lat: float) -> tuple:
+    # 與 makeExif._getDfTransGps 相同的 EPSG:3857 投影, 查詢時不需載入 pyproj
+    return (EARTH_RADIUS * math.radians(lon),
+            EARTH_RADIUS * math.log(math.tan(math.pi / 4 + math.radians(lat) / 2)))
+
+
+class SpatialIndex:
+    """
+        以 SQLite 儲存的網格反向索引: EPSG:3857 座標切成 cell_size 的網格,
+        每支影像連續落在同一格的 GPS 點合併為一筆 (格子, 檔名, sec / frame 範圍, 外框)
+        查詢時只讀取與範圍重疊的格子, 結果精度為一個網格內的連續片段
+    """
+
+    def __init__(self, path: Path, cell_size: float = 200.0) -> None:
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS runs (
+                cx INTEGER, cy INTEGER, filename TEXT,
+                sec_start INTEGER, sec_end INTEGER, frame_start INTEGER, frame_end INTEGER,
+                minx REAL, miny REAL, maxx REAL, maxy REAL);
+            CREATE INDEX IF NOT EXISTS runs_cell ON runs (cx, cy);
+            CREATE INDEX IF NOT EXISTS runs_filename ON runs (filename);
+        """)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'cell_size'").fetchone()
+        if row is None:
+            self.conn.execute("INSERT INTO meta VALUES ('cell_size', ?)", (str(cell_size),))
+            self.conn.commit()
+            self.cell_size = cell_size
+        else:
+            self.cell_size = float(row[0])
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "SpatialIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add(self, df) -> int:
+        """
+            加入一支影像 ( makeExifDf 的結果 ), 同檔名的舊紀錄會先刪除, 傳回新增的筆數
+        """
+        import numpy as np
+
+        if df.empty:
+            return 0
+        filename = str(df["filename"].iloc[0])
+        x = df["lon3857"].to_numpy(np.float64)
+        y = df["lat3857"].to_numpy(np.float64)
+        sec = df["sec"].to_numpy(np.int64)
+        frame = df["frame"].to_numpy(np.int64)
+        cx = np.floor(x / self.cell_size).astype(np.int64)
+        cy = np.floor(y / self.cell_size).astype(np.int64)
+
+        starts = np.concatenate(([0], np.flatnonzero((np.diff(cx) != 0) | (np.diff(cy) != 0)) + 1))
+        rows = zip(
+            cx[starts].tolist(), cy[starts].tolist(), [filename] * len(starts),
+            np.minimum.reduceat(sec, starts).tolist(), np.maximum.reduceat(sec, starts).tolist(),
+            np.minimum.reduceat(frame, starts).tolist(), np.maximum.reduceat(frame, starts).tolist(),
+            np.minimum.reduceat(x, starts).tolist(), np.minimum.reduceat(y, starts).tolist(),
+            np.maximum.reduceat(x, starts).tolist(), np.maximum.reduceat(y, starts).tolist())
+        with self.conn:
+            self.conn.execute("DELETE FROM runs WHERE filename = ?", (filename,))
+            self.conn.executemany("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(starts)
+
+    def _candidates(self, minx: float, miny: float, maxx: float, maxy: float) -> list:
+        return self.conn.execute("""
+            SELECT filename, sec_start, sec_end, frame_start, frame_end, minx, miny, maxx, maxy
+            FROM runs
+            WHERE cx BETWEEN ? AND ? AND cy BETWEEN ? AND ?
+              AND maxx >= ? AND minx <= ? AND maxy >= ? AND miny <= ?
+        """, (math.floor(minx / self.cell_size), math.floor(maxx / self.cell_size),
+              math.floor(miny / self.cell_size), math.floor(maxy / self.cell_size),
+              minx, maxx, miny, maxy)).fetchall()
+
+    def query_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> list:
+        minx, miny = _toWebMercator(min_lon, min_lat)
+        maxx, maxy = _toWebMercator(max_lon, max_lat)
+        return _merge(self._candidates(minx, miny, maxx, maxy))
+
+    def query_radius(self, lon: float, lat: float, meters: float) -> list:
+        x, y = _toWebMercator(lon, lat)
+        r = meters / math.cos(math.radians(lat))  # 地面公尺換算為 EPSG:3857 單位
+        rows = [row for row in self._candidates(x - r, y - r, x + r, y + r)
+                if math.hypot(max(row[5] - x, 0, x - row[7]), max(row[6] - y, 0, y - row[8])) <= r]
+        return _merge(rows)
+
+    def query_polygon(self, coordinates: list) -> list:
+        """
+            coordinates: [(lon, lat), ...] 多邊形頂點
+        """
+        polygon = [_toWebMercator(float(lon), float(lat)) for lon, lat in coordinates]
+        xs, ys = [p[0] for p in polygon], [p[1] for p in polygon]
+        rows = [row for row in self._candidates(min(xs), min(ys), max(xs), max(ys))
+                if _rectIntersectsPolygon(row[5:9], polygon)]
+        return _merge(rows)
+
+
+def _edges(points: list) -> list:
+    # 多邊形的邊 ( 最後一點接回第一點 )
+    return list(zip(points, points[1:] + points[:1]))
+
+
+def _pointInPolygon(x: float, y: float, polygon: list) -> bool:
+    # ray casting
+    inside = False
+    for (x1, y1), (x2, y2) in _edges(polygon):
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+    return inside
+
+
+def _segmentsIntersect(a, b, c, d) -> bool:
+    def _orient(p, q, r):
+        v = (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+        return (v > 0) - (v < 0)
+    return _orient(a, b, c) != _orient(a, b, d) and _orient(c, d, a) != _orient(c, d, b)
+
+
+def _rectIntersectsPolygon(rect: tuple, polygon: list) -> bool:
+    minx, miny, maxx, maxy = rect
+    if any(minx <= x <= maxx and miny <= y <= maxy for x, y in polygon):
+        return True
+    corners = [(minx, miny), (maxx, miny), (maxx, maxy), (minx, maxy)]
+    if any(_pointInPolygon(x, y, polygon) for x, y in corners):
+        return True
+    return any(_segmentsIntersect(a, b, c, d) for c, d in _edges(polygon) for a, b in _edges(corners))
+
+
+def _merge(rows: list) -> list:
+    """
+        依檔名與秒數排序, 合併同一支影像中相連的片段
+        傳回 [{"filename", "sec_start", "sec_end", "frame_start", "frame_end"}, ...]
+    """
+    results = []
+    for filename, sec_start, sec_end, frame_start, frame_end, *_ in sorted(rows):
+        last = results[-1] if results else None
+        if last is not None and last["filename"] == filename and sec_start <= last["sec_end"] + 1:
+            last["sec_end"] = max(last["sec_end"], sec_end)
+            last["frame_end"] = max(last["frame_end"], frame_end)
+            continue
+        results.append({"filename": filename, "sec_start": sec_start, "sec_end": sec_end,
+                        "frame_start": frame_start, "frame_end": frame_end})
+    return results
+
+
+def build_index(index: SpatialIndex, video_dir: Path = None, store_dir: Path = None) -> int:
+    """
+        由影像資料夾或 TrackStore ( utlis.trips.iter_clips ) 建立索引, 傳回處理的影像數
+    """
+    from utlis.trips import iter_clips
+
+    return sum(index.add(df) > 0 for df in iter_clips(video_dir, store_dir))
+
+
+if __name__ == "__main__":
+    import sys
+    from cli import index_main
+
+    # build 與 dashcam index space 相同, query 與 dashcam query space 相同
+    index_main("space", sys.argv[1:])
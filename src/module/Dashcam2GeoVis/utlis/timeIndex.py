@@ -0,0 +1,151 @@
+import json
+import os
+from bisect import bisect_left
+from datetime import datetime, timezone
+from itertools import accumulate
+from pathlib import Path
+
+# 與 utlis.makeExif 相同; 查詢只使用標準函式庫, 不在此載入 makeExif ( pandas / pyproj )
+EXIF_TIME_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+
+def parse_time(value: str) -> int:
+    """
+        "YYYY:MM:DD HH:MM:SS" ( exiftool 格式 ) 或 ISO 8601 字串轉為 epoch, 未指定時區時視為 UTC
+    """
+    try:
+        t = datetime.strptime(value, EXIF_TIME_FORMAT)
+    except ValueError:
+        t = datetime.fromisoformat(value)
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone.utc)
+    return int(t.timestamp())
+
+
+def format_time(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime(EXIF_TIME_FORMAT)
+
+
+class TimeIndex:
+    """
+        依開始時間排序的影像區間索引 ( 開始, 結束, 檔名, fps ), 以 JSON 存放
+        查詢以二分搜尋找出涵蓋某一時間 ( 或時間範圍 ) 的影像, 並換算成影像內的秒數與 frame
+        前後鏡頭的影像時間會重疊, 因此另外保存結束時間的前綴最大值
+    """
+
+    FILENAME = ".time_index.json"
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        if self.path.is_dir() or not self.path.suffix:
+            self.path = self.path / self.FILENAME
+        self.clips = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.clips = {x["filename"]: x for x in json.load(f).get("clips", [])}
+        self._sorted = None
+
+    def add(self, df) -> bool:
+        """
+            加入一支影像 ( makeExifDf 的結果 ), 同檔名的紀錄會被取代
+            區間: 影片開始 ( 或更早的第一筆 GPS ) 至最後一筆 GPS 的下一秒
+        """
+        from utlis.makeExif import exif_epochs
+
+        if df.empty:
+            return False
+        epochs = exif_epochs(df["datetime"])
+        base = int(exif_epochs(df["starttime"].iloc[:1])[0])
+        fps = float(df["fps"].iloc[0])
+        # makeExifDf 在第一筆 frame 為負時會整體平移, 記錄平移量才能換算回相同的 frame
+        shift = int(df["frame"].iloc[0]) - int(int(df["sec"].iloc[0]) * fps)
+        filename = str(df["filename"].iloc[0])
+        self.clips[filename] = {
+            "filename": filename,
+            "start": min(base, int(epochs.min())),
+            "end": int(epochs.max()) + 1,
+            "base": base,
+            "fps": fps,
+            "shift": shift,
+        }
+        self._sorted = None
+        return True
+
+    def remove(self, filename: str) -> None:
+        self.clips.pop(filename, None)
+        self._sorted = None
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "clips": self._order()[0]}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def _order(self) -> tuple:
+        if self._sorted is None:
+            clips = sorted(self.clips.values(), key=lambda x: (x["start"], x["filename"]))
+            starts = [x["start"] for x in clips]
+            maxEnds = list(accumulate((x["end"] for x in clips), max))
+            self._sorted = (clips, starts, maxEnds)
+        return self._sorted
+
+    def _overlapping(self, start: int, end: int) -> list:
+        """
+            與 [start, end) 重疊的影像, 依開始時間排序
+        """
+        clips, starts, maxEnds = self._order()
+        i = bisect_left(starts, end) - 1
+        result = []
+        while i >= 0 and maxEnds[i] > start:
+            if clips[i]["end"] > start:
+                result.append(clips[i])
+            i -= 1
+        return result[::-1]
+
+    @staticmethod
+    def _position(clip: dict, epoch: int) -> tuple:
+        sec = epoch - clip["base"]
+        return sec, max(int(sec * clip["fps"]) + clip["shift"], 0)
+
+    def at(self, t) -> list:
+        """
+            某一時間點的影像, 傳回 [{"filename", "sec", "frame"}, ...]
+        """
+        epoch = parse_time(t) if isinstance(t, str) else int(t)
+        return [dict(zip(("filename", "sec", "frame"), (x["filename"], *self._position(x, epoch))))
+                for x in self._overlapping(epoch, epoch + 1)]
+
+    def range(self, start, end) -> list:
+        """
+            時間範圍 [start, end] 內的影像片段 ( 可跨越多支影像 )
+            傳回 [{"filename", "start", "end", "sec_start", "sec_end", "frame_start", "frame_end"}, ...]
+        """
+        start = parse_time(start) if isinstance(start, str) else int(start)
+        end = parse_time(end) if isinstance(end, str) else int(end)
+        result = []
+        for clip in self._overlapping(start, end + 1):
+            begin, finish = max(start, clip["start"]), min(end, clip["end"] - 1)
+            (secStart, frameStart), (secEnd, frameEnd) = self._position(clip, begin), self._position(clip, finish)
+            result.append({
+                "filename": clip["filename"], "start": format_time(begin), "end": format_time(finish),
+                "sec_start": secStart, "sec_end": secEnd, "frame_start": frameStart, "frame_end": frameEnd,
+            })
+        return result
+
+
+def build_index(index: TimeIndex, video_dir: Path = None, store_dir: Path = None) -> int:
+    """
+        由影像資料夾或 TrackStore ( utlis.trips.iter_clips ) 建立索引, 傳回處理的影像數
+    """
+    from utlis.trips import iter_clips
+
+    return sum(index.add(df) for df in iter_clips(video_dir, store_dir))
+
+
+if __name__ == "__main__":
+    import sys
+    from cli import index_main
+
+    # build 與 dashcam index time 相同, query 與 dashcam query time 相同
+    index_main("time", sys.argv[1:])
@@ -0,0 +1,148 @@
+from datetime import datetime, timezone
+import numpy as np
+
+# 每個 GPS 點的欄位與型態, 一點共 36 bytes
+ARRAYS = {
+    "epoch": np.int64,      # GPS 時間 ( unix epoch 秒, UTC )
+    "lat": np.float64,
+    "lon": np.float64,
+    "speed": np.float32,    # km/h
+    "azimuth": np.float32,  # 度
+    "frame": np.int32,
+}
+# makeExifDf 的欄位, 其餘欄位 ( ex: PanoramaVideo2GeoJson 的 ele ) 放在 extra
+DF_COLUMNS = ["datetime", "lat", "lon", "speed", "azimuth", "filename", "starttime", "fps", "sec", "frame",
+              "lon3857", "lat3857"]
+DERIVED_COLUMNS = {"distance", "cumdistance"}
+
+
+class Track:
+    """
+        一支影像的 GPS 軌跡: 每個欄位一個連續的 NumPy 陣列, 影像層級的資訊 ( 檔名, fps, 開始時間 ) 只存一份
+        track[i:j] 傳回共用記憶體的 Track ( 不複製 ), track["lat"] 傳回欄位陣列
+        sec, datetime, lon3857, lat3857 由陣列計算, 不另外儲存; to_df() 傳回與 makeExifDf 相同欄位的DataFrame
+    """
+
+    __slots__ = ("filename", "fps", "starttime", *ARRAYS, "extra")
+
+    def __init__(self, filename: str, fps: float, starttime: int, epoch, lat, lon, speed, azimuth, frame,
+                 extra: dict = None) -> None:
+        self.filename = filename
+        self.fps = float(fps)
+        self.starttime = int(starttime)
+        # 型態已相同的連續陣列不會複製
+        for name, values in zip(ARRAYS, (epoch, lat, lon, speed, azimuth, frame)):
+            setattr(self, name, np.ascontiguousarray(values, dtype=ARRAYS[name]))
+        self.extra = {key: np.asarray(values) for key, values in (extra or {}).items()}
+        n = len(self.epoch)
+        if any(len(getattr(self, name)) != n for name in ARRAYS) or any(len(x) != n for x in self.extra.values()):
+            raise ValueError("All track arrays must have the same length")
+
+    @classmethod
+    def from_df(cls, df) -> "Track":
+        """
+            由 makeExifDf ( 或 TrackStore ) 的DataFrame 建立, 不在 makeExifDf 欄位中的欄位放在 extra
+        """
+        from utlis.makeExif import exif_epochs
+
+        if df.empty:
+            raise ValueError("No GPS data found in video")
+        extra = {x: df[x].to_numpy() for x in df.columns if x not in DF_COLUMNS and x not in DERIVED_COLUMNS}
+        return cls(df["filename"].iloc[0], df["fps"].iloc[0], exif_epochs(df["starttime"].iloc[:1])[0],
+                   exif_epochs(df["datetime"]), df["lat"].to_numpy(), df["lon"].to_numpy(), df["speed"].to_numpy(),
+                   df["azimuth"].to_numpy(), df["frame"].to_numpy(), extra)
+
+    def _replace(self, arrays: list, extra: dict) -> "Track":
+        track = Track.__new__(Track)
+        track.filename, track.fps, track.starttime = self.filename, self.fps, self.starttime
+        for name, values in zip(ARRAYS, arrays):
+            setattr(track, name, values)
+        track.extra = extra
+        return track
+
+    def __len__(self) -> int:
+        return len(self.epoch)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.column(key)
+        # slice 為共用記憶體的 view, 遮罩 / 索引陣列則會複製
+        return self._replace([getattr(self, name)[key] for name in ARRAYS],
+                             {name: values[key] for name, values in self.extra.items()})
+
+    def __repr__(self) -> str:
+        return f"Track({self.filename!r}, {len(self)} fixes, {self.nbytes} bytes)"
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in ARRAYS) + sum(x.nbytes for x in self.extra.values())
+
+    @property
+    def sec(self) -> np.ndarray:
+        return self.epoch - self.starttime
+
+    def projected(self) -> tuple:
+        # EPSG:3857 座標 (lon3857, lat3857)
+        from utlis.makeExif import _getDfTransGps
+        return _getDfTransGps(self.lon.astype(np.float64), self.lat.astype(np.float64))
+
+    def datetimes(self) -> list:
+        # "YYYY:MM:DD HH:MM:SS" 字串 ( 與 makeExifDf 的 datetime 欄位相同 )
+        return [x.replace("-", ":").replace("T", " ")
+                for x in np.datetime_as_string(self.epoch.astype("datetime64[s]"), unit="s").tolist()]
+
+    def column(self, name: str) -> np.ndarray:
+        if name in ARRAYS:
+            return getattr(self, name)
+        if name in self.extra:
+            return self.extra[name]
+        if name == "sec":
+            return self.sec
+        if name == "datetime":
+            return np.array(self.datetimes(), dtype=object)
+        if name in ("lon3857", "lat3857"):
+            return np.asarray(self.projected()[name == "lat3857"])
+        if name in ("filename", "fps", "starttime"):
+            return np.full(len(self), getattr(self, name))
+        raise KeyError(name)
+
+    def to_df(self):
+        """
+            與 makeExifDf 相同欄位與順序的DataFrame ( 另加 extra 的欄位 ), 每次呼叫都會重新建立
+        """
+        import pandas as pd
+
+        lon3857, lat3857 = self.projected()
+        starttime = datetime.fromtimestamp(self.starttime, timezone.utc).strftime("%Y:%m:%d %H:%M:%S")
+        df = pd.DataFrame({
+            "datetime": self.datetimes(),
+            "lat": self.lat,
+            "lon": self.lon,
+            "speed": self.speed.astype(np.float64),
+            "azimuth": self.azimuth.astype(np.float64),
+            "filename": self.filename,
+            "starttime": starttime,
+            "fps": self.fps,
+            "sec": self.sec,
+            "frame": self.frame.astype(np.int64),
+            "lon3857": lon3857,
+            "lat3857": lat3857,
+            **self.extra,
+        })
+        return df
+
+    @staticmethod
+    def concat(tracks: list) -> "Track":
+        """
+            串接同一支影像的多段軌跡 ( 檔名, fps, 開始時間須相同 )
+        """
+        if not tracks:
+            raise ValueError("No tracks to concatenate")
+        first = tracks[0]
+        if any((x.filename, x.fps, x.starttime) != (first.filename, first.fps, first.starttime) for x in tracks):
+            raise ValueError("Only tracks of the same clip can be concatenated")
+        if any(x.extra.keys() != first.extra.keys() for x in tracks):
+            raise ValueError("Tracks have different extra columns")
+        arrays = [np.concatenate([getattr(x, name) for x in tracks]) for name in ARRAYS]
+        extra = {key: np.concatenate([x.extra[key] for x in tracks]) for key in first.extra}
+        return first._replace(arrays, extra)
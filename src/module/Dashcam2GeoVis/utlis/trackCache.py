@@ -0,0 +1,197 @@
+import hashlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+VERSION = 1
+PARTIAL_HASH_BYTES = 1 << 16  # 檔案開頭與結尾各讀取的位元組數
+MAX_BYTES = 1 << 30
+MEMORY_ITEMS = 16
+
+
+class TrackCache:
+    """
+        makeExifDf 結果的快取, 以影像的 (大小, 修改時間, 開頭與結尾的雜湊, backend) 為鍵
+        磁碟: directory/<鍵的前 2 碼>/<鍵>.npz, 每個欄位一個陣列, 總大小超過 max_bytes 時刪除最久未使用的檔案
+            總大小只在第一次寫入與清除時掃描目錄, 之後逐筆累加 ( 其他程序寫入的部分在下次 evict 時才計入 )
+        記憶體: 最近使用的 memory_items 筆 DataFrame ( 同一支影像輸出多種格式時不必重新讀取 )
+        directory 為 None 時只使用記憶體
+        鍵不含路徑, 內容相同的複本共用同一筆, 讀出時 filename 欄位改為目前的檔名
+    """
+
+    def __init__(self, directory: Path = None, max_bytes: int = MAX_BYTES, memory_items: int = MEMORY_ITEMS) -> None:
+        self.directory = Path(directory) if directory is not None else None
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.memory = OrderedDict()
+        self.hits = self.misses = 0
+        self.size = None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def key(self, p: Path, backend: str = "auto") -> str:
+        stat = os.stat(p)
+        digest = hashlib.blake2b(f"{VERSION}:{backend}:{stat.st_size}:{stat.st_mtime_ns}".encode(), digest_size=16)
+        with open(p, "rb") as f:
+            digest.update(f.read(PARTIAL_HASH_BYTES))
+            if stat.st_size > PARTIAL_HASH_BYTES:
+                f.seek(max(stat.st_size - PARTIAL_HASH_BYTES, PARTIAL_HASH_BYTES))
+                digest.update(f.read(PARTIAL_HASH_BYTES))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.npz"
+
+    def get(self, p: Path, backend: str = "auto") -> pd.DataFrame:
+        """
+            傳回快取的 DataFrame ( 複本, 可直接修改 ), 沒有快取時傳回 None
+        """
+        key = self.key(p, backend)
+        df = self.memory.get(key)
+        if df is not None:
+            self.memory.move_to_end(key)
+        elif self.directory is not None:
+            df = self._load(key)
+            if df is not None:
+                self._remember(key, df)
+        if df is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        df = df.copy()
+        if not df.empty:
+            df["filename"] = Path(p).stem
+        return df
+
+    def put(self, p: Path, df: pd.DataFrame, backend: str = "auto") -> None:
+        key = self.key(p, backend)
+        self._remember(key, df.copy())
+        if self.directory is None:
+            return
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        arrays = {"__columns__": np.array(list(df.columns), dtype=str)}
+        constants = []
+        for column in df.columns:
+            values = df[column].to_numpy()
+            if values.dtype == object:
+                values = values.astype(str)
+                # filename, starttime 等整欄相同的字串只存一次
+                if len(values) and (values == values[0]).all():
+                    values = values[:1]
+                    constants.append(column)
+            arrays[f"c_{column}"] = values
+        arrays["__constants__"] = np.array(constants, dtype=str)
+        arrays["__rows__"] = np.array(len(df))
+        # 先寫入暫存檔再取代, 其他程序不會讀到寫到一半的檔案
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        os.replace(tmp, path)
+        if self.size is None:
+            self.size = sum(x[1] for x in self._entries())
+        else:
+            self.size += os.path.getsize(path) - replaced
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def _remember(self, key: str, df: pd.DataFrame) -> None:
+        self.memory[key] = df
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def _load(self, key: str) -> pd.DataFrame:
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                rows = int(data["__rows__"])
+                constants = set(data["__constants__"].tolist())
+                columns = {}
+                for column in data["__columns__"].tolist():
+                    values = data[f"c_{column}"]
+                    if values.dtype.kind == "U":
+                        values = np.repeat(values, rows) if column in constants else values
+                        values = values.astype(object)
+                    columns[column] = values
+        except (OSError, KeyError, ValueError):
+            return None
+        # 更新修改時間, 作為最近使用的依據
+        os.utime(path)
+        return pd.DataFrame(columns)
+
+    def evict(self) -> int:
+        """
+            磁碟快取超過 max_bytes 時由最久未使用的開始刪除, 傳回刪除的檔案數
+        """
+        if self.directory is None:
+            return 0
+        entries = self._entries()
+        total = sum(x[1] for x in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self.size = total
+        return removed
+
+    def _entries(self) -> list:
+        # [(修改時間, 大小, 路徑), ...]
+        entries = []
+        for folder in os.scandir(self.directory):
+            if folder.is_dir():
+                entries += [(x.stat().st_mtime_ns, x.stat().st_size, x.path)
+                            for x in os.scandir(folder.path) if x.name.endswith(".npz")]
+        return entries
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.directory is not None:
+            max_bytes, self.max_bytes = self.max_bytes, -1
+            self.evict()
+            self.max_bytes = max_bytes
+
+
+_default = None
+
+
+def set_default_cache(cache: TrackCache) -> None:
+    """
+        設定 makeExifDf 未指定 cache 時使用的快取 ( None 表示不使用 )
+    """
+    global _default
+    _default = cache
+
+
+def get_default_cache() -> TrackCache:
+    return _default
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extraction cache maintenance")
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--max-size", type=int, default=MAX_BYTES >> 20, metavar="MB",
+                        help="evict least recently used entries above this size")
+    parser.add_argument("--clear", action="store_true", help="remove every entry")
+    args = parser.parse_args()
+
+    cache = TrackCache(args.directory, args.max_size << 20)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {args.directory}")
+    else:
+        print(f"Evicted {cache.evict()} entries from {args.directory}")
@@ -0,0 +1,201 @@
+import glob
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from xml.sax.saxutils import escape
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utlis.makeExif import EXIF_TIME_FORMAT, exif_epochs, saveExifCsv
+
+# 固定的欄位型態, 時間以 unix epoch (秒, 與 GPS 時間相同為 UTC) 儲存
+SCHEMA = pa.schema([
+    ("filename", pa.string()),
+    ("epoch", pa.int64()),
+    ("lat", pa.float64()),
+    ("lon", pa.float64()),
+    ("speed", pa.float32()),
+    ("azimuth", pa.float32()),
+    ("starttime", pa.int64()),
+    ("fps", pa.float64()),
+    ("sec", pa.int32()),
+    ("frame", pa.int32()),
+    ("lat3857", pa.float64()),
+    ("lon3857", pa.float64()),
+])
+
+
+def _fromEpoch(values) -> pd.Series:
+    return pd.Series(np.asarray(values, dtype=np.int64).astype("datetime64[s]")) \
+        .dt.strftime(EXIF_TIME_FORMAT)
+
+
+def df_to_table(df: pd.DataFrame) -> pa.Table:
+    """
+        將 makeExifDf 的DataFrame 轉為固定型態的 Arrow Table
+    """
+    columns = {
+        "filename": df["filename"].astype(str).to_numpy(),
+        "epoch": exif_epochs(df["datetime"]),
+        "starttime": exif_epochs(df["starttime"]),
+    }
+    for name in SCHEMA.names:
+        if name not in columns:
+            columns[name] = df[name].to_numpy()
+    return pa.Table.from_pydict(
+        {name: pa.array(columns[name], type=SCHEMA.field(name).type) for name in SCHEMA.names},
+        schema=SCHEMA)
+
+
+def track_to_table(track) -> pa.Table:
+    """
+        將 Track 直接轉為 Arrow Table ( 不經由 pandas )
+    """
+    lon3857, lat3857 = track.projected()
+    columns = {
+        "filename": pa.repeat(track.filename, len(track)),
+        "epoch": track.epoch,
+        "lat": track.lat,
+        "lon": track.lon,
+        "speed": track.speed,
+        "azimuth": track.azimuth,
+        "starttime": np.full(len(track), track.starttime, dtype=np.int64),
+        "fps": np.full(len(track), track.fps),
+        "sec": track.sec.astype(np.int32),
+        "frame": track.frame,
+        "lat3857": np.asarray(lat3857),
+        "lon3857": np.asarray(lon3857),
+    }
+    return pa.Table.from_pydict(
+        {name: pa.array(columns[name], type=SCHEMA.field(name).type) for name in SCHEMA.names},
+        schema=SCHEMA)
+
+
+def table_to_df(table: pa.Table) -> pd.DataFrame:
+    """
+        將 Arrow Table 轉回與 makeExifDf 相同欄位與順序的DataFrame
+    """
+    if table.num_rows == 0:
+        return pd.DataFrame()
+    df = pd.DataFrame({
+        "datetime": _fromEpoch(table["epoch"].to_numpy()),
+        "lat": table["lat"].to_numpy(),
+        "lon": table["lon"].to_numpy(),
+        "speed": table["speed"].to_numpy().astype(np.float64),
+        "azimuth": table["azimuth"].to_numpy().astype(np.float64),
+        "filename": table["filename"].to_pandas(),
+        "starttime": _fromEpoch(table["starttime"].to_numpy()),
+        "fps": table["fps"].to_numpy(),
+        "sec": table["sec"].to_numpy().astype(np.int64),
+        "frame": table["frame"].to_numpy().astype(np.int64),
+        "lon3857": table["lon3857"].to_numpy(),
+        "lat3857": table["lat3857"].to_numpy(),
+    })
+    return df
+
+
+class TrackStore:
+    """
+        以 Parquet 儲存 makeExifDf 結果的欄位式軌跡庫
+        目錄結構: <root>/date=YYYYMMDD/<filename>.parquet ( 日期為第一筆 GPS 紀錄的 UTC 日期 )
+        讀取時使用 memory map, 後續的 GeoJSON / CSV / GPX 都可由此匯出, 不必重新解析文字檔
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+
+    def write(self, df) -> Path:
+        # df: makeExifDf 的DataFrame 或 Track
+        if len(df) == 0:
+            raise ValueError("Cannot store an empty track")
+        if isinstance(df, pd.DataFrame):
+            table, filename = df_to_table(df), df["filename"].iloc[0]
+        else:
+            table, filename = track_to_table(df), df.filename
+        date = datetime.fromtimestamp(int(table["epoch"][0].as_py()), timezone.utc).strftime("%Y%m%d")
+        path = self.root / f"date={date}" / f"{filename}.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+        # 重新寫入後日期可能改變 ( ex: 過濾掉跨日的異常點 ), 移除其他日期中同檔名的舊檔
+        for old in self.root.glob(f"date=*/{glob.escape(filename)}.parquet"):
+            if old != path:
+                old.unlink(missing_ok=True)
+        return path
+
+    def files(self, start_date: str = None, end_date: str = None, filenames: list = None) -> list:
+        """
+            依日期 ( YYYYMMDD, 含頭尾 ) 與檔名篩選, 只看目錄名稱不讀取檔案內容
+        """
+        result = []
+        if not self.root.exists():
+            return result
+        for partition in sorted(self.root.glob("date=*")):
+            date = partition.name[len("date="):]
+            if start_date is not None and date < start_date:
+                continue
+            if end_date is not None and date > end_date:
+                continue
+            for path in sorted(partition.glob("*.parquet")):
+                if filenames is None or path.stem in filenames:
+                    result.append(path)
+        return result
+
+    def read_table(self, start_date: str = None, end_date: str = None, filenames: list = None,
+                   columns: list = None) -> pa.Table:
+        paths = self.files(start_date, end_date, filenames)
+        if not paths:
+            return SCHEMA.empty_table() if columns is None else \
+                pa.schema([SCHEMA.field(x) for x in columns]).empty_table()
+        return pa.concat_tables(
+            [pq.read_table(path, columns=columns, memory_map=True) for path in paths])
+
+    def read(self, start_date: str = None, end_date: str = None, filenames: list = None) -> pd.DataFrame:
+        return table_to_df(self.read_table(start_date, end_date, filenames))
+
+    def iter_clips(self, start_date: str = None, end_date: str = None, filenames: list = None):
+        """
+            逐一傳回每支影像的DataFrame ( 與 makeExifDf 相同格式 )
+        """
+        for path in self.files(start_date, end_date, filenames):
+            yield table_to_df(pq.read_table(path, memory_map=True))
+
+    def export_geojson(self, output_dir: Path, type: str = "all", compact: bool = False, **filters) -> list:
+        from video2geojson import Video2GeoJson
+
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        outputs = []
+        for df in self.iter_clips(**filters):
+            video = Video2GeoJson.from_dataframe(Path(f"{df['filename'].iloc[0]}.MP4"), df)
+            outputs.append(video.save_geojson(output_dir, type, compact))
+        return outputs
+
+    def export_csv(self, output_dir: Path, **filters) -> list:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        outputs = []
+        for df in self.iter_clips(**filters):
+            out = Path(output_dir) / f"{df['filename'].iloc[0]}.csv"
+            saveExifCsv(df, out)
+            outputs.append(out)
+        return outputs
+
+    def export_gpx(self, output_dir: Path, **filters) -> list:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        outputs = []
+        for path in self.files(**filters):
+            table = pq.read_table(path, columns=["epoch", "lat", "lon"], memory_map=True)
+            out = Path(output_dir) / f"{path.stem}.gpx"
+            times = np.datetime_as_string(
+                table["epoch"].to_numpy().astype("datetime64[s]"), unit="s")
+            with open(out, "w", encoding="utf-8") as f:
+                f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                        '<gpx version="1.1" creator="DashcamRouteMapper" xmlns="http://www.topografix.com/GPX/1/1">\n'
+                        f'  <trk>\n    <name>{escape(path.stem)}</name>\n    <trkseg>\n')
+                f.writelines(
+                    f'      <trkpt lat="{lat!r}" lon="{lon!r}"><time>{t}Z</time></trkpt>\n'
+                    for lat, lon, t in zip(table["lat"].to_pylist(), table["lon"].to_pylist(), times))
+                f.write("    </trkseg>\n  </trk>\n</gpx>\n")
+            outputs.append(out)
+        return outputs
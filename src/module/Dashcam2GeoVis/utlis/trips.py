@@ -0,0 +1,216 @@
+import argparse
+import os
+from pathlib import Path
+import numpy as np
+from utlis.geoDistance import segment_distances
+from utlis.geojsonWriter import line_feature, write_feature_collection
+from utlis.makeExif import exif_epochs
+from utlis.timeIndex import format_time
+
+MAX_GAP = 60        # 秒, 前一段最後一點與下一段第一點的時間差上限
+MAX_JUMP = 200.0    # 公尺, 前一段最後一點與下一段第一點的距離上限
+
+
+class _Trip:
+    """
+        累積中的行程, 每支影像的欄位陣列先放在清單, 輸出時才串接
+    """
+
+    __slots__ = ("clips", "epoch", "lon", "lat", "speed", "azimuth")
+
+    def __init__(self) -> None:
+        self.clips, self.epoch, self.lon, self.lat, self.speed, self.azimuth = [], [], [], [], [], []
+
+    def append(self, filename: str, epoch, lon, lat, speed, azimuth) -> None:
+        self.clips.append(filename)
+        if len(epoch):
+            self.epoch.append(epoch)
+            self.lon.append(lon)
+            self.lat.append(lat)
+            self.speed.append(speed)
+            self.azimuth.append(azimuth)
+
+    @property
+    def last(self) -> tuple:
+        return int(self.epoch[-1][-1]), float(self.lon[-1][-1]), float(self.lat[-1][-1])
+
+    def result(self, number: int, distance_mode: str) -> dict:
+        epoch, lon, lat, speed, azimuth = (np.concatenate(x) for x in
+                                           (self.epoch, self.lon, self.lat, self.speed, self.azimuth))
+        distance = float(segment_distances(lon, lat, distance_mode).sum())
+        duration = int(epoch[-1] - epoch[0])
+        return {
+            "lon": lon, "lat": lat, "epoch": epoch, "speed": speed, "azimuth": azimuth,
+            "properties": {
+                "trip": number,
+                "starttime": format_time(int(epoch[0])),
+                "endtime": format_time(int(epoch[-1])),
+                "duration(s)": duration,
+                "length(m)": round(distance, 3),
+                "avg_speed(km/h)": round(distance / duration * 3.6, 2) if duration else 0.0,
+                "max_speed(km/h)": round(float(speed.max()), 2),
+                "clips": self.clips,
+            },
+        }
+
+
+def stitch_trips(clips, max_gap: int = MAX_GAP, max_jump: float = MAX_JUMP, distance_mode: str = "geodesic"):
+    """
+        將依開始時間排序的影像 ( makeExifDf 的DataFrame ) 串接為連續的行程, 單次走訪
+        與前一段的時間差與距離都在門檻內時併入同一行程, 時間不晚於前一段最後一點的重疊 GPS 點會被捨去
+        逐一傳回 {"lon", "lat", "epoch", "speed", "azimuth", "properties"}, 記憶體中只保留目前的行程
+    """
+    trip, number = None, 0
+    for df in clips:
+        if df.empty:
+            continue
+        epoch = exif_epochs(df["datetime"])
+        order = np.argsort(epoch, kind="stable")
+        epoch = epoch[order]
+        lon = df["lon"].to_numpy(np.float64)[order]
+        lat = df["lat"].to_numpy(np.float64)[order]
+        speed = df["speed"].to_numpy(np.float64)[order]
+        azimuth = df["azimuth"].to_numpy(np.float64)[order]
+        filename = str(df["filename"].iloc[0])
+
+        if trip is not None:
+            lastEpoch, lastLon, lastLat = trip.last
+            keep = epoch > lastEpoch
+            if keep.any():
+                first = np.argmax(keep)
+                gap = int(epoch[first]) - lastEpoch
+                jump = float(segment_distances([lastLon, lon[first]], [lastLat, lat[first]], distance_mode)[0])
+            else:
+                gap, jump = 0, 0.0  # 整段與目前行程重疊 ( ex: 後鏡頭 ), 只記錄檔名
+            if gap <= max_gap and jump <= max_jump:
+                trip.append(filename, epoch[keep], lon[keep], lat[keep], speed[keep], azimuth[keep])
+                continue
+            yield trip.result(number, distance_mode)
+            number += 1
+
+        trip = _Trip()
+        trip.append(filename, epoch, lon, lat, speed, azimuth)
+
+    if trip is not None:
+        yield trip.result(number, distance_mode)
+
+
+def _storeStart(path: Path) -> int:
+    # 第一筆 GPS 時間, 只讀取 Parquet 的欄位統計值
+    import pyarrow.parquet as pq
+
+    metadata = pq.ParquetFile(path).metadata
+    column = metadata.schema.names.index("epoch")
+    stats = [metadata.row_group(i).column(column).statistics for i in range(metadata.num_row_groups)]
+    return min(x.min for x in stats if x is not None and x.has_min_max)
+
+
+def _videoStart(path: Path) -> str:
+    """
+        影像的開始時間 ( EXIF_TIME_FORMAT ), 只讀取 mvhd; 讀不到時以檔名開頭的 YYYYMMDDHHMMSS 代替
+    """
+    from utlis.mp4Gps import readMp4StartTime
+
+    try:
+        return readMp4StartTime(path)[1]
+    except (OSError, ValueError):
+        stamp = path.stem[:14]
+        if stamp.isdigit() and len(stamp) == 14:
+            return f"{stamp[:4]}:{stamp[4:6]}:{stamp[6:8]} {stamp[8:10]}:{stamp[10:12]}:{stamp[12:]}"
+        return ""
+
+
+def store_paths(store, **filters) -> list:
+    """
+        TrackStore 中的檔案依第一筆 GPS 時間排序
+    """
+    return sorted(store.files(**filters), key=lambda x: (_storeStart(x), x.stem))
+
+
+def video_paths(video_dir: Path) -> list:
+    """
+        影像資料夾中的影像依開始時間排序
+    """
+    return sorted(Path(video_dir).glob("**/*.mp4"), key=lambda x: (_videoStart(x), x.stem))
+
+
+def read_clips(paths, backend: str = "auto"):
+    """
+        依序讀取影像 ( .parquet 為 TrackStore 的檔案 ) 傳回 makeExifDf 格式的DataFrame
+        記憶體中只保留目前的影像, 整批共用一個常駐的 exiftool
+    """
+    from utlis.exifTool import ExifTool
+    from utlis.makeExif import makeExifDf
+
+    with ExifTool() as et:
+        for path in paths:
+            path = Path(path)
+            if path.suffix == ".parquet":
+                import pyarrow.parquet as pq
+                from utlis.trackStore import table_to_df
+                yield table_to_df(pq.read_table(path, memory_map=True))
+                continue
+            try:
+                yield makeExifDf(path, [], et, backend)
+            except Exception as e:
+                print(f"Error processing in {path}: {e}")
+
+
+def store_clips(store, **filters):
+    return read_clips(store_paths(store, **filters))
+
+
+def video_clips(video_dir: Path, backend: str = "auto"):
+    return read_clips(video_paths(video_dir), backend)
+
+
+def iter_clips(video_dir: Path = None, store_dir: Path = None, backend: str = "auto"):
+    """
+        TrackStore 與 / 或影像資料夾中的所有影像 ( 各自依開始時間排序, TrackStore 在前 )
+    """
+    paths = []
+    if store_dir is not None:
+        from utlis.trackStore import TrackStore
+        paths += store_paths(TrackStore(store_dir))
+    if video_dir is not None:
+        paths += video_paths(video_dir)
+    return read_clips(paths, backend)
+
+
+def save_trips(trips, output_path: Path, compact: bool = False) -> int:
+    """
+        每個行程輸出為一個 LineString Feature, 傳回行程數
+    """
+    count = 0
+
+    def _features():
+        nonlocal count
+        for trip in trips:
+            count += 1
+            yield line_feature(trip["lon"], trip["lat"], trip["properties"], compact)
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w") as f:
+        write_feature_collection(f, _features(), compact)
+    os.replace(tmp_path, output_path)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stitch consecutive dashcam clips into trips")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--videos", type=Path, dest="video_dir")
+    source.add_argument("--store", type=Path, dest="store_dir")
+    parser.add_argument("-o", "--output", type=Path, default=Path("trips.geojson"))
+    parser.add_argument("--max-gap", type=int, default=MAX_GAP, help="max time gap between clips (s)")
+    parser.add_argument("--max-jump", type=float, default=MAX_JUMP, help="max distance between clips (m)")
+    parser.add_argument("--compact", action="store_true")
+    args = parser.parse_args()
+
+    if args.store_dir is not None:
+        from utlis.trackStore import TrackStore
+        clips = store_clips(TrackStore(args.store_dir))
+    else:
+        clips = video_clips(args.video_dir)
+    count = save_trips(stitch_trips(clips, args.max_gap, args.max_jump), args.output, args.compact)
+    print(f"Saved {count} trips to {args.output}")
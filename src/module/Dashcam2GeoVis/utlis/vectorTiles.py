@@ -0,0 +1,227 @@
+import json
+import os
+import shutil
+import struct
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import numpy as np
+from pyproj import Transformer
+from utlis.makeExif import _getDfTransGps
+from utlis.simplify import douglas_peucker
+
+# EPSG:3857 的世界範圍 (公尺)
+WORLD = 20037508.342789244
+EXTENT = 4096
+LAYER = "tracks"
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(number: int, payload: bytes) -> bytes:
+    # length-delimited ( wire type 2 )
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _packed(number: int, values: list) -> bytes:
+    return _field(number, b"".join(_varint(x) for x in values))
+
+
+def _value(value) -> bytes:
+    """
+        Mapbox Vector Tile 的 Value 訊息 ( string / double / sint64 / bool )
+    """
+    if isinstance(value, bool):
+        return _varint(7 << 3) + _varint(int(value))
+    if isinstance(value, int):
+        return _varint(6 << 3) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _varint(3 << 3 | 1) + struct.pack("<d", value)
+    return _field(1, str(value).encode("utf-8"))
+
+
+def _lineGeometry(x: np.ndarray, y: np.ndarray) -> list:
+    """
+        LineString 的幾何指令 ( MoveTo + LineTo, 座標為與前一點的差值並 zigzag 編碼 )
+        傳回 None 表示量化後不足兩個相異點
+    """
+    points = np.column_stack((x, y))
+    if len(points) > 1:
+        points = points[np.concatenate(([True], np.any(np.diff(points, axis=0) != 0, axis=1)))]
+    if len(points) < 2:
+        return None
+    deltas = np.diff(points, axis=0, prepend=[[0, 0]]).astype(np.int64)
+    zigzag = ((deltas << 1) ^ (deltas >> 63)).ravel().tolist()
+    return [1 | 1 << 3] + zigzag[:2] + [2 | (len(points) - 1) << 3] + zigzag[2:]
+
+
+def encode_tile(features: list, layer: str = LAYER, extent: int = EXTENT) -> bytes:
+    """
+        將 [(x 陣列, y 陣列, properties), ...] ( 已轉為 tile 內座標 ) 編碼為 Mapbox Vector Tile
+        屬性值為 list / dict 時以 JSON 字串儲存, None 不輸出
+    """
+    keys, values, encoded = {}, {}, []
+    for x, y, properties in features:
+        geometry = _lineGeometry(x, y)
+        if geometry is None:
+            continue
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value, ensure_ascii=False)
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value).__name__, value), len(values)))
+        encoded.append(_packed(2, tags) + _varint(3 << 3) + _varint(2) + _packed(4, geometry))
+
+    body = _varint(15 << 3) + _varint(2) + _field(1, layer.encode("utf-8"))
+    body += b"".join(_field(2, feature) for feature in encoded)
+    body += b"".join(_field(3, key.encode("utf-8")) for key in keys)
+    body += b"".join(_field(4, _value(value)) for _, value in values)
+    body += _varint(5 << 3) + _varint(extent)
+    return _field(3, body)
+
+
+def _densify(x: np.ndarray, y: np.ndarray, step: float) -> tuple:
+    """
+        在長線段中插入點, 使相鄰兩點的距離不超過 step ( 簡化後的長直線才不會跳過中間的 tile )
+    """
+    counts = np.ceil(np.maximum(np.abs(np.diff(x)), np.abs(np.diff(y))) / step).astype(np.int64)
+    counts = np.maximum(counts, 1)
+    if (counts == 1).all():
+        return x, y
+    idx = np.repeat(np.arange(len(x) - 1), counts)
+    frac = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)) / np.repeat(counts, counts)
+    return (np.append(x[idx] + (x[idx + 1] - x[idx]) * frac, x[-1]),
+            np.append(y[idx] + (y[idx + 1] - y[idx]) * frac, y[-1]))
+
+
+def _pieces(x: np.ndarray, y: np.ndarray, zoom: int):
+    """
+        將一條線依所在的 tile 切段, 每段前後各多帶一點, 跨越 tile 邊界的線段在兩邊都會畫出
+        傳回 ((tx, ty), 起點索引, 終點索引)
+    """
+    size = 2 * WORLD / 2 ** zoom
+    tx = np.floor((x + WORLD) / size).astype(np.int64)
+    ty = np.floor((WORLD - y) / size).astype(np.int64)
+    change = np.flatnonzero((np.diff(tx) != 0) | (np.diff(ty) != 0)) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.concatenate((change, [len(x)]))
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        yield (int(tx[start]), int(ty[start])), max(start - 1, 0), min(end + 1, len(x))
+
+
+def build_tiles(lines, output_dir: Path, min_zoom: int = 5, max_zoom: int = 16, extent: int = EXTENT) -> dict:
+    """
+        由線段來源建立 z/x/y.pbf 向量圖磚目錄, 各縮放層級先依像素大小簡化
+        lines: 傳回 [(x 陣列, y 陣列, properties), ...] 迭代器的函式 ( EPSG:3857 座標 ),
+               只迭代一次, 各縮放層級共用同一份陣列
+        先前建立的縮放層級目錄會先清除, 不會留下這次沒有產生的圖磚
+        傳回寫入 metadata.json 的內容
+    """
+    output_dir = Path(output_dir)
+    for path in output_dir.glob("*"):
+        if path.is_dir() and path.name.isdigit():
+            shutil.rmtree(path)
+    sources = [(np.asarray(x), np.asarray(y), properties) for x, y, properties in lines() if len(x) >= 2]
+    if sources:
+        bounds = [min(x.min() for x, _, _ in sources), min(y.min() for _, y, _ in sources),
+                  max(x.max() for x, _, _ in sources), max(y.max() for _, y, _ in sources)]
+    count = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        size = 2 * WORLD / 2 ** zoom
+        tolerance = size / 512  # 約半個螢幕像素
+        tiles = {}
+        for x, y, properties in sources:
+            keep = douglas_peucker(x, y, tolerance)
+            sx, sy = _densify(x[keep], y[keep], size / 2)
+            for (tx, ty), start, end in _pieces(sx, sy, zoom):
+                px = np.round((sx[start:end] + WORLD - tx * size) / size * extent)
+                py = np.round((WORLD - sy[start:end] - ty * size) / size * extent)
+                tiles.setdefault((tx, ty), []).append((px, py, properties))
+
+        for (tx, ty), features in tiles.items():
+            path = output_dir / str(zoom) / str(tx) / f"{ty}.pbf"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(encode_tile(features, extent=extent))
+        count += len(tiles)
+
+    lon, lat = Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True).transform(
+        [bounds[0], bounds[2]], [bounds[1], bounds[3]]) if count else ([0, 0], [0, 0])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    metadata = {
+        "format": "pbf", "layer": LAYER, "minzoom": min_zoom, "maxzoom": max_zoom, "tiles": count,
+        "bounds": [lon[0], lat[0], lon[1], lat[1]],
+        "center": [(lat[0] + lat[1]) / 2, (lon[0] + lon[1]) / 2],
+    }
+    with open(output_dir / "metadata.json", "w") as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+
+def lines_from_geojson(geojson_path: Path):
+    """
+        由 GeoJSON ( ex: 合併檔 ) 的 LineString 建立線段來源, 所有座標一次投影
+    """
+    def _lines():
+        with open(geojson_path, "r") as f:
+            features = [x for x in json.load(f)["features"] if x["geometry"]["type"] == "LineString"]
+        coordinates = [np.asarray(x["geometry"]["coordinates"], dtype=np.float64).reshape(-1, 2) for x in features]
+        if not coordinates:
+            return
+        lon, lat = np.concatenate(coordinates).T
+        x, y = (np.asarray(v) for v in _getDfTransGps(lon, lat))
+        ends = np.cumsum([len(c) for c in coordinates]).tolist()
+        for feature, start, end in zip(features, [0] + ends[:-1], ends):
+            yield x[start:end], y[start:end], feature.get("properties") or {}
+    return _lines
+
+
+def lines_from_store(store, **filters):
+    """
+        由 TrackStore 建立線段來源, 直接使用儲存的 EPSG:3857 座標
+    """
+    import pyarrow.parquet as pq
+
+    def _lines():
+        for path in store.files(**filters):
+            table = pq.read_table(path, columns=["lon3857", "lat3857"], memory_map=True)
+            yield table["lon3857"].to_numpy(), table["lat3857"].to_numpy(), {"filename": path.stem}
+    return _lines
+
+
+class _TileRequestHandler(SimpleHTTPRequestHandler):
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map, ".pbf": "application/x-protobuf"}
+
+    def end_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        super().end_headers()
+
+
+def serve_tiles(directory: Path, port: int = 8000, host: str = "127.0.0.1") -> None:
+    """
+        本機預覽用的簡易圖磚伺服器 ( 同時提供同目錄下的 HTML )
+    """
+    handler = partial(_TileRequestHandler, directory=os.fspath(directory))
+    with ThreadingHTTPServer((host, port), handler) as server:
+        print(f"Serving {directory} at http://{host}:{port}/ (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
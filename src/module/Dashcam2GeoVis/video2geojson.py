@@ -1,64 +1,157 @@
 import pandas as pd
+import numpy as np
 from pathlib import Path
-import geojson
 import os
 from geojson import Point, LineString, Feature, FeatureCollection
-from utlis.makeExif import makeExifDf
-from utlis.GPSProcessor import GPXProcessor
-import re
-from geopy.distance import geodesic
-from datetime import datetime
+from utlis.makeExif import EXIF_TIME_FORMAT, makeExifDf
+from utlis.mp4Gps import readMp4StartTime
+from utlis.exifTool import ExifTool
+from utlis.trackCache import TrackCache
+from utlis.track import Track
+from utlis.GPSProcessor import interpolate_track, read_gpx_arrays
+from utlis.geoDistance import _WGS84, segment_distances
+from utlis.simplify import decimate, simplify_mask
+from utlis.simplify import parse_spec as parse_simplify_spec
+from utlis.gpsClean import clean_gps
+from utlis.frameGeotag import frame_geotags, iter_frame_geotags
+from utlis.metrics import file_size, timed
+from utlis.geojsonWriter import iter_point_features, line_feature, localize, write_feature_collection
+from datetime import datetime, timezone
 
 
 class Video2GeoJson:
-    def __init__(self, video_path: Path) -> None:
+    def __init__(self, video_path: Path, exiftool: ExifTool = None, backend: str = "auto",
+                 distance_mode: str = "geodesic", clean: str = None, cache: TrackCache = None) -> None:
+        # clean: 異常點過濾與平滑方式, 參考 utlis.gpsClean.parse_spec, ex: "filter", "median:5"
+        # cache: 讀取結果的快取 ( utlis.trackCache ), 未指定時使用預設快取
         self.video_path = video_path
-        self.df = makeExifDf(video_path, [])
-        if self.df.empty:
+        self.distance_mode = distance_mode
+        df = makeExifDf(video_path, [], exiftool, backend, cache)
+        if clean:
+            df = clean_gps(df, clean)
+        if df.empty:
             raise ValueError(f"No GPS data found in video")
+        self.track = Track.from_df(df)
+        self.add_distance_columns()
 
+    @classmethod
+    def from_dataframe(cls, video_path: Path, df: pd.DataFrame, distance_mode: str = "geodesic",
+                       clean: str = None) -> "Video2GeoJson":
+        # 由已取得的 makeExifDf 結果建立, 不再重新讀取影像
+        if clean:
+            df = clean_gps(df, clean)
+        if df.empty:
+            raise ValueError(f"No GPS data found in video")
+        return cls.from_track(video_path, Track.from_df(df), distance_mode)
+
+    @classmethod
+    def from_track(cls, video_path: Path, track: Track, distance_mode: str = "geodesic") -> "Video2GeoJson":
+        if len(track) == 0:
+            raise ValueError(f"No GPS data found in video")
+        self = cls.__new__(cls)
+        self.video_path = Path(video_path)
+        self.distance_mode = distance_mode
+        self.track = track
+        self.add_distance_columns()
+        return self
+
+    @property
+    def df(self) -> pd.DataFrame:
+        # 相容舊介面: 以 pandas 檢視軌跡 ( makeExifDf 的欄位加上 distance, cumdistance )
+        # 第一次存取時建立並保留, 軌跡改變 ( add_distance_columns ) 時才重新建立
+        if self._df is None:
+            self._df = self.track.to_df()
+            self._df["distance"] = np.diff(self.cumdistance, prepend=0.0)
+            self._df["cumdistance"] = self.cumdistance
+        return self._df
+
+    @df.setter
+    def df(self, df: pd.DataFrame) -> None:
+        self.track = Track.from_df(df)
+        self.add_distance_columns()
+
+    @timed("add_distance_columns", fixes=lambda result, self: len(self.track))
+    def add_distance_columns(self):
+        # cumdistance: 由第一點起算的累計距離 (公尺), 與前一點的距離為其差分
+        distances = segment_distances(
+            self.track.lon, self.track.lat, self.distance_mode)
+        self.cumdistance = np.concatenate(([0.0], np.cumsum(distances)))
+        self._df = None
+
+    def point_properties(self, track: Track) -> dict:
+        # 點的屬性 {名稱: 陣列}: 時間之外, Track.extra 的欄位也一併輸出
+        return {"timestamp": localize(track.epoch), **track.extra}
+
+    @timed("create_point_feature", fixes=lambda result, self: len(result))
     def create_point_feature(self):
         point_feartures = []
-        for _, row in self.df.iterrows():
-            point = Point((row["lon"], row["lat"]))
-            datetime_str = re.sub(
-                r"(\d{4}):(\d{2}):(\d{2})", r"\1-\2-\3", row["datetime"])
-            dt_obj = datetime.strptime(datetime_str, "%Y-%m-%d %H:%M:%S")
-            timestamp = int(dt_obj.timestamp())
-            properties = {
-                "timestamp": timestamp
-                # "datetime": dt_obj.isoformat() + 'Z',
-                # "speed": row["speed"],
-                # "azimuth": row["azimuth"],
-            }
-            point_feature = Feature(geometry=point, properties=properties)
+        properties = self.point_properties(self.track)
+        names = list(properties)
+        columns = [[None if x != x else x for x in np.asarray(values).tolist()] for values in properties.values()]
+        for lon, lat, *values in zip(self.track.lon.tolist(), self.track.lat.tolist(), *columns):
+            point = Point((lon, lat))
+            point_feature = Feature(geometry=point, properties=dict(zip(names, values)))
             point_feartures.append(point_feature)
 
         return point_feartures
 
-    def create_line_feature(self):
-        line_coordinates = list(zip(self.df["lon"], self.df["lat"]))
-
+    def create_line_properties(self):
         # Calculate the total distance of the line
-        total_distance = self.calculate_distance(line_coordinates)
-        starttime_str = re.sub(
-            r"(\d{4}):(\d{2}):(\d{2})", r"\1-\2-\3", self.df["datetime"].iloc[0])
-        endtime_str = re.sub(r"(\d{4}):(\d{2}):(\d{2})",
-                             r"\1-\2-\3", self.df["datetime"].iloc[-1])
-        starttime_obj = datetime.strptime(starttime_str, "%Y-%m-%d %H:%M:%S")
-        endtime_obj = datetime.strptime(endtime_str, "%Y-%m-%d %H:%M:%S")
+        total_distance = float(self.cumdistance[-1])
+        starttime_obj, endtime_obj = (datetime.fromtimestamp(int(x), timezone.utc).replace(tzinfo=None)
+                                      for x in (self.track.epoch[0], self.track.epoch[-1]))
         line_properties = {
-            "filename": self.df["filename"].iloc[0],
+            "filename": self.track.filename,
             "starttime": starttime_obj.isoformat(),
             "endtime": endtime_obj.isoformat(),
             "length(m)": round(total_distance, 3),  # meters
         }
+        return line_properties
 
+    @timed("create_line_feature", fixes=lambda result, self: len(result["geometry"]["coordinates"]))
+    def create_line_feature(self):
+        line_coordinates = list(zip(self.track.lon.tolist(), self.track.lat.tolist()))
         line_feature = Feature(geometry=LineString(
-            line_coordinates), properties=line_properties)
+            line_coordinates), properties=self.create_line_properties())
 
         return line_feature
 
+    def simplify_mask(self, spec: str) -> np.ndarray:
+        # spec 參考 utlis.simplify.parse_spec, ex: "dp:5", "time:10", "dist:50"
+        method, value = parse_simplify_spec(spec)
+        if method == "dist":
+            return decimate(self.cumdistance, value)
+        return simplify_mask(self.track, spec)
+
+    def simplified_track(self, spec: str = None) -> Track:
+        if not spec:
+            return self.track
+        return self.track[self.simplify_mask(spec)]
+
+    def simplified_df(self, spec: str = None):
+        df = self.df
+        if not spec:
+            return df
+        return df[self.simplify_mask(spec)]
+
+    def iter_features(self, type="all", compact=False, simplify: dict = None):
+        """
+            依序產生 Feature 的 JSON 字串 ( 與 create_feature_collection 順序相同 ),
+            直接由軌跡的陣列輸出, 不建立 Feature 物件
+            simplify: 各輸出類型的簡化方式, ex: {"line": "dp:5", "point": "time:10"}
+            線段長度等屬性一律以完整軌跡計算
+        """
+        if type not in ("all", "point", "line"):
+            raise ValueError("Invalid type. Choose 'all', 'point', or 'line'.")
+        simplify = simplify or {}
+
+        if type in ("all", "line"):
+            track = self.simplified_track(simplify.get("line"))
+            yield line_feature(track.lon, track.lat, self.create_line_properties(), compact)
+        if type in ("all", "point"):
+            track = self.simplified_track(simplify.get("point"))
+            yield from iter_point_features(track.lon, track.lat, self.point_properties(track), compact)
+
     def create_feature_collection(self, type="all"):
         if type == "all":
             point_features = self.create_point_feature()
@@ -82,86 +175,92 @@ class Video2GeoJson:
         else:
             raise ValueError("Invalid type. Choose 'all', 'point', or 'line'.")
 
-    def save_geojson(self, output_dir: Path,  type: str = "all"):
-        feature_collection = self.create_feature_collection(type)
+    @timed("save_geojson", fixes=lambda result, self, *args, **kwargs: len(self.track),
+           bytes=lambda result, *args, **kwargs: file_size(result))
+    def save_geojson(self, output_dir: Path,  type: str = "all", compact: bool = False, simplify: dict = None):
+        # compact=False 時輸出與 geojson.dump(indent=2) 相同, compact=True 時不縮排
+        features = self.iter_features(type, compact, simplify)
         output_path = os.path.join(
             output_dir, f"{self.video_path.stem}.geojson")
         with open(output_path, "w") as f:
-            geojson.dump(feature_collection, f, indent=2)
+            write_feature_collection(f, features, compact)
+        return output_path
+
+    def frame_geotags(self, stride: int = 1, bulk: bool = False):
+        # 每 stride 個影格內插的位置, bulk=True 時傳回陣列, 否則逐一產生 (frame, time, lat, lon, azimuth, speed)
+        if bulk:
+            return frame_geotags(self.track, stride)
+        return iter_frame_geotags(self.track, stride)
 
     def calculate_distance(self, line_coordinates):
-        total_distance = 0.0
-        for i in range(len(line_coordinates) - 1):
-            point1 = (line_coordinates[i][1], line_coordinates[i][0])
-            point2 = (line_coordinates[i + 1][1], line_coordinates[i + 1][0])
-            distance = geodesic(point1, point2).meters
-            total_distance += distance
-        return total_distance
-
-
-# class PanoramaVideo2GeoJson:
-#     def __init__(self, video_path: Path, gpx_path: Path) -> None:
-#         self.video_path = Path(video_path)
-#         self.gpx_path = Path(gpx_path)
-#         self.track_pts = GPXProcessor(gpx_path).read_gpx()
-#         self.df = pd.DataFrame(self.track_pts)
-
-#     def create_point_feature(self):
-#         point_feartures = []
-#         for _, row in self.df.iterrows():
-#             point = Point((row["lon"], row["lat"]))
-#             properties = {
-#                 "datetime": row["time"].strftime("%Y-%m-%d %H:%M:%S"),
-#                 "elevation": row["ele"],
-#             }
-#             point_feature = Feature(geometry=point, properties=properties)
-#             point_feartures.append(point_feature)
-
-#         return point_feartures
-
-#     def create_line_feature(self):
-#         line_coordinates = list(zip(self.df["lon"], self.df["lat"]))
-
-#         # Calculate the total distance of the line
-#         total_distance = self.calculate_distance(line_coordinates)
-
-#         line_properties = {
-#             "filename": self.video_path.stem,
-#             "starttime": self.df["time"].iloc[0].strftime("%Y-%m-%d %H:%M:%S"),
-#             "endtime": self.df["time"].iloc[-1].strftime("%Y-%m-%d %H:%M:%S"),
-#             "length(m)": round(total_distance, 3),  # meters
-#         }
-
-#         line_feature = Feature(geometry=LineString(
-#             line_coordinates), properties=line_properties)
-
-#         return line_feature
-
-#     def create_feature_collection(self):
-#         point_features = self.create_point_feature()
-#         line_feature = self.create_line_feature()
-
-#         feature_collection = FeatureCollection(
-#             features=[line_feature] + point_features
-#         )
-
-#         return feature_collection
-
-#     def save_geojson(self, output_dir: Path):
-#         feature_collection = self.create_feature_collection()
-#         output_path = os.path.join(
-#             output_dir, f"{self.video_path.stem}.geojson")
-#         with open(output_path, "w") as f:
-#             geojson.dump(feature_collection, f, indent=2)
-
-#     def calculate_distance(self, line_coordinates):
-#         total_distance = 0.0
-#         for i in range(len(line_coordinates) - 1):
-#             point1 = (line_coordinates[i][1], line_coordinates[i][0])
-#             point2 = (line_coordinates[i + 1][1], line_coordinates[i + 1][0])
-#             distance = geodesic(point1, point2).meters
-#             total_distance += distance
-#         return total_distance
+        if len(line_coordinates) < 2:
+            return 0.0
+        lon, lat = np.asarray(line_coordinates, dtype=np.float64).T
+        return float(segment_distances(lon, lat, self.distance_mode).sum())
+
+
+class PanoramaVideo2GeoJson(Video2GeoJson):
+    """
+        360 影像 ( ex: Insta360 ) 搭配另外輸出的 GPX 軌跡
+        GPX 以陣列讀取後用 np.interp 內插至每 1/frequency 秒 ( frequency=None 時為每個影格 ),
+        直接建立 Track ( 高度放在 extra["ele"] ), 之後的輸出與 Video2GeoJson 相同, 點另有 elevation 屬性
+        GPX 的陣列存放於 gpx_track
+    """
+
+    def __init__(self, video_path: Path, gpx_path: Path, frequency: float = 1.0, fps: float = 30.0,
+                 distance_mode: str = "geodesic", clean: str = None) -> None:
+        self.video_path = Path(video_path)
+        self.gpx_path = Path(gpx_path)
+        self.distance_mode = distance_mode
+        self.gpx_track = read_gpx_arrays(self.gpx_path)
+        if len(self.gpx_track["time"]) < 2:
+            raise ValueError(f"Track points must be at least 2")
+        self.fps, self.start = self._video_timing(fps)
+        elapsed = self.sample_offsets(frequency)
+        self.track = self._build_track(elapsed)
+        if clean:
+            # Track 的時間只到秒, 以內插的實際時間判斷重複與推算速度
+            df = clean_gps(self.track.to_df(), clean, self.start + elapsed)
+            if df.empty:
+                raise ValueError(f"No GPS data found in video")
+            self.track = Track.from_df(df)
+        if len(self.track) == 0:
+            raise ValueError(f"No GPS data found in video")
+        self.add_distance_columns()
+
+    def point_properties(self, track: Track) -> dict:
+        # GPX 沒有高度的點為 null
+        return {"timestamp": localize(track.epoch), "elevation": track.extra["ele"]}
+
+    def _video_timing(self, fps: float) -> tuple:
+        # 影像的 fps 與開始時間 ( unix timestamp ), 無法由 mvhd 取得時以 GPX 第一點為開始時間
+        try:
+            fps, startDate = readMp4StartTime(self.video_path)
+            start = datetime.strptime(startDate, EXIF_TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+            return fps, start
+        except (OSError, ValueError):
+            return fps, float(self.gpx_track["time"][0])
+
+    def sample_offsets(self, frequency: float = 1.0) -> np.ndarray:
+        # 影像開始後, GPX 範圍內每 1/frequency 秒 ( 或每個影格 ) 的時間點, 以距影像開始的秒數表示
+        step = 1 / (frequency or self.fps)
+        first = np.ceil((self.gpx_track["time"][0] - self.start) / step - 1e-9)
+        last = np.floor((self.gpx_track["time"][-1] - self.start) / step + 1e-9)
+        return np.arange(max(first, 0), last + 1) * step
+
+    def _build_track(self, elapsed: np.ndarray) -> Track:
+        times = self.start + elapsed
+        points = interpolate_track(self.gpx_track, times)
+        lon, lat = points["lon"], points["lat"]
+        speed, azimuth = np.zeros(len(times)), np.zeros(len(times))
+        if len(times) > 1:
+            # GPX 沒有速度與方位角, 以相鄰兩點推算, 最後一點沿用前一段
+            forward, _, distance = _WGS84.inv(lon[:-1], lat[:-1], lon[1:], lat[1:])
+            speed[:-1] = np.asarray(distance) / np.diff(times) * 3.6
+            azimuth[:-1] = np.mod(forward, 360)
+            speed[-1], azimuth[-1] = speed[-2], azimuth[-2]
+        return Track(self.video_path.stem, self.fps, np.floor(self.start), np.floor(times), lat, lon, speed, azimuth,
+                     np.floor(elapsed * self.fps + 1e-6), {"ele": points["ele"]})
 
 
 if __name__ == "__main__":
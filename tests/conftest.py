@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src" / "module" / "Dashcam2GeoVis"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from fixtures import install_fake_exiftool, prepend_path, synthetic_track, write_mp4, write_osm  # noqa: E402
+
+TRIP_GAP = 600  # 秒, trip_dir 中行程之間的間隔
+
+
+@pytest.fixture(scope="session", autouse=True)
+def fake_exiftool(tmp_path_factory):
+    # 以 fixture 的原始軌跡取代 exiftool, 不需要安裝 exiftool
+    prepend_path(install_fake_exiftool(tmp_path_factory.mktemp("bin")).parent)
+
+
+@pytest.fixture(scope="session")
+def video_dir(tmp_path_factory) -> Path:
+    # 三支連續的 60 秒影像
+    folder = tmp_path_factory.mktemp("videos")
+    track = synthetic_track(180, seed=1)
+    for i in range(3):
+        part = {name: values[i * 60:(i + 1) * 60] for name, values in track.items()}
+        write_mp4(folder / f"2025052315541{i}_00003{i}A.mp4", part)
+    return folder
+
+
+@pytest.fixture(scope="session")
+def trip_track() -> dict:
+    # 300 秒的連續行駛, trip_dir 切成影像後另外錯開時間
+    return synthetic_track(300, seed=2)
+
+
+@pytest.fixture(scope="session")
+def trip_dir(tmp_path_factory, trip_track) -> Path:
+    # 十支 30 秒的影像, 每兩支連續為一個行程, 行程之間相隔 TRIP_GAP 秒 ( 共五個行程 )
+    folder = tmp_path_factory.mktemp("trips")
+    for i in range(10):
+        part = {name: values[i * 30:(i + 1) * 30] for name, values in trip_track.items()}
+        part["time"] = part["time"] + np.timedelta64(i // 2 * TRIP_GAP, "s")
+        write_mp4(folder / f"clip{i:02d}.mp4", part)
+    return folder
+
+
+@pytest.fixture(scope="session")
+def roads(tmp_path_factory, trip_track) -> Path:
+    # 沿著 trip_track 的道路, 每 100 公尺一個路口並有左右支線
+    return write_osm(tmp_path_factory.mktemp("osm") / "roads.osm", trip_track)
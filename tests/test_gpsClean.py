@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from fixtures import gps_dict, synthetic_track
+from utlis.gpsClean import clean_gps, clean_mask, kalman_filter, median_filter
+from utlis.makeExif import _buildExifDf, _getDfTransGps
+
+
+@pytest.fixture
+def df():
+    return _buildExifDf(gps_dict(synthetic_track(60, seed=4)), "clip", 29.97, "2025:05:23 07:54:19")
+
+
+def test_clean_track_is_kept(df):
+    assert clean_mask(df).all()
+    assert len(clean_gps(df)) == len(df)
+
+
+def test_duplicate_after_an_invalid_point_is_kept(df):
+    epoch = np.arange(len(df), dtype=np.float64)
+    epoch[11] = epoch[10]
+    df.loc[10, ["lat", "lon"]] = 0.0  # (0, 0) 無效, 時間與下一點相同
+    keep = clean_mask(df, epoch=epoch)
+    assert not keep[10] and keep[11]
+
+    # 與前一個保留點時間相同時才視為重複
+    epoch[21] = epoch[20]
+    keep = clean_mask(df, epoch=epoch)
+    assert keep[20] and not keep[21]
+    assert keep.sum() == len(df) - 2
+
+
+def test_spike_and_short_runs_are_dropped(df):
+    df.loc[30, "lat"] += 0.01  # 約 1 公里的單一跳點
+    df.loc[0:2, "lon"] += 0.05  # 開頭 3 點的冷啟動定位
+    keep = clean_mask(df)
+    assert not keep[30] and not keep[:3].any()
+    assert keep.sum() == len(df) - 4
+
+
+def test_kalman_follows_constant_velocity():
+    line = np.arange(100, dtype=np.float64) * 10
+    # 初始速度視為 0, 收斂後與等速直線相同
+    np.testing.assert_allclose(kalman_filter(line, 3.0)[30:], line[30:], atol=1e-3)
+
+    rng = np.random.default_rng(0)
+    noisy = line + rng.normal(0, 5, len(line))
+    filtered = kalman_filter(noisy, 0.5)
+    assert np.abs(filtered - line)[20:].std() < np.abs(noisy - line)[20:].std()
+
+
+def test_median_filter_removes_a_single_outlier():
+    values = np.arange(10, dtype=np.float64)
+    values[5] = 100
+    np.testing.assert_array_equal(median_filter(values, 3), [0, 1, 2, 3, 4, 6, 7, 7, 8, 9])
+
+
+@pytest.mark.parametrize("spec", ["median:5", "kalman:3"])
+def test_smoothing_keeps_points_and_projection(df, spec):
+    smoothed = clean_gps(df, spec)
+    assert list(smoothed.columns) == list(df.columns) and len(smoothed) == len(df)
+    # 平滑後的位置在原始軌跡附近 ( 約 20 公尺內 ), EPSG:3857 座標重新計算
+    assert np.abs(smoothed["lat"] - df["lat"]).max() < 20 / 111320
+    x, y = _getDfTransGps(smoothed["lon"].to_numpy(), smoothed["lat"].to_numpy())
+    np.testing.assert_allclose(smoothed["lon3857"], x)
+    np.testing.assert_allclose(smoothed["lat3857"], y)
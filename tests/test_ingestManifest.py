@@ -0,0 +1,71 @@
+import json
+import shutil
+
+import pytest
+
+from main import convert_video_to_geojson
+from utlis.ingestManifest import IngestManifest
+
+
+@pytest.fixture
+def videos(video_dir, tmp_path):
+    folder = tmp_path / "videos"
+    shutil.copytree(video_dir, folder)
+    return folder
+
+
+@pytest.mark.parametrize("pipeline", ["batch", "async"])
+def test_removed_clip_leaves_outputs_and_merge(videos, tmp_path, pipeline):
+    output_dir = tmp_path / "out"
+    convert_video_to_geojson(videos, output_dir, pipeline=pipeline)
+    removed = sorted(videos.glob("*.mp4"))[0]
+    assert (output_dir / f"{removed.stem}.geojson").exists()
+
+    removed.unlink()
+    convert_video_to_geojson(videos, output_dir, pipeline=pipeline)
+    assert not (output_dir / f"{removed.stem}.geojson").exists()
+    entries = json.loads((output_dir / IngestManifest.FILENAME).read_text())["files"]
+    assert sorted(entries) == sorted(str(x.resolve()) for x in videos.glob("*.mp4"))
+    merged, = output_dir.glob("[0-9]" * 8 + ".geojson")
+    # 每支影像一條 LineString, 其屬性有檔名
+    names = {f["properties"]["filename"] for f in json.loads(merged.read_text())["features"]
+             if f["geometry"]["type"] == "LineString"}
+    assert names == {x.stem for x in videos.glob("*.mp4")}
+
+
+def test_prune_keeps_entries_outside_the_scanned_folder(tmp_path):
+    manifest = IngestManifest(tmp_path)
+    shared = tmp_path / "shared.geojson"
+    shared.write_text("{}")
+    manifest.entries = {
+        str(tmp_path / "videos" / "a" / "clip.mp4"): {"output": str(shared)},
+        str(tmp_path / "videos" / "b" / "clip.mp4"): {"output": str(shared)},
+        str(tmp_path / "other" / "clip.mp4"): {"output": str(tmp_path / "other.geojson")},
+        "D:\\videos\\clip.mp4": {"output": "D:\\out\\clip.geojson"},  # 其他磁碟機
+    }
+    removed = manifest.prune(tmp_path / "videos", [tmp_path / "videos" / "b" / "clip.mp4"])
+    assert removed == [str(tmp_path / "videos" / "a" / "clip.mp4")]
+    assert len(manifest.entries) == 3
+    # 仍被 b/clip.mp4 使用的輸出檔不會被刪除
+    assert shared.exists()
+
+
+def test_gpx_sidecar_is_part_of_the_fingerprint(tmp_path):
+    video = tmp_path / "pano.mp4"
+    video.write_bytes(b"mp4")
+    output = tmp_path / "pano.geojson"
+    output.write_text("{}")
+    manifest = IngestManifest(tmp_path)
+    manifest.record(video, manifest.fingerprint(video), output, "all")
+    assert manifest.is_fresh(video, manifest.fingerprint(video), "all")
+
+    gpx = video.with_suffix(".gpx")
+    gpx.write_text("<gpx/>")
+    assert not manifest.is_fresh(video, manifest.fingerprint(video), "all")
+    manifest.record(video, manifest.fingerprint(video), output, "all")
+    assert manifest.is_fresh(video, manifest.fingerprint(video), "all")
+
+    gpx.write_text("<gpx></gpx>")
+    assert not manifest.is_fresh(video, manifest.fingerprint(video), "all")
+    gpx.unlink()
+    assert not manifest.is_fresh(video, manifest.fingerprint(video), "all")
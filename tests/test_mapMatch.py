@@ -0,0 +1,128 @@
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+from cli import main
+from utlis.makeExif import _getDfTransGps
+from utlis.mapMatch import CoverageDB, RoadGraph, pending_runs
+
+
+def _line_graph(oneway_last: bool = True) -> RoadGraph:
+    # 四個節點沿緯線相距約 100 公尺: way 10 為 n0-n1-n2 的雙向道路, way 20 為 n2 → n3 的單行道
+    lon = 121.5 + np.arange(4) * 100 / (111320 * np.cos(np.radians(25.0)))
+    lat = np.full(4, 25.0)
+    return RoadGraph(lon, lat, a=[0, 1, 2], b=[1, 2, 3], way=[0, 0, 1], position=[0, 1, 0],
+                     way_id=[10, 20], way_oneway=[False, oneway_last], way_highway=["primary", "primary"],
+                     way_name=["A", "B"])
+
+
+def _parallel_graph() -> RoadGraph:
+    # 相距 12 公尺的兩條單行道: way 1 往北, way 2 往南 ( 分隔島道路 )
+    dlon = 6 / (111320 * np.cos(np.radians(25.0)))
+    north = 25.0 + np.arange(6) * 100 / 111320
+    lon = np.concatenate((np.full(6, 121.5 - dlon), np.full(6, 121.5 + dlon)))
+    lat = np.concatenate((north, north[::-1]))
+    a = [0, 1, 2, 3, 4, 6, 7, 8, 9, 10]
+    return RoadGraph(lon, lat, a, np.add(a, 1), way=[0] * 5 + [1] * 5, position=list(range(5)) * 2,
+                     way_id=[1, 2], way_oneway=[True, True], way_highway=["primary"] * 2, way_name=["N", "S"])
+
+
+def test_from_osm_save_and_load(roads, tmp_path):
+    graph = RoadGraph.from_osm(roads)
+    assert graph.way_id[0] == 1 and set(graph.way_highway.tolist()) == {"primary", "residential"}
+    graph.save(tmp_path / "roads.npz")
+    loaded = RoadGraph.load(tmp_path / "roads.npz")
+    for name in RoadGraph.ARRAYS:
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(graph, name))
+
+
+def test_candidates_are_sorted_by_distance():
+    graph = _line_graph()
+    x, y = _getDfTransGps([graph.lon[1]], [25.0 + 10 / 111320])
+    segment, distance, offset = graph.candidates(np.atleast_1d(x), np.atleast_1d(y), radius=30, k=3)
+    # 位於 n1 正北方 10 公尺: 與 n1 相接的兩個路段距離相同, 第三個路段超出範圍
+    assert sorted(segment[0, :2].tolist()) == [0, 1] and segment[0, 2] == -1
+    np.testing.assert_allclose(distance[0, :2], 10, rtol=1e-3)
+    assert np.isinf(distance[0, 2])
+
+
+def test_link_follows_the_network_and_oneway():
+    graph = _line_graph()
+    graph._prepare()
+    length = graph.length
+    # 路段 0 上距起點 10 公尺 → 路段 2 上距起點 5 公尺: 經過 n1, n2
+    distance, exit, entry = graph._link(0, 10.0, 2, 5.0, 1000)
+    assert (exit, entry) == (1, 2)
+    assert distance == pytest.approx(length[0] - 10 + length[1] + 5)
+    assert graph._path(exit, entry, 1000) == [1]
+    # 單行道只能往 n3 行駛, 無法回到路段 0
+    assert graph._link(2, 5.0, 0, 10.0, 1000)[0] == np.inf
+    # 改為雙向後可以回頭
+    graph = _line_graph(oneway_last=False)
+    graph._prepare()
+    assert graph._link(2, 5.0, 0, 10.0, 1000)[0] == pytest.approx(5 + graph.length[1] + graph.length[0] - 10)
+    # 節點間距離超過 limit 視為無法到達
+    graph = _line_graph()
+    graph._prepare()
+    assert graph._link(0, 10.0, 2, 5.0, 50)[0] == np.inf
+
+
+def test_match_follows_the_driven_road(roads, trip_track):
+    graph = RoadGraph.from_osm(roads)
+    rng = np.random.default_rng(0)
+    noise = rng.normal(0, 3 / 111320, (2, len(trip_track["lat"])))
+    epoch = trip_track["time"].astype(np.int64)
+    passes = graph.match(trip_track["lon"] + noise[0], trip_track["lat"] + noise[1], epoch,
+                         trip_track["speed"], trip_track["track"])
+    segments = [s for s, _ in passes]
+    # 只經過主線 ( way 1 ), 依序且不重複, 路口的支線不算經過
+    assert set(graph.way_id[graph.way[segments]].tolist()) == {1}
+    assert np.all(np.diff(graph.position[segments]) == 1)
+    assert len(segments) >= 0.9 * np.count_nonzero(graph.way == 0)
+    times = [t for _, t in passes]
+    assert times == sorted(times)
+
+
+def test_match_uses_heading_on_a_divided_road():
+    graph = _parallel_graph()
+    lat = 25.0 + np.arange(10, 490, 10) / 111320
+    lon = np.full(len(lat), 121.5)  # 兩條道路正中間
+    passes = graph.match(lon, lat, np.arange(len(lat)), np.full(len(lat), 36.0), np.zeros(len(lat)))
+    assert [graph.way_id[graph.way[s]] for s, _ in passes] == [1] * len(passes)
+    assert len(passes) >= 4
+
+
+def test_pending_runs_only_touch_trips_next_to_new_clips(tmp_path):
+    with CoverageDB(tmp_path / "coverage.db") as db:
+        for clips in (["a1", "a2"], ["b1"], ["c1", "c2"]):
+            db.conn.execute("INSERT INTO trips VALUES (?, ?, 0)", (clips[0], json.dumps(clips)))
+        assert pending_runs(db, ["a1", "a2", "b1", "c1", "c2"]) == []
+        assert pending_runs(db, ["a1", "a2", "n1", "b1", "c1", "c2"]) == [(0, 4)]
+        assert pending_runs(db, ["a1", "a2", "b1", "c1", "c2", "n2"]) == [(3, 6)]
+        # a2 被刪除: 行程 a 需要重新比對
+        assert pending_runs(db, ["a1", "b1", "c1", "c2"]) == [(0, 1)]
+
+
+def _dump(path) -> tuple:
+    conn = sqlite3.connect(path)
+    try:
+        return tuple(sorted(conn.execute(f"SELECT * FROM {table}").fetchall())
+                     for table in ("segments", "trips", "clips", "passes"))
+    finally:
+        conn.close()
+
+
+def test_match_jobs_give_the_same_coverage(roads, trip_dir, tmp_path, capsys):
+    for jobs in (1, 3):
+        main(["match", str(roads), str(tmp_path / f"jobs{jobs}.db"), "--videos", str(trip_dir), "--jobs", str(jobs)])
+    assert "matched 5 trips" in capsys.readouterr().out
+    single = _dump(tmp_path / "jobs1.db")
+    assert len(single[1]) == 5 and len(single[3]) > 0
+    assert _dump(tmp_path / "jobs3.db") == single
+
+    # 第二次執行不讀取任何影像
+    main(["match", str(roads), str(tmp_path / "jobs1.db"), "--videos", str(trip_dir)])
+    assert "Read 0 of 10 clips" in capsys.readouterr().out
+    assert _dump(tmp_path / "jobs1.db") == single
@@ -0,0 +1,74 @@
+import json
+from datetime import timezone
+
+import numpy as np
+import pytest
+
+from fixtures import START, synthetic_track, write_mp4
+from utlis.GPSProcessor import GPXProcessor, read_gpx_arrays
+from video2geojson import PanoramaVideo2GeoJson
+
+N = 60
+
+
+def _write_gpx(path, track: dict, untimed: set = (), no_ele: set = ()):
+    # 每 2 秒一個 trkpt, untimed 中的點不寫 <time>, no_ele 中的點不寫 <ele>
+    rows, lat, lon = [], track["lat"].tolist(), track["lon"].tolist()
+    for i in range(0, len(lat), 2):
+        time = "" if i in untimed else f"<time>{np.datetime_as_string(track['time'][i], unit='s')}Z</time>"
+        ele = "" if i in no_ele else f"<ele>{10 + i / 10}</ele>"
+        rows.append(f'<trkpt lat="{lat[i]!r}" lon="{lon[i]!r}">{ele}{time}</trkpt>')
+    path.write_text('<?xml version="1.0"?><gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>'
+                    + "".join(rows) + "</trkseg></trk></gpx>")
+    return path
+
+
+@pytest.fixture(scope="module")
+def panorama(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("panorama")
+    track = synthetic_track(N, seed=3)
+    video = write_mp4(folder / "pano.mp4", track)
+    gpx = _write_gpx(folder / "pano.gpx", track, untimed={10}, no_ele={20})
+    return video, gpx, track
+
+
+def test_untimed_trackpoints_are_dropped(panorama):
+    _, gpx, track = panorama
+    arrays = read_gpx_arrays(gpx)
+    assert len(arrays["time"]) == N // 2 - 1
+    assert np.all(np.diff(arrays["time"]) > 0)
+    assert track["lat"][10] not in arrays["lat"].tolist()
+    assert np.isnan(arrays["ele"]).sum() == 1
+
+
+def test_panorama_points_carry_elevation(panorama):
+    video, gpx, track = panorama
+    pano = PanoramaVideo2GeoJson(video, gpx)
+    assert len(pano.track) == N - 1  # 第一點到最後一個 trkpt, 每秒一點
+    assert pano.track.epoch[0] == START.replace(tzinfo=timezone.utc).timestamp()
+    np.testing.assert_allclose(pano.track.lat, track["lat"][:N - 1], atol=1e-5)
+
+    features = [json.loads(x) for x in pano.iter_features("point")]
+    elevation = [f["properties"]["elevation"] for f in features]
+    assert set(features[0]["properties"]) == {"timestamp", "elevation"}
+    assert elevation[0] == pytest.approx(10.0) and elevation[4] == pytest.approx(10.4)
+    # 沒有高度的 trkpt 兩側內插為 null
+    assert elevation[19] is None and elevation[21] is None
+    # 與 geojson 物件的輸出相同
+    assert features == json.loads(json.dumps(pano.create_feature_collection("point")))["features"]
+
+
+def test_gpx_processor_reports_unreadable_files(tmp_path, capsys):
+    broken = tmp_path / "broken.gpx"
+    broken.write_text("<gpx><trk>")
+    processor = GPXProcessor(broken)
+    assert processor.read_gpx() is None and processor.track_pts is None
+    assert "Error reading GPX file" in capsys.readouterr().out
+    with pytest.raises(ValueError):
+        processor.interpolate_arrays()
+
+
+def test_gpx_processor_caches_track_points(panorama):
+    processor = GPXProcessor(panorama[1])
+    assert processor.track_pts is processor.track_pts
+    assert len(processor.track_pts) == N // 2 - 1
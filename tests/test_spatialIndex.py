@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from cli import main
+from utlis.makeExif import makeExifDf
+from utlis.spatialIndex import SpatialIndex, build_index
+
+
+@pytest.fixture(scope="module")
+def clips(video_dir) -> list:
+    return [makeExifDf(path, backend="native") for path in sorted(video_dir.glob("*.mp4"))]
+
+
+@pytest.fixture
+def index(clips, tmp_path):
+    with SpatialIndex(tmp_path / "space.db", cell_size=100) as index:
+        for df in clips:
+            index.add(df)
+        yield index
+
+
+def _covered(results: list, filename: str, sec: int) -> bool:
+    return any(r["filename"] == filename and r["sec_start"] <= sec <= r["sec_end"] for r in results)
+
+
+def _inside(df, bbox) -> np.ndarray:
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return ((df["lon"] >= min_lon) & (df["lon"] <= max_lon) & (df["lat"] >= min_lat) & (df["lat"] <= max_lat)).to_numpy()
+
+
+@pytest.mark.parametrize("fraction", [0.1, 0.5, 0.9])
+def test_bbox_covers_every_point_inside(clips, index, fraction):
+    everything = np.concatenate([df[["lon", "lat"]].to_numpy() for df in clips])
+    lon, lat = everything[int(fraction * len(everything))]
+    bbox = (lon - 0.001, lat - 0.001, lon + 0.001, lat + 0.001)
+    results = index.query_bbox(*bbox)
+    assert results
+    for df in clips:
+        for sec in df["sec"][_inside(df, bbox)]:
+            assert _covered(results, df["filename"].iloc[0], sec)
+    # 四邊形與外框相同
+    corners = [(bbox[0], bbox[1]), (bbox[2], bbox[1]), (bbox[2], bbox[3]), (bbox[0], bbox[3])]
+    assert index.query_polygon(corners) == results
+
+
+def test_radius_finds_the_nearest_point(clips, index):
+    df = clips[1]
+    row = df.iloc[30]
+    results = index.query_radius(row["lon"], row["lat"], 20)
+    assert _covered(results, row["filename"], row["sec"])
+    assert all(r["filename"] != clips[0]["filename"].iloc[0] for r in results)
+    assert index.query_radius(121.0, 24.0, 1000) == []
+
+
+def test_polygon_excludes_points_outside(clips, index):
+    df = clips[0]
+    lon, lat = df["lon"].iloc[0], df["lat"].iloc[0]
+    # 起點旁的小三角形, 不含其他影像經過的位置
+    results = index.query_polygon([(lon - 0.0005, lat - 0.0005), (lon + 0.0005, lat - 0.0005), (lon, lat + 0.0005)])
+    assert [r["filename"] for r in results] == [df["filename"].iloc[0]] and results[0]["sec_start"] == 0
+
+
+def test_readding_a_clip_replaces_its_rows(clips, index):
+    count = index.conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+    assert index.add(clips[0]) > 0
+    assert index.conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0] == count
+
+
+def test_cell_size_is_kept_and_cli_builds_the_same_index(clips, index, video_dir, tmp_path, capsys):
+    index.close()
+    with SpatialIndex(tmp_path / "space.db", cell_size=500) as reopened:
+        assert reopened.cell_size == 100
+        expected = reopened.query_bbox(121.56, 25.03, 121.58, 25.05)
+    main(["index", "space", str(tmp_path / "cli.db"), "--videos", str(video_dir), "--cell-size", "100"])
+    with SpatialIndex(tmp_path / "cli.db") as built:
+        assert built.query_bbox(121.56, 25.03, 121.58, 25.05) == expected
+    with SpatialIndex(tmp_path / "empty.db") as empty:
+        assert build_index(empty, video_dir) == len(clips)
@@ -0,0 +1,48 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from cli import main
+from conftest import ROOT
+
+HEAVY = ("numpy", "pandas", "pyproj", "folium", "scipy")
+
+# 在新的直譯器中執行 cli.main, 印出已載入的重量級套件
+SCRIPT = """
+import json, sys
+from cli import main
+main(json.loads(sys.argv[1]))
+print(json.dumps(sorted(m for m in {heavy} if m in sys.modules)))
+"""
+
+
+def _run(argv: list) -> tuple:
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(heavy=HEAVY), json.dumps(argv)],
+        cwd=ROOT / "src" / "module" / "Dashcam2GeoVis", capture_output=True, text=True, check=True)
+    *output, loaded = result.stdout.splitlines()
+    return output, json.loads(loaded)
+
+
+@pytest.fixture(scope="module")
+def indexes(video_dir, tmp_path_factory):
+    folder = tmp_path_factory.mktemp("indexes")
+    main(["index", "space", str(folder / "space.db"), "--videos", str(video_dir)])
+    main(["index", "time", str(folder), "--videos", str(video_dir)])
+    return folder
+
+
+@pytest.mark.parametrize("query", [
+    ["space", "{space}", "--bbox", "121.56", "25.03", "121.58", "25.05"],
+    ["space", "{space}", "--radius", "121.568", "25.04", "1000"],
+    ["space", "{space}", "--polygon", "121.5,25.0", "121.6,25.0", "121.6,25.1"],
+    ["time", "{time}", "2025:05:23 07:54:30"],
+    ["time", "{time}", "2025:05:23 07:54:30", "2025:05:23 07:56:00"],
+])
+def test_query_loads_only_the_standard_library(indexes, query):
+    paths = {"space": str(indexes / "space.db"), "time": str(indexes)}
+    output, loaded = _run(["query", *(x.format(**paths) for x in query)])
+    assert any(line.startswith("2025052315541") for line in output)
+    assert loaded == []
@@ -0,0 +1,75 @@
+import pytest
+
+from cli import main
+from utlis.makeExif import makeExifDf
+from utlis.timeIndex import TimeIndex, build_index, format_time, parse_time
+
+
+@pytest.fixture(scope="module")
+def clips(video_dir) -> list:
+    return [makeExifDf(path, backend="native") for path in sorted(video_dir.glob("*.mp4"))]
+
+
+@pytest.fixture
+def index(clips, tmp_path):
+    index = TimeIndex(tmp_path)
+    for df in clips:
+        index.add(df)
+    return index
+
+
+def test_parse_and_format_time():
+    epoch = parse_time("2025:05:23 07:54:19")
+    assert format_time(epoch) == "2025:05:23 07:54:19"
+    assert parse_time("2025-05-23T07:54:19") == epoch
+    assert parse_time("2025-05-23T15:54:19+08:00") == epoch
+
+
+def test_every_fix_maps_back_to_its_frame(clips, index):
+    for df in clips:
+        filename = df["filename"].iloc[0]
+        for _, row in df.iloc[::7].iterrows():
+            hits = [x for x in index.at(row["datetime"]) if x["filename"] == filename]
+            assert hits == [{"filename": filename, "sec": row["sec"], "frame": row["frame"]}]
+
+
+def test_range_spans_clips(clips, index):
+    first, second = clips[0], clips[1]
+    start, end = first["datetime"].iloc[50], second["datetime"].iloc[9]
+    pieces = index.range(start, end)
+    assert [x["filename"] for x in pieces] == [first["filename"].iloc[0], second["filename"].iloc[0]]
+    assert (pieces[0]["start"], pieces[0]["sec_start"], pieces[0]["frame_start"]) == \
+        (start, first["sec"].iloc[50], first["frame"].iloc[50])
+    assert (pieces[1]["end"], pieces[1]["sec_end"], pieces[1]["frame_end"]) == \
+        (end, second["sec"].iloc[9], second["frame"].iloc[9])
+    assert index.range("2025:05:22 00:00:00", "2025:05:22 23:59:59") == []
+
+
+def test_overlapping_clips_are_both_found(clips, index):
+    # 另一個鏡頭在第一支影像中途開始錄影
+    rear = clips[0].iloc[20:].copy()
+    rear["filename"], rear["starttime"] = "rear", rear["datetime"].iloc[0]
+    rear["sec"] -= 20
+    rear["frame"] -= rear["frame"].iloc[0]
+    index.add(rear)
+    when = clips[0]["datetime"].iloc[30]
+    assert {(x["filename"], x["sec"]) for x in index.at(when)} == {(clips[0]["filename"].iloc[0], 30), ("rear", 10)}
+    # 結束較晚的影像不會遮住較早開始的影像
+    assert {x["filename"] for x in index.at(clips[0]["datetime"].iloc[5])} == {clips[0]["filename"].iloc[0]}
+    index.remove("rear")
+    assert [x["filename"] for x in index.at(when)] == [clips[0]["filename"].iloc[0]]
+
+
+def test_save_reload_and_cli(clips, index, video_dir, tmp_path, capsys):
+    index.save()
+    reloaded = TimeIndex(tmp_path / TimeIndex.FILENAME)
+    assert reloaded.clips == index.clips
+    when = clips[2]["datetime"].iloc[40]
+    assert reloaded.at(when) == index.at(when)
+
+    main(["index", "time", str(tmp_path / "cli"), "--videos", str(video_dir)])
+    assert TimeIndex(tmp_path / "cli").clips == index.clips
+    assert build_index(TimeIndex(tmp_path / "other"), video_dir) == len(clips)
+    capsys.readouterr()
+    main(["query", "time", str(tmp_path / "cli"), when])
+    assert f"{clips[2]['filename'].iloc[0]}\tsec 40\tframe {clips[2]['frame'].iloc[40]}" in capsys.readouterr().out
@@ -0,0 +1,83 @@
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from cli import main
+from utlis.makeExif import makeExifDf
+from utlis.trackCache import TrackCache
+
+
+@pytest.fixture
+def clip(video_dir, tmp_path):
+    source = sorted(video_dir.glob("*.mp4"))[0]
+    return Path(shutil.copy(source, tmp_path / source.name))
+
+
+def test_hits_from_memory_and_disk(clip, tmp_path):
+    cache = TrackCache(tmp_path / "cache")
+    df = makeExifDf(clip, backend="native", cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+    pd.testing.assert_frame_equal(makeExifDf(clip, backend="native", cache=cache), df)
+    assert cache.hits == 1
+
+    # 新的實例沒有記憶體中的紀錄, 由磁碟讀出
+    fresh = TrackCache(tmp_path / "cache")
+    pd.testing.assert_frame_equal(fresh.get(clip, "native"), df)
+    assert fresh.hits == 1
+    # backend 不同時是不同的鍵
+    assert fresh.get(clip, "exiftool") is None
+
+
+def test_changed_mtime_or_size_misses(clip, tmp_path):
+    cache = TrackCache(tmp_path / "cache", memory_items=0)
+    makeExifDf(clip, backend="native", cache=cache)
+    assert cache.get(clip, "native") is not None
+
+    stat = os.stat(clip)
+    os.utime(clip, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.get(clip, "native") is None
+    makeExifDf(clip, backend="native", cache=cache)
+    assert cache.get(clip, "native") is not None
+
+    with open(clip, "ab") as f:
+        f.write(b"\0" * 16)
+    os.utime(clip, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))  # 修改時間相同, 只有大小改變
+    assert cache.get(clip, "native") is None
+
+
+def test_evicts_least_recently_used(video_dir, tmp_path):
+    clips = sorted(video_dir.glob("*.mp4"))
+    cache = TrackCache(tmp_path / "cache", memory_items=0)
+    for i, path in enumerate(clips):
+        makeExifDf(path, backend="native", cache=cache)
+        entry = cache._path(cache.key(path, "native"))
+        os.utime(entry, ns=(i * 10**9, i * 10**9))
+    size = os.path.getsize(entry)
+
+    # 讀取最舊的一筆會更新其使用時間, 之後最久未使用的是第二筆
+    assert cache.get(clips[0], "native") is not None
+    cache.max_bytes = 2 * size
+    assert cache.evict() == 1
+    assert [cache.get(x, "native") is not None for x in clips] == [True, False, True]
+    assert cache.size <= cache.max_bytes
+
+    cache.clear()
+    assert all(cache.get(x, "native") is None for x in clips)
+
+
+def test_export_csv_uses_the_cache(video_dir, tmp_path, monkeypatch):
+    from main import convert_video_to_geojson
+    from utlis import json2csv
+
+    convert_video_to_geojson(video_dir, tmp_path / "geojson")
+    main(["export", "csv", str(tmp_path / "geojson"), str(tmp_path / "first"), "--cache", str(tmp_path / "cache")])
+    # 第二次全部由快取輸出, 不再讀取 GeoJSON
+    monkeypatch.setattr(json2csv, "_pointsDf", None)
+    main(["export", "csv", str(tmp_path / "geojson"), str(tmp_path / "second"), "--cache", str(tmp_path / "cache")])
+    first, second = ({x.name: x.read_bytes() for x in (tmp_path / name).iterdir()} for name in ("first", "second"))
+    assert len(first) == 4 and first == second
+    cache = TrackCache(tmp_path / "cache")
+    assert all(cache.get(x, "geojson-csv") is not None for x in (tmp_path / "geojson").glob("*.geojson"))
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utlis.GPSProcessor import read_gpx_arrays
+from utlis.makeExif import exif_epochs, makeExifDf
+from utlis.track import Track
+from utlis.trackStore import TrackStore
+
+
+@pytest.fixture(scope="module")
+def clips(video_dir) -> list:
+    return [makeExifDf(path, backend="native") for path in sorted(video_dir.glob("*.mp4"))]
+
+
+def test_dataframe_and_track_round_trip(clips, tmp_path):
+    store = TrackStore(tmp_path / "store")
+    store.write(clips[0])
+    store.write(Track.from_df(clips[1]))
+    assert [x.parent.name for x in store.files()] == ["date=20250523"] * 2
+    for df, stored in zip(clips, store.iter_clips()):
+        pd.testing.assert_frame_equal(stored, df, check_dtype=False)
+    assert len(store.read()) == len(clips[0]) + len(clips[1])
+
+
+def test_rewrite_in_another_date_removes_the_stale_file(clips, tmp_path):
+    store = TrackStore(tmp_path / "store")
+    df = clips[0].copy()
+    store.write(df)
+    # 第一筆時間移到前一天 ( ex: 清除異常點前 ), 再以原本的時間重新寫入
+    shifted = df.copy()
+    shifted.loc[0, "datetime"] = "2025:05:22 23:59:59"
+    assert store.write(shifted).parent.name == "date=20250522"
+    assert store.write(df).parent.name == "date=20250523"
+    assert [x.parent.name for x in store.files()] == ["date=20250523"]
+
+
+def test_filters_and_exports(clips, tmp_path):
+    store = TrackStore(tmp_path / "store")
+    for df in clips:
+        store.write(df)
+    names = [str(df["filename"].iloc[0]) for df in clips]
+    assert store.files(start_date="20250524") == []
+    assert [x.stem for x in store.files(end_date="20250523", filenames=names[1:])] == names[1:]
+    assert store.read_table(filenames=["missing"], columns=["lat"]).num_rows == 0
+
+    csv, = store.export_csv(tmp_path / "csv", filenames=names[:1])
+    pd.testing.assert_frame_equal(pd.read_csv(csv), clips[0], check_dtype=False)
+    gpx, = store.export_gpx(tmp_path / "gpx", filenames=names[:1])
+    arrays = read_gpx_arrays(gpx)
+    np.testing.assert_array_equal(arrays["time"], exif_epochs(clips[0]["datetime"]))
+    np.testing.assert_array_equal(arrays["lat"], clips[0]["lat"])
+    assert len(store.export_geojson(tmp_path / "geojson")) == len(clips)
@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pytest
+
+from conftest import TRIP_GAP
+from utlis.makeExif import makeExifDf
+from utlis.trackStore import TrackStore
+from utlis.trips import iter_clips, save_trips, stitch_trips, store_paths, video_clips, video_paths
+
+
+@pytest.fixture(scope="module")
+def clips(trip_dir) -> list:
+    return list(video_clips(trip_dir, backend="native"))
+
+
+def test_clips_are_ordered_by_start_time(trip_dir):
+    assert [x.stem for x in video_paths(trip_dir)] == [f"clip{i:02d}" for i in range(10)]
+
+
+def test_gaps_split_trips(clips):
+    trips = list(stitch_trips(clips))
+    assert [t["properties"]["clips"] for t in trips] == [[f"clip{i:02d}", f"clip{i + 1:02d}"] for i in range(0, 10, 2)]
+    for number, trip in enumerate(trips):
+        properties = trip["properties"]
+        assert properties["trip"] == number and properties["duration(s)"] == 59
+        assert np.all(np.diff(trip["epoch"]) == 1)
+        assert properties["avg_speed(km/h)"] == pytest.approx(properties["length(m)"] / 59 * 3.6, abs=0.01)
+
+    # 門檻放寬後全部接成一個行程, 收緊距離門檻則每支影像各自成為一個行程
+    assert len(list(stitch_trips(clips, max_gap=TRIP_GAP + 60))) == 1
+    assert len(list(stitch_trips(clips, max_jump=1))) == 10
+
+
+def test_overlapping_clip_is_recorded_but_not_duplicated(clips):
+    rear = clips[0].iloc[5:25].copy()
+    rear["filename"] = "rear"
+    first, = stitch_trips([clips[0], rear, clips[1]])
+    assert first["properties"]["clips"] == ["clip00", "rear", "clip01"]
+    assert len(first["epoch"]) == 60
+
+
+def test_trips_are_yielded_lazily(clips):
+    def source():
+        yield from clips[:3]
+        raise AssertionError("read past the first finished trip")
+
+    assert next(stitch_trips(source()))["properties"]["clips"] == ["clip00", "clip01"]
+
+
+def test_store_clips_come_first_and_save_trips(clips, trip_dir, tmp_path):
+    store = TrackStore(tmp_path / "store")
+    for df in clips[:4]:
+        store.write(df)
+    assert [x.stem for x in store_paths(store)] == [f"clip{i:02d}" for i in range(4)]
+    names = [str(df["filename"].iloc[0]) for df in iter_clips(trip_dir, tmp_path / "store")]
+    assert names == [f"clip{i:02d}" for i in range(4)] + [f"clip{i:02d}" for i in range(10)]
+
+    count = save_trips(stitch_trips(clips), tmp_path / "trips.geojson")
+    features = json.loads((tmp_path / "trips.geojson").read_text())["features"]
+    assert count == len(features) == 5
+    assert len(features[0]["geometry"]["coordinates"]) == 60
+    assert features[0]["properties"]["starttime"] == makeExifDf(trip_dir / "clip00.mp4")["datetime"].iloc[0]
@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pytest
+
+from utlis import vectorTiles
+from utlis.vectorTiles import build_tiles, encode_tile, lines_from_geojson
+
+
+def _fields(data: bytes):
+    # 最小的 protobuf 解碼: 逐一傳回 (欄位編號, wire type, 值)
+    def varint(i):
+        value, shift = 0, 0
+        while True:
+            byte = data[i]
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            i += 1
+            if byte < 0x80:
+                return value, i
+    i = 0
+    while i < len(data):
+        key, i = varint(i)
+        if key & 7 == 0:
+            value, i = varint(i)
+        elif key & 7 == 1:
+            value, i = data[i:i + 8], i + 8
+        else:
+            length, i = varint(i)
+            value, i = data[i:i + length], i + length
+        yield key >> 3, key & 7, value
+
+
+def _layerValues(tile: bytes) -> dict:
+    (_, _, layer), = _fields(tile)
+    keys = [v.decode() for n, _, v in _fields(layer) if n == 3]
+    values = [next(_fields(v))[2] for n, _, v in _fields(layer) if n == 4]
+    features = [v for n, _, v in _fields(layer) if n == 2]
+    return keys, values, features
+
+
+def test_non_scalar_properties_are_json_encoded():
+    x, y = np.array([0.0, 100.0, 200.0]), np.array([0.0, 50.0, 0.0])
+    tile = encode_tile([(x, y, {"filename": "a", "lanes": [1, 2], "tags": {"k": "v"}, "note": None})])
+    keys, values, features = _layerValues(tile)
+    assert keys == ["filename", "lanes", "tags"] and len(features) == 1
+    assert values == [b"a", b"[1, 2]", b'{"k": "v"}']
+
+
+@pytest.fixture
+def merged(tmp_path, video_dir):
+    from main import convert_video_to_geojson
+
+    convert_video_to_geojson(video_dir, tmp_path / "out")
+    path, = (tmp_path / "out").glob("[0-9]" * 8 + ".geojson")
+    return path
+
+
+def test_build_tiles_projects_once_and_clears_old_levels(merged, tmp_path, monkeypatch):
+    calls = []
+    project = vectorTiles._getDfTransGps
+    monkeypatch.setattr(vectorTiles, "_getDfTransGps", lambda lon, lat: calls.append(len(lon)) or project(lon, lat))
+    output = tmp_path / "tiles"
+    (output / "18" / "1").mkdir(parents=True)
+    (output / "18" / "1" / "2.pbf").write_bytes(b"stale")
+
+    metadata = build_tiles(lines_from_geojson(merged), output, 10, 14)
+    points = sum(f["geometry"]["type"] == "Point" for f in json.loads(merged.read_text())["features"])
+    assert calls == [points]  # 三條線一次投影, 之後各層級共用
+    assert sorted(int(x.name) for x in output.iterdir() if x.is_dir()) == list(range(10, 15))
+    assert metadata["tiles"] == sum(1 for _ in output.glob("*/*/*.pbf"))
+    lon0, lat0, lon1, lat1 = metadata["bounds"]
+    assert 121.56 < lon0 < lon1 < 121.58 and 25.03 < lat0 < lat1 < 25.05
+
+    # 重建較少的層級時不留下舊的圖磚
+    build_tiles(lines_from_geojson(merged), output, 10, 11)
+    assert sorted(x.name for x in output.iterdir()) == ["10", "11", "metadata.json"]
+    keys, values, features = _layerValues(next(output.glob("10/*/*.pbf")).read_bytes())
+    assert "filename" in keys and len(features) == 3